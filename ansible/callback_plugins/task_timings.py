@@ -0,0 +1,92 @@
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: task_timings
+    type: aggregate
+    short_description: Writes the start and end of every task on every host to a JSONL file
+    description:
+      - One line per task and host with its wall time and result, read by
+        hetzner/task_timings.py to report the slowest tasks and host skew.
+    requirements:
+      - enable in configuration (callbacks_enabled = task_timings)
+    options:
+      output_path:
+        description: JSONL file the records are appended to.
+        default: task_timings.jsonl
+        env:
+          - name: TASK_TIMINGS_PATH
+        ini:
+          - section: callback_task_timings
+            key: output_path
+'''
+
+import json
+import os
+import threading
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'task_timings'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self):
+        super(CallbackModule, self).__init__()
+        self._started = {}
+        self._playbook = None
+        self._play = None
+        self._lock = threading.Lock()
+        self._path = None
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        super(CallbackModule, self).set_options(task_keys=task_keys, var_options=var_options, direct=direct)
+        self._path = os.path.abspath(os.path.expanduser(self.get_option('output_path')))
+
+    def v2_playbook_on_start(self, playbook):
+        self._playbook = os.path.basename(playbook._file_name)
+
+    def v2_playbook_on_play_start(self, play):
+        self._play = play.get_name().strip()
+
+    def v2_runner_on_start(self, host, task):
+        self._started[(host.get_name(), task._uuid)] = time.time()
+
+    def _record(self, result, status):
+        host = result._host.get_name()
+        task = result._task
+        end = time.time()
+        start = self._started.pop((host, task._uuid), end)
+        record = {
+            "playbook": self._playbook,
+            "play": self._play,
+            "task": task.get_name().strip(),
+            "action": task.action,
+            "path": task.get_path(),
+            "host": host,
+            "start": round(start, 3),
+            "end": round(end, 3),
+            "duration_s": round(end - start, 3),
+            "status": status,
+        }
+        # Results of different hosts arrive from the worker threads of the
+        # 'free' strategy; keep lines whole
+        with self._lock:
+            with open(self._path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, "changed" if result._result.get("changed") else "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, "ignored" if ignore_errors else "failed")
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, "skipped")
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, "unreachable")
@@ -0,0 +1,84 @@
+import json
+import os
+
+# ==========================================
+# Per-Cluster ansible.cfg
+# ==========================================
+# cluster_up.py points ANSIBLE_CONFIG at a generated config instead of running
+# with Ansible's defaults (5 forks, no pipelining, facts gathered again in
+# every imported playbook).
+
+MAX_FORKS = 50
+# Which server each cached host was gathered on; the jsonfile cache skips dotfiles
+FACT_CACHE_SERVERS = ".servers.json"
+CALLBACK_PLUGINS_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ansible", "callback_plugins"))
+
+
+def forks_for(node_count):
+    """One fork per node so node-local phases run fleet-wide, capped at MAX_FORKS."""
+    return max(1, min(node_count, MAX_FORKS))
+
+
+def write_ansible_cfg(config_path, node_count, fact_cache_dir, fact_cache_timeout=86400, timings_path=None):
+    """
+    Writes an ansible.cfg with SSH pipelining, forks sized to the cluster and
+    'smart' gathering backed by a jsonfile fact cache, so facts are gathered
+    once per host and reused by later plays and later runs.
+    With timings_path, the task_timings callback appends one line per task
+    and host to that file (see task_timings.py).
+    Returns the config path.
+    """
+    os.makedirs(fact_cache_dir, exist_ok=True)
+    lines = [
+        "# Generated by cluster_up.py - do not edit",
+        "[defaults]",
+        f"forks = {forks_for(node_count)}",
+        "host_key_checking = False",
+        "interpreter_python = auto_silent",
+        "gathering = smart",
+        "fact_caching = jsonfile",
+        f"fact_caching_connection = {fact_cache_dir}",
+        f"fact_caching_timeout = {fact_cache_timeout}",
+    ]
+    if timings_path:
+        lines += [
+            f"callback_plugins = {CALLBACK_PLUGINS_DIR}",
+            "callbacks_enabled = task_timings",
+            "",
+            "[callback_task_timings]",
+            f"output_path = {timings_path}",
+        ]
+    lines += [
+        "",
+        "[ssh_connection]",
+        # Runs modules over the already open SSH session instead of copying a
+        # file per task; needs no 'requiretty' in sudoers (we connect as root)
+        "pipelining = True",
+        "",
+    ]
+    with open(config_path, "w") as f:
+        f.write("\n".join(lines))
+    return config_path
+
+
+def prune_fact_cache(fact_cache_dir, servers):
+    """
+    Deletes the cached facts of every host whose server is not the one they
+    were gathered on. The cache is keyed by inventory alias, which a
+    recreated server keeps, so servers ({alias: server ID}) is recorded
+    next to the facts. Returns the deleted aliases.
+    """
+    os.makedirs(fact_cache_dir, exist_ok=True)
+    record_path = os.path.join(fact_cache_dir, FACT_CACHE_SERVERS)
+    try:
+        with open(record_path, "r") as f:
+            previous = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        previous = {}
+    stale = sorted(alias for alias in os.listdir(fact_cache_dir)
+                   if not alias.startswith(".") and previous.get(alias) != servers.get(alias))
+    for alias in stale:
+        os.remove(os.path.join(fact_cache_dir, alias))
+    with open(record_path, "w") as f:
+        json.dump(servers, f, indent=2)
+    return stale
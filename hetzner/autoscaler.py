@@ -0,0 +1,300 @@
+import math
+
+import metrics_ring
+import readiness
+
+# ==========================================
+# Worker Autoscaler Decision Engine
+# ==========================================
+# Decides from one observation at a time whether the cluster needs more or
+# fewer workers. Observations are plain dicts (one JSONL line when recorded):
+#   time, workers, cpu_utilization, memory_utilization (usage / allocatable
+#   over the workers), pending_pods, pending_oldest_s, pending_cpu_m,
+#   pending_memory, worker_cpu_m, worker_memory (allocatable of one worker)
+# Unschedulable pods scale out right after a grace period. Utilization has
+# to stay past a threshold for a while before it counts (hysteresis), and
+# scale-in additionally has to leave the remaining workers below the
+# scale-out threshold, so the two never chase each other. Cooldowns follow
+# every action. Nothing here talks to the cluster: 'cluster_ctl.py
+# autoscale' feeds live observations, 'autoscale-replay' recorded ones.
+
+class Policy:
+    def __init__(self, min_workers=1, max_workers=10, scale_out_utilization=0.75, scale_in_utilization=0.35,
+                 pending_grace_s=30, scale_out_stable_s=60, scale_in_stable_s=600,
+                 scale_out_cooldown_s=180, scale_in_cooldown_s=600, max_step=3):
+        # node-2 carries the volume and is the bastion, so one worker always stays
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.scale_out_utilization = scale_out_utilization
+        self.scale_in_utilization = scale_in_utilization
+        self.pending_grace_s = pending_grace_s
+        self.scale_out_stable_s = scale_out_stable_s
+        self.scale_in_stable_s = scale_in_stable_s
+        self.scale_out_cooldown_s = scale_out_cooldown_s
+        self.scale_in_cooldown_s = scale_in_cooldown_s
+        self.max_step = max_step
+
+
+def decision(action, count=0, reason=""):
+    return {"action": action, "count": count, "reason": reason}
+
+
+class Autoscaler:
+    """Keeps the hysteresis and cooldown state between observations."""
+    def __init__(self, policy):
+        self.policy = policy
+        self.last_scale_out = None
+        self.last_scale_in = None
+        self.high_since = None
+        self.low_since = None
+
+    def _since(self, last, now):
+        return math.inf if last is None else now - last
+
+    def decide(self, obs):
+        p = self.policy
+        now = obs["time"]
+        workers = obs["workers"]
+        utilization = max(obs.get("cpu_utilization", 0.0), obs.get("memory_utilization", 0.0))
+        pending = obs.get("pending_pods", 0)
+
+        if utilization >= p.scale_out_utilization:
+            self.high_since = self.high_since if self.high_since is not None else now
+        else:
+            self.high_since = None
+        if utilization <= p.scale_in_utilization and not pending:
+            self.low_since = self.low_since if self.low_since is not None else now
+        else:
+            self.low_since = None
+
+        if workers < p.min_workers:
+            return self._scale_out(now, p.min_workers - workers, f"{workers} workers, minimum is {p.min_workers}")
+        if workers > p.max_workers:
+            return self._scale_in(now, workers - p.max_workers, f"{workers} workers, maximum is {p.max_workers}")
+
+        out_cooldown = self._since(self.last_scale_out, now) < p.scale_out_cooldown_s
+        if pending and obs.get("pending_oldest_s", 0) >= p.pending_grace_s:
+            if workers >= p.max_workers:
+                return decision("none", reason=f"{pending} pods unschedulable, already at {p.max_workers} workers")
+            if out_cooldown:
+                return decision("none", reason=f"{pending} pods unschedulable, scale-out cooldown")
+            needed = max(
+                1,
+                math.ceil(obs.get("pending_cpu_m", 0) / obs["worker_cpu_m"]) if obs.get("worker_cpu_m") else 1,
+                math.ceil(obs.get("pending_memory", 0) / obs["worker_memory"]) if obs.get("worker_memory") else 1,
+            )
+            count = min(needed, p.max_step, p.max_workers - workers)
+            return self._scale_out(now, count, f"{pending} pods unschedulable for {obs['pending_oldest_s']:.0f}s")
+
+        if self.high_since is not None and now - self.high_since >= p.scale_out_stable_s:
+            if workers >= p.max_workers:
+                return decision("none", reason=f"utilization {utilization:.0%}, already at {p.max_workers} workers")
+            if out_cooldown:
+                return decision("none", reason=f"utilization {utilization:.0%}, scale-out cooldown")
+            # Enough workers to bring utilization back between the thresholds
+            target = (p.scale_out_utilization + p.scale_in_utilization) / 2
+            needed = max(1, math.ceil(workers * utilization / target) - workers)
+            count = min(needed, p.max_step, p.max_workers - workers)
+            return self._scale_out(now, count, f"utilization {utilization:.0%} for {now - self.high_since:.0f}s")
+
+        if self.low_since is not None and now - self.low_since >= p.scale_in_stable_s and workers > p.min_workers:
+            if (self._since(self.last_scale_in, now) < p.scale_in_cooldown_s
+                    or self._since(self.last_scale_out, now) < p.scale_in_cooldown_s):
+                return decision("none", reason=f"utilization {utilization:.0%}, scale-in cooldown")
+            projected = utilization * workers / (workers - 1)
+            if projected >= p.scale_out_utilization:
+                return decision("none", reason=f"utilization {utilization:.0%}, {projected:.0%} with one worker less")
+            return self._scale_in(now, 1, f"utilization {utilization:.0%} for {now - self.low_since:.0f}s")
+
+        return decision("none", reason=f"utilization {utilization:.0%}, {pending} pods unschedulable")
+
+    def _scale_out(self, now, count, reason):
+        self.last_scale_out = now
+        self.high_since = None
+        return decision("out", count, reason)
+
+    def _scale_in(self, now, count, reason):
+        self.last_scale_in = now
+        self.low_since = None
+        return decision("in", count, reason)
+
+# ------------------------------------------
+# Observations from the Kubernetes API
+# ------------------------------------------
+def _is_control_plane(node):
+    labels = node.get("metadata", {}).get("labels", {})
+    return "node-role.kubernetes.io/control-plane" in labels
+
+
+def _pod_requests(pod):
+    cpu = memory = 0
+    for container in pod.get("spec", {}).get("containers", []):
+        requests = container.get("resources", {}).get("requests", {})
+        cpu += metrics_ring.parse_cpu(requests.get("cpu", "0"))
+        memory += metrics_ring.parse_memory(requests.get("memory", "0"))
+    return cpu, memory
+
+
+def observation(now, workers, nodes, node_metrics, pending_pods):
+    """
+    Builds an observation from 'kubectl get nodes -o json', the
+    metrics.k8s.io NodeMetricsList and 'kubectl get pods
+    --field-selector=status.phase=Pending -o json'.
+    """
+    usage = {item["metadata"]["name"]: item.get("usage", {}) for item in node_metrics.get("items", [])}
+    alloc_cpu = alloc_mem = used_cpu = used_mem = 0
+    worker_nodes = [n for n in nodes.get("items", []) if not _is_control_plane(n)]
+    for node in worker_nodes:
+        name = node["metadata"]["name"]
+        allocatable = node.get("status", {}).get("allocatable", {})
+        alloc_cpu += metrics_ring.parse_cpu(allocatable.get("cpu", "0"))
+        alloc_mem += metrics_ring.parse_memory(allocatable.get("memory", "0"))
+        used_cpu += metrics_ring.parse_cpu(usage.get(name, {}).get("cpu", "0"))
+        used_mem += metrics_ring.parse_memory(usage.get(name, {}).get("memory", "0"))
+
+    unschedulable = []
+    for pod in pending_pods.get("items", []):
+        conditions = pod.get("status", {}).get("conditions", [])
+        if any(c.get("type") == "PodScheduled" and c.get("reason") == "Unschedulable" for c in conditions):
+            unschedulable.append(pod)
+    created = [readiness.parse_time(p.get("metadata", {}).get("creationTimestamp")) or now for p in unschedulable]
+    requests = [_pod_requests(p) for p in unschedulable]
+
+    return {
+        "time": now,
+        "workers": workers,
+        "cpu_utilization": used_cpu / alloc_cpu if alloc_cpu else 0.0,
+        "memory_utilization": used_mem / alloc_mem if alloc_mem else 0.0,
+        "pending_pods": len(unschedulable),
+        "pending_oldest_s": now - min(created) if created else 0.0,
+        "pending_cpu_m": sum(r[0] for r in requests),
+        "pending_memory": sum(r[1] for r in requests),
+        "worker_cpu_m": alloc_cpu // len(worker_nodes) if worker_nodes else 0,
+        "worker_memory": alloc_mem // len(worker_nodes) if worker_nodes else 0,
+    }
+
+def ready_workers(nodes):
+    """Names of the Ready worker nodes in 'kubectl get nodes -o json'."""
+    return [n["metadata"]["name"] for n in nodes.get("items", []) if not _is_control_plane(n) and any(
+        c.get("type") == "Ready" and c.get("status") == "True" for c in n.get("status", {}).get("conditions", []))]
+
+# ------------------------------------------
+# Offline Replay
+# ------------------------------------------
+class StubProvisioner:
+    """Workers appear provision_delay_s after a scale-out; scale-in takes drain_delay_s."""
+    def __init__(self, workers, provision_delay_s=180, drain_delay_s=60):
+        self.workers = workers
+        self.provision_delay_s = provision_delay_s
+        self.drain_delay_s = drain_delay_s
+        self.in_flight = []   # (done_at, delta)
+
+    def start(self, action, count, now):
+        if action == "out":
+            self.in_flight.append((now + self.provision_delay_s, count))
+        elif action == "in":
+            self.in_flight.append((now + self.drain_delay_s, -count))
+
+    def advance(self, now):
+        """Applies finished operations; returns their (done_at, delta)."""
+        done = [op for op in self.in_flight if op[0] <= now]
+        self.in_flight = [op for op in self.in_flight if op[0] > now]
+        for _, delta in done:
+            self.workers += delta
+        return done
+
+    @property
+    def busy(self):
+        return bool(self.in_flight)
+
+
+def observations_from_ring(ring, index, since=None, exclude=()):
+    """
+    Observations from the node records of a metrics ring ('cluster_ctl.py
+    sample'), one per poll. The ring has no pending pods, so replaying it
+    exercises the utilization rules only. exclude: node names to leave out
+    (the control plane).
+    """
+    polls = {}
+    for timestamp, series_id, cpu_m, memory in ring.window(since):
+        name = index.name(series_id)
+        meta = index.series.get(name, {})
+        if (not name.startswith("node/") or name[len("node/"):] in exclude
+                or not meta.get("allocatable_cpu_m") or not meta.get("allocatable_memory")):
+            continue
+        polls.setdefault(timestamp, []).append((cpu_m, memory, meta["allocatable_cpu_m"], meta["allocatable_memory"]))
+    for timestamp, rows in polls.items():
+        alloc_cpu = sum(r[2] for r in rows)
+        alloc_mem = sum(r[3] for r in rows)
+        yield {
+            "time": timestamp,
+            "workers": len(rows),
+            "cpu_utilization": sum(r[0] for r in rows) / alloc_cpu,
+            "memory_utilization": sum(r[1] for r in rows) / alloc_mem,
+            "pending_pods": 0,
+            "pending_oldest_s": 0.0,
+            "pending_cpu_m": 0,
+            "pending_memory": 0,
+            "worker_cpu_m": alloc_cpu // len(rows),
+            "worker_memory": alloc_mem // len(rows),
+        }
+
+
+def simulate(obs, workers):
+    """The recorded observation as it would look with `workers` workers instead."""
+    sim = dict(obs, workers=workers)
+    recorded = obs["workers"]
+    if workers != recorded and workers > 0:
+        sim["cpu_utilization"] = obs.get("cpu_utilization", 0.0) * recorded / workers
+        sim["memory_utilization"] = obs.get("memory_utilization", 0.0) * recorded / workers
+    extra = workers - recorded
+    if extra > 0 and obs.get("pending_pods"):
+        fits_cpu = extra * obs.get("worker_cpu_m", 0) >= obs.get("pending_cpu_m", 0)
+        fits_mem = extra * obs.get("worker_memory", 0) >= obs.get("pending_memory", 0)
+        if fits_cpu and fits_mem:
+            sim.update(pending_pods=0, pending_oldest_s=0.0, pending_cpu_m=0, pending_memory=0)
+    return sim
+
+
+def replay(observations, policy, provisioner):
+    """
+    Runs the engine over recorded observations against a stub provisioner.
+    One operation is in flight at a time, like the live loop. Returns
+    (timeline, summary); the summary has the pending-pod-to-new-worker
+    times of the scale-outs triggered by unschedulable pods.
+    """
+    scaler = Autoscaler(policy)
+    timeline = []
+    pending_to_ready = []
+    waiting_since = None
+    scale_outs = scale_ins = 0
+    for obs in observations:
+        now = obs["time"]
+        for _, delta in provisioner.advance(now):
+            if delta > 0 and waiting_since is not None:
+                pending_to_ready.append(now - waiting_since)
+                waiting_since = None
+        sim = simulate(obs, provisioner.workers)
+        if provisioner.busy:
+            result = decision("none", reason="operation in flight")
+        else:
+            result = scaler.decide(sim)
+            if result["action"] != "none":
+                provisioner.start(result["action"], result["count"], now)
+                if result["action"] == "out":
+                    scale_outs += 1
+                    if sim.get("pending_pods"):
+                        waiting_since = now - sim.get("pending_oldest_s", 0.0)
+                else:
+                    scale_ins += 1
+        timeline.append({"time": now, "workers": provisioner.workers,
+                         "utilization": max(sim.get("cpu_utilization", 0.0), sim.get("memory_utilization", 0.0)),
+                         "pending_pods": sim.get("pending_pods", 0), **result})
+    summary = {
+        "observations": len(timeline),
+        "scale_outs": scale_outs,
+        "scale_ins": scale_ins,
+        "final_workers": provisioner.workers,
+        "pending_to_ready_s": pending_to_ready,
+    }
+    return timeline, summary
@@ -0,0 +1,374 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import bench_fake_tools
+
+# ==========================================
+# Offline Bring-Up / Teardown Benchmark
+# ==========================================
+# Runs cluster_up.py and cluster_down.py end to end against fake terraform,
+# ansible, ssh, scp, ssh-keygen and kubectl binaries (bench_fake_tools.py)
+# for several node counts and reports the wall time of every phase. Each run
+# gets its own copy of hetzner/ and ansible/ and its own HOME, so the real
+# tmpfiles, known_hosts and plugin cache are never touched. Tool latencies
+# are fixed (no jitter) and the probe backoff is seeded, so results are
+# comparable between commits.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, ".."))
+
+# Seconds per call and seconds per node, keyed like --latency
+DEFAULT_LATENCY = {
+    "terraform init": (0.2, 0.0),
+    "terraform apply": (0.5, 0.01),
+    "terraform output": (0.1, 0.0),
+    "terraform destroy": (0.5, 0.01),
+    "ansible-playbook": (0.5, 0.02),
+    "ssh": (0.01, 0.0),
+    "scp": (0.05, 0.0),
+    "kubectl": (0.1, 0.0),
+    "default": (0.0, 0.0),
+}
+
+RUN_TITLES = {"bake": "bake-image", "up": "cluster_up", "down": "cluster_down"}
+
+# Runs the script in-process after pointing the bastion banner probe at the
+# local banner server and seeding the backoff jitter
+BOOTSTRAP = """
+import os, random, runpy, sys
+sys.path.insert(0, os.getcwd())
+import ssh_probe
+ssh_probe.SSH_PORT = int(os.environ["BENCH_SSH_PORT"])
+random.seed(int(os.environ["BENCH_SEED"]))
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+# ==========================================
+# 1. Workspace & Fake Tools
+# ==========================================
+def make_workspace(root):
+    """Copies hetzner/ and ansible/ into root (without state or tmpfiles) and creates bin/ and home/."""
+    ignore = shutil.ignore_patterns("tmpfile_*", ".terraform", "__pycache__", "*.tfstate*", "clusters")
+    shutil.copytree(SCRIPT_DIR, os.path.join(root, "hetzner"), ignore=ignore)
+    shutil.copytree(os.path.join(REPO_DIR, "ansible"), os.path.join(root, "ansible"), ignore=ignore)
+
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir)
+    fake_tools = os.path.join(root, "hetzner", "bench_fake_tools.py")
+    for tool in bench_fake_tools.TOOLS:
+        path = os.path.join(bin_dir, tool)
+        with open(path, "w") as f:
+            f.write(f'#!/bin/sh\nexec "{sys.executable}" "{fake_tools}" {tool} "$@"\n')
+        os.chmod(path, 0o755)
+
+    home = os.path.join(root, "home")
+    os.makedirs(os.path.join(home, ".ssh"))
+    key_path = os.path.join(home, ".ssh", "id_bench")
+    with open(key_path, "w") as f:
+        f.write("bench private key\n")
+    with open(key_path + ".pub", "w") as f:
+        f.write("ssh-ed25519 AAAAbench bench\n")
+    os.chmod(key_path, 0o600)
+    return bin_dir, home, key_path
+
+
+class BannerServer:
+    """Answers every TCP connection with an SSH banner (the bastion's port 22)."""
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(64)
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            try:
+                conn.sendall(bench_fake_tools.SSH_BANNER)
+            except OSError:
+                pass
+            finally:
+                conn.close()
+
+    def close(self):
+        self.sock.close()
+
+# ==========================================
+# 2. Runs
+# ==========================================
+def report_dir(workspace, script_args):
+    """Directory the script writes its report to: hetzner/, or the named cluster's workspace."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--cluster-name")
+    name = parser.parse_known_args(script_args)[0].cluster_name
+    if name:
+        return os.path.join(workspace, "hetzner", "clusters", name)
+    return os.path.join(workspace, "hetzner")
+
+
+def read_span_attr(report_path, name):
+    """The last value of a span attribute in a phase report (None if never set)."""
+    value = None
+    try:
+        with open(report_path, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("type") == "span" and name in record.get("attrs", {}):
+                    value = record["attrs"][name]
+    except FileNotFoundError:
+        pass
+    return value
+
+
+def read_spans(report_path):
+    """Returns ({span name: wall_s}, {span name: status}) from a phase report."""
+    walls, statuses = {}, {}
+    try:
+        with open(report_path, "r") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("type") == "span":
+                    walls[record["name"]] = record["wall_s"] or 0.0
+                    statuses[record["name"]] = record["status"]
+    except FileNotFoundError:
+        pass
+    return walls, statuses
+
+
+def read_calls(state_dir):
+    calls = []
+    try:
+        with open(os.path.join(state_dir, "calls.jsonl"), "r") as f:
+            calls = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        pass
+    return calls
+
+
+def run_script(workspace, script, script_args, env, timeout, log):
+    """Runs hetzner/<script> through BOOTSTRAP; returns (exit code, wall seconds)."""
+    hetzner_dir = os.path.join(workspace, "hetzner")
+    start = time.perf_counter()
+    try:
+        rc = subprocess.call([sys.executable, "-c", BOOTSTRAP, script] + script_args,
+                             cwd=hetzner_dir, env=env, stdout=log, stderr=subprocess.STDOUT,
+                             stdin=subprocess.DEVNULL, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        rc = "timeout"
+    return rc, time.perf_counter() - start
+
+
+def bench_once(node_count, latency, failures, seed, timeout, keep_dir, verbose, up_args=(), down_args=(), bake=False):
+    """
+    One full up + down run in a fresh workspace, with bake=True preceded by
+    'cluster_ctl.py bake-image' and booting cluster_up.py from its snapshot.
+    Returns a result dict per script.
+    """
+    workspace = tempfile.mkdtemp(prefix=f"pmk-bench-{node_count}n-")
+    banner = BannerServer()
+    try:
+        bin_dir, home, key_path = make_workspace(workspace)
+        state_dir = os.path.join(workspace, "state")
+        os.makedirs(state_dir)
+
+        env = os.environ.copy()
+        for key in list(env):
+            if key.startswith(("TF_", "ANSIBLE_", "KUBECONFIG")):
+                del env[key]
+        env.update({
+            "PATH": bin_dir + os.pathsep + env.get("PATH", ""),
+            "HOME": home,
+            "BENCH_STATE_DIR": state_dir,
+            "BENCH_NODES": str(node_count),
+            "BENCH_LATENCY": json.dumps(latency),
+            "BENCH_FAIL": json.dumps(failures),
+            "BENCH_SSH_PORT": str(banner.port),
+            "BENCH_SEED": str(seed),
+        })
+        common = [
+            "--hetzner-zone-domain", "bench.invalid",
+            "--hetzner-token", "bench-token",
+            "--ssh-public-key-path", key_path + ".pub",
+            "--ssh-private-key-path", key_path,
+            "--acme-email", "bench@bench.invalid",
+        ]
+        up_args, down_args = list(up_args), list(down_args)
+        runs = [
+            ("up", "cluster_up.py", common + ["--workers", str(node_count - 1)] + up_args, "tmpfile_provision_report.jsonl"),
+            ("down", "cluster_down.py", common + down_args, "tmpfile_teardown_report.jsonl"),
+        ]
+        if bake:
+            bake_args = ["bake-image"] + [a for a in common if a not in ("--hetzner-zone-domain", "bench.invalid",
+                                                                         "--acme-email", "bench@bench.invalid")]
+            runs.insert(0, ("bake", "cluster_ctl.py", bake_args, "tmpfile_bake_report.jsonl"))
+
+        results = {}
+        log_path = os.path.join(workspace, "bench.log")
+        with open(log_path, "w") as log:
+            for label, script, script_args, report_name in runs:
+                if label == "up" and bake:
+                    snapshot_id = read_span_attr(os.path.join(workspace, "hetzner", "tmpfile_bake_report.jsonl"), "snapshot_id")
+                    script_args = script_args + ["--snapshot", str(snapshot_id)]
+                calls_before = len(read_calls(state_dir))
+                rc, wall = run_script(workspace, script, script_args, env, timeout, log)
+                phases, statuses = read_spans(os.path.join(report_dir(workspace, script_args), report_name))
+                calls = read_calls(state_dir)[calls_before:]
+                results[label] = {
+                    "rc": rc,
+                    "wall_s": wall,
+                    "phases": phases,
+                    "failed_phases": sorted(name for name, status in statuses.items() if status == "failed"),
+                    "tool_calls": len(calls),
+                    "tool_time_s": sum(c["duration_s"] for c in calls),
+                }
+        if verbose:
+            with open(log_path, "r") as f:
+                sys.stdout.write(f.read())
+        return results
+    finally:
+        banner.close()
+        if keep_dir:
+            print(f"  workspace kept: {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+# ==========================================
+# 3. Report
+# ==========================================
+def summarize(runs):
+    """Medians over the repetitions of one node count."""
+    summary = {}
+    for label in runs[0]:
+        results = [r[label] for r in runs]
+        names = []
+        for r in results:
+            names += [n for n in r["phases"] if n not in names]
+        summary[label] = {
+            "wall_s": round(statistics.median(r["wall_s"] for r in results), 2),
+            "phases": {n: round(statistics.median(r["phases"].get(n, 0.0) for r in results), 2) for n in names},
+            "tool_calls": int(statistics.median(r["tool_calls"] for r in results)),
+            "tool_time_s": round(statistics.median(r["tool_time_s"] for r in results), 2),
+            "failed_runs": sum(1 for r in results if r["rc"] != 0),
+        }
+    return summary
+
+
+def print_table(summaries):
+    node_counts = sorted(summaries)
+    header = f"  {'phase':<28}" + "".join(f"{str(n) + ' nodes':>12}" for n in node_counts)
+    for label in summaries[node_counts[0]]:
+        print(f"\n--- {RUN_TITLES[label]} (median wall seconds) ---")
+        print(header)
+        names = []
+        for n in node_counts:
+            names += [p for p in summaries[n][label]["phases"] if p not in names]
+        for name in names:
+            row = "".join(f"{summaries[n][label]['phases'].get(name, 0.0):12.2f}" for n in node_counts)
+            print(f"  {name:<28}{row}")
+        for key, fmt in (("wall_s", "{:12.2f}"), ("tool_time_s", "{:12.2f}"),
+                         ("tool_calls", "{:12d}"), ("failed_runs", "{:12d}")):
+            row = "".join(fmt.format(summaries[n][label][key]) for n in node_counts)
+            print(f"  {key:<28}{row}")
+
+# ==========================================
+# 4. Main Execution Flow
+# ==========================================
+def parse_latency(specs, zero):
+    latency = {} if zero else dict(DEFAULT_LATENCY)
+    for spec in specs:
+        key, _, value = spec.rpartition("=")
+        base, _, per_node = value.partition(",")
+        try:
+            latency[key.strip()] = (float(base), float(per_node or 0))
+        except ValueError:
+            print(f"Error: invalid --latency '{spec}' (expected 'tool[ subcommand]=SECONDS[,PER_NODE]').")
+            sys.exit(1)
+    return latency
+
+
+def parse_failures(specs):
+    failures = {}
+    for spec in specs:
+        key, _, count = spec.rpartition("=")
+        if not key or not count.isdigit():
+            print(f"Error: invalid --fail '{spec}' (expected 'tool[ subcommand]=N').")
+            sys.exit(1)
+        failures[key.strip()] = int(count)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cluster_up.py/cluster_down.py offline with fake terraform/ansible/ssh/kubectl.")
+    parser.add_argument("--nodes", default="2,5,10", help="Comma-separated node counts (control plane included, at least 2)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per node count; the report shows medians")
+    parser.add_argument("--latency", action="append", default=[],
+                        help="Latency of a fake tool, e.g. 'terraform apply=3' or 'ansible-playbook=2,0.1' (seconds, seconds per node)")
+    parser.add_argument("--zero-latency", action="store_true", help="Start from zero latency for all tools (pure orchestration overhead)")
+    parser.add_argument("--fail", action="append", default=[],
+                        help="Make the first N calls of a tool fail, e.g. 'ssh=3' or 'terraform apply=1'")
+    parser.add_argument("--up-arg", action="append", default=[], help="Extra cluster_up.py argument, e.g. --up-arg=--node-cache")
+    parser.add_argument("--down-arg", action="append", default=[], help="Extra cluster_down.py argument, e.g. --down-arg=--fast")
+    parser.add_argument("--bake", action="store_true", help="Run 'cluster_ctl.py bake-image' first and boot cluster_up.py from its snapshot")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the SSH probe backoff jitter")
+    parser.add_argument("--timeout", type=int, default=600, help="Timeout per script run in seconds")
+    parser.add_argument("--json", help="Also write the results to this file (for comparing commits)")
+    parser.add_argument("--keep-workdir", action="store_true", help="Keep the per-run workspaces (logs, reports, fake state)")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of every run")
+    args = parser.parse_args()
+
+    try:
+        node_counts = sorted({int(n) for n in args.nodes.split(",")})
+    except ValueError:
+        print(f"Error: invalid --nodes '{args.nodes}'.")
+        sys.exit(1)
+    if node_counts[0] < 2:
+        print("Error: every cluster needs at least 2 nodes (node-2 is the volume node and bastion).")
+        sys.exit(1)
+    latency = parse_latency(args.latency, args.zero_latency)
+    failures = parse_failures(args.fail)
+
+    summaries = {}
+    for node_count in node_counts:
+        runs = []
+        for i in range(args.repeat):
+            print(f"Benchmarking {node_count} nodes, run {i + 1}/{args.repeat}...")
+            result = bench_once(node_count, latency, failures, args.seed + i, args.timeout,
+                                args.keep_workdir, args.verbose, args.up_arg, args.down_arg, args.bake)
+            for label, r in result.items():
+                failed = f", failed phases: {', '.join(r['failed_phases'])}" if r["failed_phases"] else ""
+                print(f"  {RUN_TITLES[label]}: {r['wall_s']:.2f}s (exit {r['rc']}, {r['tool_calls']} tool calls{failed})")
+            runs.append(result)
+        summaries[node_count] = summarize(runs)
+
+    print_table(summaries)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "latency": {k: list(v) for k, v in sorted(latency.items())},
+                "failures": failures,
+                "repeat": args.repeat,
+                "results": {str(n): summaries[n] for n in node_counts},
+            }, f, indent=2, sort_keys=True)
+        print(f"\nResults saved to: {args.json}")
+
+    if any(s["failed_runs"] for n in node_counts for s in summaries[n].values()) and not failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import fcntl
+import json
+import os
+import socket
+import sys
+import time
+
+import manifest_pipeline
+
+# ==========================================
+# Fake CLI Tools for bench.py
+# ==========================================
+# bench.py puts a wrapper per tool on PATH that runs
+#   python3 bench_fake_tools.py <tool> <args...>
+# Every call sleeps for its configured latency, may be made to fail, and is
+# logged to calls.jsonl in BENCH_STATE_DIR. Configuration (all set by bench.py):
+#   BENCH_STATE_DIR  per-run directory for terraform state, counters and the call log
+#   BENCH_NODES      node count of the canned 'terraform output -json' fallback
+#   BENCH_SNAPSHOT_ID id of the snapshot the fake terraform-bake root creates
+#   BENCH_LATENCY    JSON {"<tool>" or "<tool> <subcommand>": [seconds, seconds_per_node]}
+#   BENCH_FAIL       JSON {"<tool>" or "<tool> <subcommand>": number of first calls that fail}
+
+TOOLS = ["terraform", "ansible", "ansible-playbook", "ssh", "scp", "ssh-keygen", "kubectl"]
+SSH_BANNER = b"SSH-2.0-OpenSSH_9.2p1 bench\r\n"
+
+
+def canned_terraform_output(node_count):
+    """'terraform output -json' of hetzner/terraform for node_count servers (node-1 = control plane)."""
+    public_ips = {}
+    private_ips = {}
+    for i in range(node_count):
+        name = f"node-{i + 1}"
+        # node-2 is the bastion; bench.py serves its SSH banner on 127.0.0.1
+        public_ips[name] = "127.0.0.1" if i == 1 else f"192.0.2.{(i % 250) + 1}"
+        private_ips[name] = f"10.0.1.{10 + i}"
+    output = {
+        "server_public_ips": public_ips,
+        "server_private_ips": private_ips,
+        "bastion_ip": {"node-2": public_ips["node-2"]} if node_count > 1 else {},
+        "dns_root_record_ip": {"node-1": public_ips["node-1"]},
+        "volume_node_ip": {"node-2": public_ips["node-2"]} if node_count > 1 else {},
+        "volume_id": 1,
+    }
+    return {key: {"sensitive": False, "type": "string", "value": value} for key, value in output.items()}
+
+
+def _bake_terraform(sub, args, state_path):
+    """hetzner/terraform-bake: one build server (bake_ip) and, with create_snapshot=true, a snapshot."""
+    try:
+        with open(state_path, "r") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        state = None
+    if sub == "apply":
+        state = state or {}
+        if "create_snapshot=true" in args:
+            state["snapshot_id"] = int(os.environ.get("BENCH_SNAPSHOT_ID", "4242"))
+    elif sub == "state" and "rm" in args and state:
+        # Forgetting the snapshot keeps it when the server is destroyed
+        if "hcloud_snapshot.image[0]" in args:
+            state.pop("snapshot_id", None)
+    elif sub == "output":
+        output = {}
+        if state is not None:
+            # Served by bench.py's banner server like the bastion
+            output = {"bake_ip": "127.0.0.1", "snapshot_id": state.get("snapshot_id")}
+        print(json.dumps({key: {"sensitive": False, "type": "string", "value": value} for key, value in output.items()}))
+        return 0
+    elif sub == "destroy":
+        state = None
+    if state is None:
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    else:
+        with open(state_path, "w") as f:
+            json.dump(state, f)
+    return 0
+
+
+def _subcommand(tool, args):
+    if tool in ("terraform", "kubectl"):
+        return next((a for a in args if not a.startswith("-")), "")
+    return ""
+
+
+def _match(config, tool, sub):
+    """Looks up '<tool> <sub>' first, then '<tool>', then 'default'."""
+    for key in (f"{tool} {sub}", tool, "default"):
+        if key in config:
+            return config[key]
+    return None
+
+
+def _take_failure(state_dir, key, limit):
+    """True for the first `limit` calls of key (counted across processes)."""
+    path = os.path.join(state_dir, "fail_counters.json")
+    with open(path, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        counters = json.loads(content) if content else {}
+        used = counters.get(key, 0)
+        if used >= limit:
+            return False
+        counters[key] = used + 1
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(counters))
+        return True
+
+
+def _log(state_dir, record):
+    line = (json.dumps(record) + "\n").encode()
+    fd = os.open(os.path.join(state_dir, "calls.jsonl"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+# ------------------------------------------
+# Tool behaviour
+# ------------------------------------------
+def _terraform(args, state_dir, node_count):
+    root = os.path.basename(os.getcwd())
+    cluster = os.environ.get("TF_VAR_cluster_name") or "default"
+    state_path = os.path.join(state_dir, f"terraform-{cluster}-{root}.json")
+    sub = _subcommand("terraform", args)
+    if sub == "init":
+        os.makedirs(".terraform", exist_ok=True)
+    elif root == "terraform-bake":
+        return _bake_terraform(sub, args, state_path)
+    elif sub == "apply":
+        workers = int(os.environ.get("TF_VAR_worker_count", node_count - 1))
+        with open(state_path, "w") as f:
+            json.dump({"node_count": workers + 1}, f)
+    elif sub == "destroy":
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    elif sub == "state" and "list" in args:
+        if os.path.exists(state_path):
+            print("\n".join(f"fake_resource.{root.replace('-', '_')}[{i}]" for i in range(node_count)))
+    elif sub == "state" and "rm" in args:
+        if os.path.exists(state_path):
+            os.remove(state_path)
+    elif sub == "output":
+        try:
+            with open(state_path, "r") as f:
+                applied = json.load(f)
+        except FileNotFoundError:
+            applied = None
+        if root == "terraform" and applied:
+            print(json.dumps(canned_terraform_output(applied["node_count"])))
+        else:
+            print("{}")
+    return 0
+
+
+def _kubectl(args):
+    if _subcommand("kubectl", args) == "get" and "-" in args:
+        # 'get -f -': every object sent exists, like after a successful apply
+        items = []
+        for doc in manifest_pipeline.split_documents(sys.stdin.read()):
+            api_version, kind, namespace, name = manifest_pipeline.object_key(doc).rsplit("/", 3)
+            metadata = {"name": name, "namespace": namespace} if namespace else {"name": name}
+            items.append({"apiVersion": api_version, "kind": kind, "metadata": metadata})
+        print(json.dumps({"apiVersion": "v1", "kind": "List", "items": items}))
+    return 0
+
+
+def _serve_socks5(port):
+    """Accepts every SOCKS5 CONNECT, like 'ssh -D' in front of a healthy API server."""
+    server = socket.socket()
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        server.bind(("127.0.0.1", port))
+    except OSError as e:
+        print(f"bind [127.0.0.1]:{port}: {e}", file=sys.stderr)
+        return 255
+    server.listen(16)
+    while True:
+        conn, _ = server.accept()
+        try:
+            conn.recv(3)
+            conn.sendall(b"\x05\x00")
+            conn.recv(262)
+            conn.sendall(b"\x05\x00\x00\x01" + b"\x00" * 6)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+
+def _ssh(args):
+    if "-D" in args:
+        return _serve_socks5(int(args[args.index("-D") + 1].rsplit(":", 1)[-1]))
+    if "-W" in args:
+        # Banner of the target host, then hold the stream open like a real forward
+        sys.stdout.buffer.write(SSH_BANNER)
+        sys.stdout.flush()
+        sys.stdin.read()
+        return 0
+    return 0
+
+
+def _scp(args):
+    # Only used to download the kubeconfig from the control plane
+    with open(args[-1], "w") as f:
+        f.write("\n".join([
+            "apiVersion: v1",
+            "clusters:",
+            "- cluster:",
+            "    certificate-authority-data: YmVuY2g=",
+            "    server: https://10.0.1.10:6443",
+            "  name: kubernetes",
+            "kind: Config",
+            "",
+        ]))
+    return 0
+
+
+def main():
+    tool, args = sys.argv[1], sys.argv[2:]
+    state_dir = os.environ["BENCH_STATE_DIR"]
+    node_count = int(os.environ.get("BENCH_NODES", "2"))
+    latency = json.loads(os.environ.get("BENCH_LATENCY", "{}"))
+    failures = json.loads(os.environ.get("BENCH_FAIL", "{}"))
+    sub = _subcommand(tool, args)
+    start = time.time()
+
+    base, per_node = _match(latency, tool, sub) or (0.0, 0.0)
+    time.sleep(base + per_node * node_count)
+
+    key = f"{tool} {sub}" if f"{tool} {sub}" in failures else tool
+    rc = None
+    if key in failures and _take_failure(state_dir, key, failures[key]):
+        print(f"{tool}: injected failure ({key})", file=sys.stderr)
+        rc = 1
+
+    # Long-running calls ('ssh -D') are logged before they start serving
+    _log(state_dir, {"tool": tool, "sub": sub, "start": round(start, 3),
+                     "duration_s": round(time.time() - start, 3), "rc": rc or 0})
+    if rc:
+        return rc
+    if tool == "terraform":
+        return _terraform(args, state_dir, node_count)
+    if tool == "ssh":
+        return _ssh(args)
+    if tool == "scp":
+        return _scp(args)
+    if tool == "kubectl":
+        return _kubectl(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
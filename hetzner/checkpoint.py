@@ -0,0 +1,115 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+# ==========================================
+# Content-Hash Checkpoints
+# ==========================================
+# Each completed task is recorded with a digest of its inputs (file contents,
+# CLI values) chained with the digests of the tasks it depends on. On a re-run
+# a task whose digest matches the recorded one is skipped, so only what is
+# downstream of a change is redone.
+
+class Files:
+    """
+    Task input made of file contents. Accepts files, directories (walked
+    recursively) and glob patterns; missing paths hash as absent.
+    """
+    SKIP_DIRS = {".terraform", "__pycache__", ".git"}
+
+    def __init__(self, *patterns):
+        self.patterns = patterns
+
+    def paths(self):
+        found = set()
+        for pattern in self.patterns:
+            matches = glob.glob(pattern) if glob.has_magic(pattern) else [pattern]
+            for match in matches:
+                if os.path.isdir(match):
+                    for root, dirs, files in os.walk(match):
+                        dirs[:] = [d for d in dirs if d not in self.SKIP_DIRS]
+                        found.update(os.path.join(root, f) for f in files)
+                else:
+                    found.add(match)
+        return sorted(found)
+
+    def update(self, h):
+        for path in self.paths():
+            h.update(path.encode() + b"\0")
+            try:
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 16), b""):
+                        h.update(chunk)
+            except FileNotFoundError:
+                h.update(b"<missing>")
+            h.update(b"\0")
+
+
+class Checkpoint:
+    """
+    Per-cluster checkpoint file: {task_name: {"digest": ..., "completed_at": ...}}.
+    With enabled=False nothing is skipped, but completed tasks are still
+    recorded so the next run can skip them.
+    """
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    @staticmethod
+    def digest(name, inputs, dep_digests):
+        """
+        Digest of a task: its name, its own inputs and its dependencies'
+        digests. inputs=None marks a task that always runs; it still gets a
+        digest so changes keep propagating through it.
+        """
+        h = hashlib.sha256(name.encode() + b"\0")
+        if inputs is None:
+            h.update(b"<always>")
+        else:
+            for item in inputs:
+                if isinstance(item, Files):
+                    item.update(h)
+                else:
+                    h.update(json.dumps(item, sort_keys=True, default=str).encode())
+                h.update(b"\1")
+        for dep_digest in dep_digests:
+            h.update(dep_digest.encode())
+        return h.hexdigest()
+
+    def is_current(self, name, digest, outputs=()):
+        """True if the task completed before with the same digest and its outputs still exist."""
+        if not self.enabled:
+            return False
+        entry = self.entries.get(name)
+        if not entry or entry.get("digest") != digest:
+            return False
+        return all(os.path.exists(p) for p in outputs)
+
+    def record(self, name, digest):
+        with self._lock:
+            self.entries[name] = {"digest": digest, "completed_at": round(time.time(), 3)}
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def forget(self, name):
+        with self._lock:
+            self.entries.pop(name, None)
+
+
+def clear(path):
+    """Deletes a checkpoint file, e.g. after the cluster was destroyed."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,57 @@
+import argparse
+import sys
+
+import ctl_autoscale
+import ctl_bake
+import ctl_batch
+import ctl_metrics
+import ctl_pool
+import ctl_scale
+import ctl_storage
+import ctl_tf_cache
+import ctl_timings
+import ctl_tunnel
+import workspace
+
+# ==========================================
+# Day-2 Operations
+# ==========================================
+# Parses the command line and dispatches to the subcommand modules
+# (ctl_<feature>.py); shared paths and helpers are in ctl_common.py.
+SUBCOMMAND_MODULES = [
+    ctl_tunnel,
+    ctl_tf_cache,
+    ctl_bake,
+    ctl_scale,
+    ctl_timings,
+    ctl_batch,
+    ctl_pool,
+    ctl_metrics,
+    ctl_autoscale,
+    ctl_storage,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Day-2 operations for the Hetzner cluster created by cluster_up.py.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for module in SUBCOMMAND_MODULES:
+        module.add_parsers(subparsers)
+
+    # Everything after '--' belongs to the scripts run by 'batch' / 'pool fill'
+    argv = sys.argv[1:]
+    script_args = []
+    if "--" in argv:
+        argv, script_args = argv[:argv.index("--")], argv[argv.index("--") + 1:]
+    args = parser.parse_args(argv)
+    if script_args and args.command not in ("batch", "pool"):
+        parser.error("arguments after '--' are only used by 'batch' and 'pool fill'")
+    args.script_args = script_args
+    error = workspace.validate_name(getattr(args, "cluster_name", None))
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
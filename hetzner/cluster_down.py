@@ -3,137 +3,46 @@ import subprocess
 import os
 import sys
 import json
-import time
 import atexit
 import shutil
 
+import checkpoint
+import cluster_up
+import known_hosts
+import manifest_pipeline
+import phase_report
+import socks_tunnel
+import ssh_config
+import tf_plugins
+import tunnel_daemon
+import workspace
+
 # ==========================================
 # 1. Helper Functions
 # ==========================================
 
-def cleanup_known_hosts(tf_output_path):
-    """
-    Removes the cluster's public and private IPs from the user's known_hosts file
-    to prevent 'Remote Host Identification Has Changed' errors.
-    """
-    print("\n--- Cleaning up known_hosts for cluster IPs ---")
-    try:
-        with open(tf_output_path, 'r') as f:
-            data = json.load(f)
-        
-        ips_to_clean = set()
-        
-        # Collect Public IPs
-        public_ips = data.get('server_public_ips', {}).get('value', {})
-        for ip in public_ips.values():
-            ips_to_clean.add(ip)
-        
-        # Collect Private IPs
-        private_ips = data.get('server_private_ips', {}).get('value', {})
-        for ip in private_ips.values():
-            ips_to_clean.add(ip)
-            
-        for ip in ips_to_clean:
-            # We clean both the raw IP and the IP with port 22 (common variation)
-            subprocess.call(["ssh-keygen", "-R", ip], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            subprocess.call(["ssh-keygen", "-R", f"[{ip}]:22"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-    except Exception as e:
-        # If the file doesn't exist yet or json is bad, just warn and move on
-        print(f"Warning: Failed to clean known_hosts (might be expected if cluster is already gone): {e}")
-
 def get_cluster_info(tf_output_path):
     """
-    Parses Terraform output to get Master Public IP (for MetalLB), 
-    Master Private IP (for SCP), and Bastion IP.
+    cluster_up.get_cluster_info, or (None, None, None) when the Terraform
+    output is missing or unreadable.
     """
     try:
-        with open(tf_output_path, 'r') as f:
-            data = json.load(f)
+        return cluster_up.get_cluster_info(tf_output_path)
     except (FileNotFoundError, json.JSONDecodeError):
         return None, None, None
-    
-    # Get Root/Master info
-    dns_root = data.get('dns_root_record_ip', {}).get('value', {})
-    master_public_ip = next(iter(dns_root.values())) if dns_root else None
-    
-    # Determine Master Private IP
-    private_ips = data.get('server_private_ips', {}).get('value', {})
-    master_node_name = next(iter(dns_root.keys())) if dns_root else None
-    master_private_ip = private_ips.get(master_node_name)
-    
-    # Determine Bastion IP
-    public_ips = data.get('server_public_ips', {}).get('value', {})
-    bastion_ip = None
-    for node, ip in public_ips.items():
-        if ip != master_public_ip:
-            bastion_ip = ip
-            break
-    if not bastion_ip and public_ips:
-        bastion_ip = list(public_ips.values())[0]
-        
-    return master_public_ip, master_private_ip, bastion_ip
 
-def start_socks_proxy(bastion_ip, master_ip, ssh_key_path):
+def forget_terraform_state(tf_dir, env, span=None):
     """
-    Starts a background SSH SOCKS5 proxy on localhost:1080.
-    Returns the subprocess object.
+    Removes every resource from the Terraform state of tf_dir without
+    destroying it (for in-cluster resources of servers about to be deleted).
+    Returns the number of removed addresses.
     """
-    print("Establishing SOCKS5 tunnel for Terraform...")
-    
-    # Common SSH options to avoid prompts and suppress output
-    # options are placed BEFORE arguments to ensure they are parsed correctly
-    ssh_opts = [
-        "-o", "StrictHostKeyChecking=no",     # Accept new keys automatically
-        "-o", "UserKnownHostsFile=/dev/null", # Do not read or write to user's known_hosts
-        "-o", "GlobalKnownHostsFile=/dev/null",
-        "-o", "CheckHostIP=no",               # Do not verify IP address in known_hosts
-        "-D", "1080",  # Dynamic forwarding (SOCKS)
-        "-q",          # Quiet mode
-        "-N"           # Do not execute a remote command (just forward ports)
-    ]
-
-    if bastion_ip:
-        # We use ProxyCommand instead of -J to explicitly force StrictHostKeyChecking=no 
-        # on the bastion connection as well.
-        proxy_cmd = (
-            f"ssh "
-            "-o StrictHostKeyChecking=no "
-            "-o UserKnownHostsFile=/dev/null "
-            "-o GlobalKnownHostsFile=/dev/null "
-            "-o CheckHostIP=no "
-            f"-i {ssh_key_path} "
-            "-W %h:%p "
-            "-q "
-            f"root@{bastion_ip}"
-        )
-        
-        # Options first, then ProxyCommand, then Identity, then Target
-        cmd = ["ssh"] + ssh_opts + [
-            "-o", f"ProxyCommand={proxy_cmd}",
-            "-i", ssh_key_path,
-            f"root@{master_ip}"
-        ]
-    else:
-        # Direct connection: Options first, then Identity, then Target
-        cmd = ["ssh"] + ssh_opts + [
-            "-i", ssh_key_path,
-            f"root@{master_ip}"
-        ]
-
-    # Start the process in the background
-    proc = subprocess.Popen(cmd)
-    
-    # Give it a moment to establish connection
-    time.sleep(3)
-    
-    # Check if it died immediately
-    if proc.poll() is not None:
-        print("Error: SSH proxy failed to start.")
-        return None
-        
-    print("SOCKS5 tunnel established on localhost:1080.")
-    return proc
+    listing = phase_report.check_output(["terraform", "state", "list"], span=span, cwd=tf_dir, env=env)
+    addresses = [line.strip() for line in listing.decode().splitlines() if line.strip()]
+    if addresses:
+        phase_report.check_call(["terraform", "state", "rm"] + addresses, span=span, cwd=tf_dir, env=env,
+                                stdout=subprocess.DEVNULL)
+    return len(addresses)
 
 # ==========================================
 # 2. Main Execution Flow
@@ -142,52 +51,104 @@ def main():
     parser = argparse.ArgumentParser(description="Destroy Hetzner Cluster and Kubernetes Resources.")
     
     parser.add_argument("--hetzner-zone-domain", required=True, help="The domain zone (e.g., example.com)")
-    parser.add_argument("--hetzner-token", required=True, help="Hetzner Cloud API Token")
+    parser.add_argument("--hetzner-token", default=os.environ.get(cluster_up.TOKEN_ENV), required=not os.environ.get(cluster_up.TOKEN_ENV),
+                        help=f"Hetzner Cloud API Token (default: ${cluster_up.TOKEN_ENV})")
     parser.add_argument("--ssh-public-key-path", required=True, help="Path to SSH public key")
     parser.add_argument("--ssh-private-key-path", required=True, help="Path to SSH private key")
     parser.add_argument("--acme-email", required=True, help="Email for Let's Encrypt (ACME)")
     
     # Optional flag to skip K8s destroy if user knows cluster is already dead
     parser.add_argument("--force-infra-only", action="store_true", help="Skip K8s resource destroy and go straight to Infrastructure destroy")
+    parser.add_argument("--fast", action="store_true", help="Don't contact the cluster: drop the K8s resources from Terraform state and destroy the infra with higher parallelism")
+    parser.add_argument("--cluster-name", help="Tear down the named cluster created with cluster_up.py --cluster-name")
+    parser.add_argument("--parallelism", type=int, help="Parallelism of the infra destroy (default: 50 with --fast, else Terraform's 10)")
+    parser.add_argument("--terraform-plugin-cache", default=tf_plugins.DEFAULT_CACHE_DIR, help="Provider plugin cache shared by all terraform calls")
+    parser.add_argument("--terraform-mirror", help="Filesystem provider mirror built with 'cluster_ctl.py tf-cache mirror' (used if it exists)")
 
     args = parser.parse_args()
 
+    error = workspace.validate_name(args.cluster_name)
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    ws = workspace.Workspace(args.cluster_name)
+
     # Directories
     script_dir = os.path.dirname(os.path.abspath(__file__))
     terraform_infra_dir = os.path.join(script_dir, "terraform")
     terraform_k8s_dir = os.path.join(script_dir, "terraform-kubernetes")
 
     # Files
-    tf_output_json_path = os.path.join(script_dir, "tmpfile_terraform_output.json")
-    local_kubeconfig_path = os.path.join(script_dir, "tmpfile_kube_config")
-    nginx_manifest_tmp = os.path.join(script_dir, "tmpfile_nginx-app-http-redirect.yaml")
+    tf_output_json_path = ws.path("tmpfile_terraform_output.json")
+    local_kubeconfig_path = ws.path("tmpfile_kube_config")
+    tunnel_kubeconfig_path = ws.path("tmpfile_kube_config_tunnel")
+    manifests_dir = ws.path(manifest_pipeline.RENDERED_DIR)
+    report_path = ws.path("tmpfile_teardown_report.jsonl")
+    ssh_config_path = ws.path("tmpfile_ssh_config")
+    tunnel_state_path = ws.path("tmpfile_tunnel_state.json")
+    checkpoint_path = ws.path("tmpfile_checkpoint.json")
+    ansible_fact_cache_dir = ws.path("tmpfile_ansible_facts")
+    terraformrc_path = ws.path("tmpfile_terraformrc")
     
     # Env Vars
     tf_env = os.environ.copy()
     tf_env["TF_VAR_hcloud_token"] = args.hetzner_token
     tf_env["TF_VAR_hetzner_zone_domain"] = args.hetzner_zone_domain
     tf_env["TF_VAR_ssh_public_key_path"] = args.ssh_public_key_path
+    tf_env = tf_plugins.terraform_env(
+        tf_env,
+        cache_dir=os.path.abspath(os.path.expanduser(args.terraform_plugin_cache)),
+        mirror_dir=os.path.abspath(os.path.expanduser(args.terraform_mirror)) if args.terraform_mirror else None,
+        cli_config_path=terraformrc_path
+    )
+
+    # Timing report: every step below is recorded as a span
+    report = phase_report.PhaseReport(report_path, "cluster_down")
+    atexit.register(report.close, "failed")
 
-    print(f"--- Starting Cluster Teardown ---")
+    print(f"--- Starting Cluster Teardown ({ws.label}) ---")
+
+    # Whatever happens below, the next cluster_up.py must not skip any phase
+    checkpoint.clear(checkpoint_path)
+    # Cached facts describe servers that are about to be destroyed
+    shutil.rmtree(ansible_fact_cache_dir, ignore_errors=True)
+
+    # A named cluster's Terraform data dirs live in its workspace; recreate
+    # them (from the remote state) when it is torn down from another checkout
+    if ws.name:
+        for label, root_dir in (("infra", terraform_infra_dir), ("k8s", terraform_k8s_dir)):
+            if os.path.isdir(ws.terraform_data_dir(root_dir)):
+                continue
+            with report.span(f"terraform_init_{label}") as span:
+                if phase_report.call(["terraform", "init"] + ws.terraform_init_args(root_dir), span=span,
+                                     cwd=root_dir, env=ws.terraform_env(tf_env, root_dir)) != 0:
+                    span.status = "failed"
 
     # ==========================================
     # Phase 1: Refresh Info (to enable K8s cleanup)
     # ==========================================
     print("\n--- Refreshing Terraform Output Information ---")
     try:
-        # We run 'output' just in case the tmpfile is missing or stale
-        # We need this to get IPs for the Proxy to clean up K8s resources
-        output_bytes = subprocess.check_output(
-            ["terraform", "output", "-json"], 
-            cwd=terraform_infra_dir, 
-            env=tf_env,
-            stderr=subprocess.DEVNULL
-        )
-        with open(tf_output_json_path, "wb") as f:
-            f.write(output_bytes)
+        if args.fast and os.path.exists(tf_output_json_path):
+            # Only needed for known_hosts; the file from cluster_up.py will do
+            print(f"Using {tf_output_json_path} (--fast)")
+        else:
+            # We run 'output' just in case the tmpfile is missing or stale
+            # We need this to get IPs for the Proxy to clean up K8s resources
+            with report.span("terraform_output_infra") as span:
+                output_bytes = phase_report.check_output(
+                    ["terraform", "output", "-json"], 
+                    span=span,
+                    cwd=terraform_infra_dir, 
+                    env=ws.terraform_env(tf_env, terraform_infra_dir),
+                    stderr=subprocess.DEVNULL
+                )
+                with open(tf_output_json_path, "wb") as f:
+                    f.write(output_bytes)
             
         # Clean known_hosts immediately after getting new info
-        cleanup_known_hosts(tf_output_json_path)
+        with report.span("cleanup_known_hosts"):
+            known_hosts.remove_cluster_hosts(tf_output_json_path)
         
     except subprocess.CalledProcessError:
         print("Warning: Could not get Terraform output. Infrastructure might already be partially destroyed.")
@@ -195,7 +156,24 @@ def main():
     # ==========================================
     # Phase 2: Kubernetes Resources Destroy
     # ==========================================
-    if not args.force_infra_only:
+    if args.fast:
+        # Helm releases, CRDs, MetalLB/cert-manager config and the NFS
+        # provisioner only exist inside the cluster and go away with the
+        # servers. DNS records, the volume and the servers are in the infra
+        # state and are still destroyed below.
+        print("\n--- Phase 1: Dropping Kubernetes Resources from Terraform State (--fast) ---")
+        with report.span("terraform_state_rm_k8s") as span:
+            try:
+                removed = forget_terraform_state(terraform_k8s_dir, ws.terraform_env(tf_env, terraform_k8s_dir), span=span)
+                span.attrs["removed"] = removed
+                print(f"Removed {removed} resources from the Kubernetes state.")
+            except subprocess.CalledProcessError:
+                print("Warning: Could not clean the Kubernetes state; the next cluster_up.py may try to update stale resources.")
+                span.status = "failed"
+        master_pub_ip, master_priv_ip, bastion_ip = get_cluster_info(tf_output_json_path)
+        if os.path.exists(ssh_config_path) and master_pub_ip:
+            ssh_config.close_masters(ssh_config_path, [ssh_config.BASTION_ALIAS, master_priv_ip if bastion_ip else master_pub_ip])
+    elif not args.force_infra_only:
         print("\n--- Phase 1: Destroying Kubernetes Resources ---")
         
         # We need IPs and Kubeconfig to destroy K8s resources
@@ -206,44 +184,77 @@ def main():
             target_ip_for_proxy = master_priv_ip if bastion_ip else master_pub_ip
             
             # Start Proxy
-            proxy_proc = start_socks_proxy(
-                bastion_ip=bastion_ip,
-                master_ip=target_ip_for_proxy,
-                ssh_key_path=args.ssh_private_key_path
-            )
+            with report.span("start_socks_proxy") as span:
+                with open(tf_output_json_path, 'r') as f:
+                    hosts = json.load(f).get('server_private_ips', {}).get('value', {})
+                ssh_config.write_ssh_config(
+                    ssh_config_path,
+                    hosts=hosts,
+                    bastion_ip=bastion_ip,
+                    ssh_key_path=os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+                )
+                try:
+                    probe_target = socks_tunnel.api_server_from_kubeconfig(local_kubeconfig_path)
+                    daemon = tunnel_daemon.find_running(tunnel_state_path)
+                    if daemon and socks_tunnel.socks5_connect(daemon["port"], *probe_target):
+                        # The daemon's ssh process is not ours; wrap it so the
+                        # rest of the flow only needs the port
+                        print(f"Using running tunnel daemon on localhost:{daemon['port']}.")
+                        tunnel = socks_tunnel.SocksTunnel(None, daemon["port"])
+                    else:
+                        tunnel = socks_tunnel.start_socks_proxy(
+                            bastion_ip=bastion_ip,
+                            master_ip=target_ip_for_proxy,
+                            ssh_key_path=args.ssh_private_key_path,
+                            probe_target=probe_target,
+                            ssh_config_path=ssh_config_path
+                        )
+                    cluster_up.patch_kubeconfig(local_kubeconfig_path, tunnel.proxy_url, tunnel_kubeconfig_path)
+                except socks_tunnel.TunnelError as e:
+                    print(f"Error: {e}")
+                    span.status = "failed"
+                    tunnel = None
 
             # Define cleanup for proxy
             def cleanup_proxy():
-                if proxy_proc and proxy_proc.poll() is None:
+                if tunnel and tunnel.alive():
                     print("Shutting down SOCKS5 tunnel...")
-                    proxy_proc.terminate()
+                    tunnel.stop()
 
-            if proxy_proc:
+            if tunnel:
                 atexit.register(cleanup_proxy)
                 
                 try:
                     # Update Env Vars for K8s phase
-                    tf_k8s_env = tf_env.copy()
+                    tf_k8s_env = ws.terraform_env(tf_env, terraform_k8s_dir)
                     tf_k8s_env["TF_VAR_metallb_ip"] = f"{master_pub_ip}/32"
                     tf_k8s_env["TF_VAR_acme_email"] = args.acme_email
-                    tf_k8s_env["TF_VAR_kube_config_path"] = local_kubeconfig_path
-                    tf_k8s_env["KUBECONFIG"] = local_kubeconfig_path
+                    tf_k8s_env["TF_VAR_kube_config_path"] = tunnel_kubeconfig_path
+                    tf_k8s_env["KUBECONFIG"] = tunnel_kubeconfig_path
 
                     print("\n--- Destroying Terraform (K8s) ---")
-                    subprocess.call(
-                        ["terraform", "destroy", "-auto-approve"], 
-                        cwd=terraform_k8s_dir, 
-                        env=tf_k8s_env
-                    )
-                    
-                    # Try to delete the example app if it exists
-                    # We use subprocess.call to not crash if it fails
-                    if os.path.exists(nginx_manifest_tmp):
-                         print("\n--- Deleting Nginx Example App ---")
-                         subprocess.call(
-                            ["kubectl", "delete", "-f", nginx_manifest_tmp, "--ignore-not-found=true"], 
+                    with report.span("terraform_destroy_k8s") as span:
+                        if phase_report.call(
+                            ["terraform", "destroy", "-auto-approve"], 
+                            span=span,
+                            cwd=terraform_k8s_dir, 
                             env=tf_k8s_env
-                         )
+                        ) != 0:
+                            span.status = "failed"
+                    
+                    # Try to delete the deployed manifests if they exist
+                    # We use call() to not crash if it fails
+                    if os.path.isdir(manifests_dir) and os.listdir(manifests_dir):
+                         print("\n--- Deleting Deployed Manifests ---")
+                         with report.span("delete_manifests") as span:
+                             if phase_report.call(
+                                ["kubectl", "delete", "-f", manifests_dir, "--ignore-not-found=true"], 
+                                span=span,
+                                env=tf_k8s_env
+                             ) != 0:
+                                 span.status = "failed"
+                             else:
+                                 manifest_pipeline.forget(ws.path(manifest_pipeline.APPLIED_STATE))
 
                 except Exception as e:
                     print(f"Error during K8s destroy: {e}")
@@ -251,6 +262,8 @@ def main():
                 finally:
                     cleanup_proxy()
                     atexit.unregister(cleanup_proxy)
+                    # The servers are about to go away; don't leave masters behind
+                    ssh_config.close_masters(ssh_config_path, [ssh_config.BASTION_ALIAS, target_ip_for_proxy])
             else:
                 print("Skipping K8s destroy: Could not establish SSH tunnel.")
         else:
@@ -264,19 +277,36 @@ def main():
     print(f"\n--- Phase 2: Destroying Infrastructure (Terraform) ---")
     
     # 1. Terraform Destroy (Infra)
-    try:
-        subprocess.check_call(
-            ["terraform", "destroy", "-auto-approve"], 
-            cwd=terraform_infra_dir, 
-            env=tf_env
-        )
-    except subprocess.CalledProcessError:
-        print("\nTerraform Infra Destroy failed. You may need to clean up manually via Hetzner Console.")
-        sys.exit(1)
+    destroy_cmd = ["terraform", "destroy", "-auto-approve"]
+    parallelism = args.parallelism or (50 if args.fast else None)
+    if parallelism:
+        destroy_cmd.append(f"-parallelism={parallelism}")
+    if args.fast:
+        # Every resource is deleted by ID; reading them all back first only costs API round trips
+        destroy_cmd.append("-refresh=false")
+    with report.span("terraform_destroy_infra", parallelism=parallelism or 10) as span:
+        try:
+            phase_report.check_call(
+                destroy_cmd, 
+                span=span,
+                cwd=terraform_infra_dir, 
+                env=ws.terraform_env(tf_env, terraform_infra_dir)
+            )
+        except subprocess.CalledProcessError:
+            print("\nTerraform Infra Destroy failed. You may need to clean up manually via Hetzner Console.")
+            sys.exit(1)
+
+    # The cluster is gone, so a tunnel daemon for it has nothing left to do
+    if tunnel_daemon.stop(tunnel_state_path):
+        print("Stopped tunnel daemon.")
 
     print("\n==============================================")
     print("       CLUSTER TEARDOWN COMPLETE")
     print("==============================================")
 
+    report.close("ok")
+    atexit.unregister(report.close)
+    report.print_summary()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
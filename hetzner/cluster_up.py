@@ -3,16 +3,32 @@ import subprocess
 import os
 import sys
 import json
-import time
 import atexit
 
+import ansible_cfg
+import checkpoint
+import phase_executor
+import known_hosts
+import manifest_pipeline
+import nfs_storage
+import phase_report
+import readiness
+import socks_tunnel
+import ssh_config
+import ssh_probe
+import task_timings
+import tf_plugins
+import tunnel_daemon
+import workspace
+
 # ==========================================
 # 1. Inventory Generation Logic
 # ==========================================
-def generate_inventory(input_file, output_file, ssh_key_path):
+def generate_inventory(input_file, output_file, ssh_key_path, ssh_config_path=None):
     """
     Generates an Ansible inventory INI file from a Terraform output JSON file.
-    Includes logic for [volume-node].
+    Includes logic for [volume-node]. When ssh_config_path is given, SSH
+    connections use that (multiplexed) config instead of inline options.
     """
     print(f"Generating Ansible inventory: {output_file}...")
     
@@ -28,10 +44,7 @@ def generate_inventory(input_file, output_file, ssh_key_path):
 
     # 1. Extract Data
     dns_root_records = tf_data.get('dns_root_record_ip', {}).get('value', {})
-    root_ip_address = next(iter(dns_root_records.values())) if dns_root_records else None
-    
     private_ips = tf_data.get('server_private_ips', {}).get('value', {})
-    public_ips = tf_data.get('server_public_ips', {}).get('value', {})
     
     # Extract Volume Node Info
     # This returns something like: {'node-2': '46.224.86.61'}
@@ -44,38 +57,25 @@ def generate_inventory(input_file, output_file, ssh_key_path):
         sys.exit(1)
 
     # 2. Determine Bastion Logic
-    bastion_ip = None
-    for node, ip in public_ips.items():
-        if ip != root_ip_address:
-            bastion_ip = ip
-            break 
-    
-    if not bastion_ip and public_ips:
-        bastion_ip = list(public_ips.values())[0]
+    bastion_ip = select_bastion_ip(tf_data)
 
     master_lines = []
     worker_lines = []
     volume_lines = []  # List to hold the alias for the volume node
     lines = []
     
-    # 3. Build [all] Section and identify roles
+    # 3. Build [all] Section and identify roles (single pass over the nodes)
     lines.append("[all]")
-    node_names = sorted(private_ips.keys())
-    worker_idx = 1
+    aliases = inventory_aliases(tf_data)
     
-    for node_name in node_names:
+    for node_name in sorted(private_ips, key=node_sort_key):
         private_ip = private_ips[node_name]
-        
-        # Determine Alias
+        host_alias = aliases[node_name]
         if node_name in dns_root_records:
-            host_alias = "k8s-control-plane"
-            lines.append(f"{host_alias} ansible_host={private_ip}")
             master_lines.append(host_alias)
         else:
-            host_alias = f"k8s-worker-node{worker_idx}"
-            lines.append(f"{host_alias}  ansible_host={private_ip}")
             worker_lines.append(host_alias)
-            worker_idx += 1
+        lines.append(f"{host_alias} ansible_host={private_ip} node_name={node_name}")
         
         # Check if this specific node is the volume node
         if node_name == volume_node_name:
@@ -104,7 +104,10 @@ def generate_inventory(input_file, output_file, ssh_key_path):
     lines.append(f"ansible_ssh_private_key_file={ssh_key_path}")
     
     # SSH Arguments
-    if bastion_ip:
+    if ssh_config_path:
+        lines.append(f"# bastion host and ControlMaster settings come from the generated ssh_config")
+        lines.append(f"ansible_ssh_common_args='-F {ssh_config_path}'")
+    elif bastion_ip:
         lines.append(f"# bastion host (Using IP: {bastion_ip})")
         proxy_cmd = f"ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -W %h:%p -q root@{bastion_ip}"
         lines.append(f"ansible_ssh_common_args='-o ProxyCommand=\"{proxy_cmd}\" -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null'")
@@ -116,63 +119,102 @@ def generate_inventory(input_file, output_file, ssh_key_path):
     with open(output_file, 'w') as f:
         f.write('\n'.join(lines))
     
-    print(f"Inventory saved successfully to {output_file}")
+    print(f"Inventory saved successfully to {output_file} ({len(private_ips)} hosts)")
+
+def node_sort_key(node_name):
+    """Sorts 'node-2' before 'node-10' so worker aliases follow node numbers."""
+    prefix, _, number = node_name.rpartition("-")
+    return (prefix, int(number)) if number.isdigit() else (node_name, 0)
+
+def inventory_aliases(tf_data):
+    """{node name: inventory alias}: the control plane, then the workers in node order."""
+    dns_root_records = tf_data.get('dns_root_record_ip', {}).get('value', {})
+    private_ips = tf_data.get('server_private_ips', {}).get('value', {})
+    aliases = {}
+    worker_idx = 1
+    for node_name in sorted(private_ips, key=node_sort_key):
+        if node_name in dns_root_records:
+            aliases[node_name] = "k8s-control-plane"
+        else:
+            aliases[node_name] = f"k8s-worker-node{worker_idx}"
+            worker_idx += 1
+    return aliases
+
+def fact_cache_servers(tf_output_path):
+    """
+    {inventory alias: server ID} for ansible_cfg.prune_fact_cache. Outputs
+    written before 'server_ids' existed fall back to the public IP.
+    """
+    with open(tf_output_path, 'r') as f:
+        tf_data = json.load(f)
+    server_ids = tf_data.get('server_ids', {}).get('value', {})
+    public_ips = tf_data.get('server_public_ips', {}).get('value', {})
+    return {alias: str(server_ids.get(name) or public_ips.get(name))
+            for name, alias in inventory_aliases(tf_data).items()}
+
+def select_bastion_ip(tf_data):
+    """
+    Returns the public IP of the SSH jump host. Uses the explicit 'bastion_ip'
+    output when present, otherwise the first public IP that is not the root
+    DNS record (the MetalLB IP), falling back to any public IP.
+    """
+    bastion = tf_data.get('bastion_ip', {}).get('value', {})
+    if bastion:
+        return next(iter(bastion.values()))
+
+    dns_root = tf_data.get('dns_root_record_ip', {}).get('value', {})
+    root_ip_address = next(iter(dns_root.values())) if dns_root else None
+    public_ips = tf_data.get('server_public_ips', {}).get('value', {})
+    for ip in public_ips.values():
+        if ip != root_ip_address:
+            return ip
+    return next(iter(public_ips.values()), None)
     
 # ==========================================
 # 2. Helper Functions
 # ==========================================
-def cleanup_known_hosts(tf_output_path):
+def wait_for_ssh(tf_output_path, ssh_key_path, timeout=300, span=None, ssh_config_path=None):
     """
-    Removes the cluster's public and private IPs from the user's known_hosts file
-    to prevent 'Remote Host Identification Has Changed' errors.
+    Probes every node's SSH port (through the bastion) until it answers with
+    a banner and accepts our key. Each host is retried on its own backoff
+    schedule and reported as soon as it is ready.
+    When a span is given, failed attempts are counted as its retries.
+    """
+    print(f"\n--- Waiting for SSH to be ready on all nodes (max {timeout}s) ---")
+    with open(tf_output_path, 'r') as f:
+        data = json.load(f)
+    hosts = data.get('server_private_ips', {}).get('value', {})
+    _, _, bastion_ip = get_cluster_info(tf_output_path)
+
+    def on_ready(probe):
+        print(f"  {probe.name} ({probe.ip}) ready after {probe.ready_after_s:.1f}s")
+
+    probes = ssh_probe.wait_for_hosts(hosts, bastion_ip, ssh_key_path, timeout=timeout,
+                                      on_ready=on_ready, ssh_config=ssh_config_path)
+
+    not_ready = [p for p in probes if p.ready_after_s is None]
+    if span is not None:
+        span.retries = sum(max(0, p.attempts - 1) for p in probes)
+        span.attrs["ready_after_s"] = {p.name: p.ready_after_s for p in probes}
+    if not_ready:
+        for p in not_ready:
+            print(f"  {p.name} ({p.ip}) unreachable: {p.last_error}")
+        print("\nTimeout: specific nodes are still unreachable.")
+        return False
+    print("\nSSH is ready on all nodes!")
+    return True
+
+def existing_worker_count(tf_output_path):
+    """
+    Number of workers in an existing cluster's Terraform output (it may have
+    been changed with 'cluster_ctl.py add-workers/remove-workers'), or None.
     """
-    print("\n--- Cleaning up known_hosts for cluster IPs ---")
     try:
         with open(tf_output_path, 'r') as f:
-            data = json.load(f)
-        
-        ips_to_clean = set()
-        
-        # Collect Public IPs
-        public_ips = data.get('server_public_ips', {}).get('value', {})
-        for ip in public_ips.values():
-            ips_to_clean.add(ip)
-        
-        # Collect Private IPs
-        private_ips = data.get('server_private_ips', {}).get('value', {})
-        for ip in private_ips.values():
-            ips_to_clean.add(ip)
-            
-        for ip in ips_to_clean:
-            # We clean both the raw IP and the IP with port 22 (common variation)
-            subprocess.call(["ssh-keygen", "-R", ip], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            subprocess.call(["ssh-keygen", "-R", f"[{ip}]:22"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            
-    except Exception as e:
-        print(f"Warning: Failed to clean known_hosts: {e}")
-
-def wait_for_ssh(inventory_path, ansible_dir, retries=30, delay=10):
-    """Polls the hosts using ansible ping until they are reachable."""
-    print(f"\n--- Waiting for SSH to be ready on all nodes (max {retries*delay}s) ---")
-    env = os.environ.copy()
-    env["ANSIBLE_HOST_KEY_CHECKING"] = "False"
-    for i in range(retries):
-        try:
-            subprocess.check_call(
-                ["ansible", "all", "-m", "ping", "-i", inventory_path],
-                cwd=ansible_dir,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                env=env
-            )
-            print("\nSSH is ready on all nodes!")
-            return True
-        except subprocess.CalledProcessError:
-            sys.stdout.write(".")
-            sys.stdout.flush()
-            time.sleep(delay)
-    print("\nTimeout: specific nodes are still unreachable.")
-    return False
+            private_ips = json.load(f).get('server_private_ips', {}).get('value', {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return len(private_ips) - 1 if private_ips else None
 
 def get_cluster_info(tf_output_path):
     """
@@ -192,27 +234,35 @@ def get_cluster_info(tf_output_path):
     master_private_ip = private_ips.get(master_node_name)
     
     # Determine Bastion IP
-    public_ips = data.get('server_public_ips', {}).get('value', {})
-    bastion_ip = None
-    for node, ip in public_ips.items():
-        if ip != master_public_ip:
-            bastion_ip = ip
-            break
-    if not bastion_ip and public_ips:
-        bastion_ip = list(public_ips.values())[0]
+    bastion_ip = select_bastion_ip(data)
         
     return master_public_ip, master_private_ip, bastion_ip
 
-def patch_kubeconfig(filepath, proxy_url="socks5://localhost:1080"):
+def get_nfs_server_ip(tf_output_path):
+    """Private IP of the volume node, which serves NFS ("" if the output lacks it)."""
+    with open(tf_output_path, 'r') as f:
+        data = json.load(f)
+    # volume_node_ip output is { "node-name": "public_ip" }; we want the name's private IP
+    volume_data = data.get('volume_node_ip', {}).get('value', {})
+    private_ips = data.get('server_private_ips', {}).get('value', {})
+    if not volume_data:
+        return ""
+    return private_ips.get(next(iter(volume_data.keys())), "")
+
+def patch_kubeconfig(filepath, proxy_url="socks5://localhost:1080", dest=None):
     """
     Reads the kubeconfig file and inserts the proxy-url line into the cluster config.
+    An existing proxy-url line is replaced. Writes to dest (default: in place).
     """
-    print(f"Patching {filepath} with proxy-url: {proxy_url}")
+    dest = dest or filepath
+    print(f"Patching {dest} with proxy-url: {proxy_url}")
     new_lines = []
     patched = False
     
     with open(filepath, 'r') as f:
         for line in f:
+            if line.strip().startswith("proxy-url:"):
+                continue
             new_lines.append(line)
             # Find the server definition and append proxy-url after it
             if "server: https://" in line and not patched:
@@ -221,303 +271,462 @@ def patch_kubeconfig(filepath, proxy_url="socks5://localhost:1080"):
                 new_lines.append(f"{indentation}proxy-url: {proxy_url}\n")
                 patched = True
                 
-    with open(filepath, 'w') as f:
+    with open(dest, 'w') as f:
         f.writelines(new_lines)
     print("Kubeconfig patched successfully.")
 
-def start_socks_proxy(bastion_ip, master_ip, ssh_key_path):
-    """
-    Starts a background SSH SOCKS5 proxy on localhost:1080.
-    Returns the subprocess object.
-    """
-    print("Establishing SOCKS5 tunnel for Terraform...")
-    
-    # Common SSH options to avoid prompts and suppress output
-    # options are placed BEFORE arguments to ensure they are parsed correctly
-    ssh_opts = [
-        "-o", "StrictHostKeyChecking=no",     # Accept new keys automatically
-        "-o", "UserKnownHostsFile=/dev/null", # Do not read or write to user's known_hosts
-        "-o", "GlobalKnownHostsFile=/dev/null",
-        "-o", "CheckHostIP=no",               # Do not verify IP address in known_hosts
-        "-D", "1080",  # Dynamic forwarding (SOCKS)
-        "-q",          # Quiet mode
-        "-N"           # Do not execute a remote command (just forward ports)
-    ]
-
-    if bastion_ip:
-        # We use ProxyCommand instead of -J to explicitly force StrictHostKeyChecking=no 
-        # on the bastion connection as well.
-        proxy_cmd = (
-            f"ssh "
-            "-o StrictHostKeyChecking=no "
-            "-o UserKnownHostsFile=/dev/null "
-            "-o GlobalKnownHostsFile=/dev/null "
-            "-o CheckHostIP=no "
-            f"-i {ssh_key_path} "
-            "-W %h:%p "
-            "-q "
-            f"root@{bastion_ip}"
-        )
-        
-        # Options first, then ProxyCommand, then Identity, then Target
-        cmd = ["ssh"] + ssh_opts + [
-            "-o", f"ProxyCommand={proxy_cmd}",
-            "-i", ssh_key_path,
-            f"root@{master_ip}"
-        ]
-    else:
-        # Direct connection: Options first, then Identity, then Target
-        cmd = ["ssh"] + ssh_opts + [
-            "-i", ssh_key_path,
-            f"root@{master_ip}"
-        ]
-
-    # Start the process in the background
-    proc = subprocess.Popen(cmd)
-    
-    # Give it a moment to establish connection
-    time.sleep(3)
-    
-    # Check if it died immediately
-    if proc.poll() is not None:
-        print("Error: SSH proxy failed to start.")
-        sys.exit(1)
-        
-    print("SOCKS5 tunnel established on localhost:1080.")
-    return proc
-
 # ==========================================
 # 3. Main Execution Flow
 # ==========================================
+# The token can come from the environment instead of the command line, which
+# any local user can see in ps (the pool and autoscaler child processes do so)
+TOKEN_ENV = "HCLOUD_TOKEN"
+
+
 def main():
     parser = argparse.ArgumentParser(description="Provision Hetzner Cluster, generate Inventory, run Ansible, and Setup K8s Apps.")
     
     parser.add_argument("--hetzner-zone-domain", required=True, help="The domain zone (e.g., example.com)")
-    parser.add_argument("--hetzner-token", required=True, help="Hetzner Cloud API Token")
+    parser.add_argument("--hetzner-token", default=os.environ.get(TOKEN_ENV), required=not os.environ.get(TOKEN_ENV),
+                        help=f"Hetzner Cloud API Token (default: ${TOKEN_ENV})")
     parser.add_argument("--ssh-public-key-path", required=True, help="Path to SSH public key")
     parser.add_argument("--ssh-private-key-path", required=True, help="Path to SSH private key")
     parser.add_argument("--acme-email", required=True, help="Email for Let's Encrypt (ACME)")
+    parser.add_argument("--workers", type=int, help="Number of worker nodes besides the control plane (default: the existing cluster's count, else 1)")
+    parser.add_argument("--control-plane-server-type", default="cx23", help="Hetzner server type for the control plane node")
+    parser.add_argument("--worker-server-type", default="cx23", help="Hetzner server type for the worker nodes")
+    parser.add_argument("--join-batch-size", default="20", help="Workers joining the cluster per wave (number or percentage, e.g. 25%%)")
+    parser.add_argument("--snapshot", help="Boot all nodes from a snapshot built with 'cluster_ctl.py bake-image' and skip Ansible phases 1-4")
+    parser.add_argument("--node-cache", action="store_true", help="Run an apt cache and registry pull-through caches on the volume node and point all nodes at them")
+    parser.add_argument("--persistent-tunnel", action="store_true", help="Start the auto-reconnecting tunnel daemon (cluster_ctl.py tunnel) and leave it running")
+    parser.add_argument("--max-parallel-tasks", type=int, default=4, help="How many independent bring-up tasks may run at the same time")
+    parser.add_argument("--terraform-plugin-cache", default=tf_plugins.DEFAULT_CACHE_DIR, help="Provider plugin cache shared by all terraform calls")
+    parser.add_argument("--terraform-mirror", help="Filesystem provider mirror; missing providers from the lock files are mirrored into it first")
+    parser.add_argument("--no-checkpoint", action="store_true", help="Run every phase even if its inputs are unchanged since the last run")
+    parser.add_argument("--force-manifests", action="store_true", help="Apply every manifest again, also to undo changes made to the objects in the cluster")
+    parser.add_argument("--cluster-name", help="Name of an additional cluster with its own workspace (hetzner/clusters/<name>), state, DNS name <name>.<zone> and tunnel port")
+    parser.add_argument("--pending-timeout", type=int, default=readiness.DEFAULT_PENDING_TIMEOUT, help="Abort the K8s apply when a pod stays Pending this many seconds (0 disables the pod/event watcher)")
+    parser.add_argument("--storage-profile", choices=sorted(nfs_storage.PROFILES), default=nfs_storage.DEFAULT_PROFILE,
+                        help="NFS server and StorageClass tuning (see nfs_storage.py); 'throughput' exports async")
+    parser.add_argument("--slowest-tasks", type=int, default=10, help="Number of slowest Ansible tasks to list after the playbook run")
 
     args = parser.parse_args()
 
+    error = workspace.validate_name(args.cluster_name)
+    if error:
+        print(f"Error: {error}")
+        sys.exit(1)
+    ws = workspace.Workspace(args.cluster_name)
+    # A claimed pool cluster keeps its claimant's email (see 'cluster_ctl.py pool claim')
+    if ws.acme_email and ws.acme_email != args.acme_email:
+        print(f"Using the ACME email set when the cluster was claimed: {ws.acme_email}")
+        args.acme_email = ws.acme_email
+
     # Directories
     script_dir = os.path.dirname(os.path.abspath(__file__))
     terraform_infra_dir = os.path.join(script_dir, "terraform")
     terraform_k8s_dir = os.path.join(script_dir, "terraform-kubernetes")
     ansible_dir = os.path.abspath(os.path.join(script_dir, "..", "ansible"))
-    ansible_playbook_path = os.path.join(ansible_dir, "cluster_setup.yaml")
+    # Baked nodes already have phases 1-4; snapshot_setup.yaml runs the rest
+    ansible_playbook_path = os.path.join(ansible_dir, "snapshot_setup.yaml" if args.snapshot else "cluster_setup.yaml")
 
     # Files
-    tf_output_json_path = os.path.join(script_dir, "tmpfile_terraform_output.json")
-    inventory_ini_path = os.path.join(script_dir, "tmpfile_inventory.ini")
-    local_kubeconfig_path = os.path.join(script_dir, "tmpfile_kube_config")
-    readme_path = os.path.join(script_dir, "tmpfile_readme.txt")
+    tf_output_json_path = ws.path("tmpfile_terraform_output.json")
+    inventory_ini_path = ws.path("tmpfile_inventory.ini")
+    local_kubeconfig_path = ws.path("tmpfile_kube_config")
+    # Copy of the kubeconfig pointing at this run's tunnel port; the one above
+    # keeps the cluster's fixed port for the manual tunnel in the summary
+    tunnel_kubeconfig_path = ws.path("tmpfile_kube_config_tunnel")
+    readme_path = ws.path("tmpfile_readme.txt")
+    report_path = ws.path("tmpfile_provision_report.jsonl")
+    ssh_config_path = ws.path("tmpfile_ssh_config")
+    tunnel_state_path = ws.path("tmpfile_tunnel_state.json")
+    tunnel_log_path = ws.path("tmpfile_tunnel.log")
+    checkpoint_path = ws.path("tmpfile_checkpoint.json")
+    terraformrc_path = ws.path("tmpfile_terraformrc")
+    ansible_cfg_path = ws.path("tmpfile_ansible.cfg")
+    # Outside ansible_dir, which is hashed for the checkpoint
+    ansible_fact_cache_dir = ws.path("tmpfile_ansible_facts")
+    ansible_timings_path = ws.path("tmpfile_ansible_timings.jsonl")
     
-    # Nginx App Manifests
-    nginx_manifest_src = os.path.join(script_dir, "example-kubernetes", "nginx-app-http-redirect.yaml")
-    nginx_manifest_tmp = os.path.join(script_dir, "tmpfile_nginx-app-http-redirect.yaml")
+    # Rendered from manifests/ (see manifest_pipeline.py)
+    manifests_dir = ws.path(manifest_pipeline.RENDERED_DIR)
+
+    # Keep the size of a cluster that was scaled with cluster_ctl.py
+    if args.workers is None:
+        args.workers = existing_worker_count(tf_output_json_path) or 1
 
     # Env Vars
     tf_env = os.environ.copy()
     tf_env["TF_VAR_hcloud_token"] = args.hetzner_token
     tf_env["TF_VAR_hetzner_zone_domain"] = args.hetzner_zone_domain
     tf_env["TF_VAR_ssh_public_key_path"] = args.ssh_public_key_path
+    tf_env["TF_VAR_worker_count"] = str(args.workers)
+    tf_env["TF_VAR_control_plane_server_type"] = args.control_plane_server_type
+    tf_env["TF_VAR_worker_server_type"] = args.worker_server_type
+    if args.snapshot:
+        tf_env["TF_VAR_node_image"] = args.snapshot
+
+    # Timing report: every task below is recorded as a span
+    report = phase_report.PhaseReport(report_path, "cluster_up")
+    atexit.register(report.close, "failed")
+
+    # Values produced by one task and consumed by its dependents
+    state = {}
+
+    # ------------------------------------------
+    # Phase 1: Infrastructure (Terraform)
+    # ------------------------------------------
+    def terraform_plugin_cache(span):
+        # Runs before both 'terraform init's; tf_env is updated in place so
+        # every later terraform call (and tf_k8s_env) inherits the settings
+        if args.terraform_mirror:
+            mirror_dir = os.path.abspath(os.path.expanduser(args.terraform_mirror))
+            span.attrs["mirrored_roots"] = len(tf_plugins.build_mirror(mirror_dir, roots=[terraform_infra_dir, terraform_k8s_dir]))
+        else:
+            mirror_dir = None
+        tf_env.update(tf_plugins.terraform_env(
+            tf_env,
+            cache_dir=os.path.abspath(os.path.expanduser(args.terraform_plugin_cache)),
+            mirror_dir=mirror_dir,
+            cli_config_path=terraformrc_path
+        ))
+        print(f"Terraform plugin cache: {tf_env['TF_PLUGIN_CACHE_DIR']}")
+        if "TF_CLI_CONFIG_FILE" in tf_env:
+            print(f"Terraform provider mirror: {mirror_dir} (config: {tf_env['TF_CLI_CONFIG_FILE']})")
+
+    def terraform_init_infra(span):
+        print("--- Initializing Terraform (Infra) ---")
+        phase_report.check_call(["terraform", "init"] + ws.terraform_init_args(terraform_infra_dir), span=span,
+                                cwd=terraform_infra_dir, env=ws.terraform_env(tf_env, terraform_infra_dir))
+
+    def terraform_apply_infra(span):
+        print("--- Applying Terraform (Infra) ---")
+        try:
+            phase_report.check_call(["terraform", "apply", "-auto-approve"], span=span, cwd=terraform_infra_dir,
+                                    env=ws.terraform_env(tf_env, terraform_infra_dir))
+        except subprocess.CalledProcessError:
+            print("Terraform Infra Apply failed.")
+            sys.exit(1)
 
-    print(f"--- Phase 1: Infrastructure (Terraform) ---")
-    
-    # 1. Terraform Init (Infra)
-    print("\n--- Initializing Terraform (Infra) ---")
-    subprocess.check_call(["terraform", "init"], cwd=terraform_infra_dir, env=tf_env)
-
-    # 2. Terraform Apply (Infra)
-    print("\n--- Applying Terraform (Infra) ---")
-    try:
-        # Added -auto-approve flag here
-        subprocess.check_call(["terraform", "apply", "-auto-approve"], cwd=terraform_infra_dir, env=tf_env)
-    except subprocess.CalledProcessError:
-        print("\nTerraform Infra Apply failed.")
-        sys.exit(1)
-
-    # 3. Capture Output
-    try:
-        output_bytes = subprocess.check_output(["terraform", "output", "-json"], cwd=terraform_infra_dir, env=tf_env)
-        with open(tf_output_json_path, "wb") as f:
-            f.write(output_bytes)
-    except subprocess.CalledProcessError:
-        print("Failed to get terraform output.")
-        sys.exit(1)
-
-    # 4. Generate Inventory
-    generate_inventory(
-        input_file=tf_output_json_path,
-        output_file=inventory_ini_path,
-        ssh_key_path=os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
-    )
-
-    # 5. Clean known_hosts to prevent key mismatch errors
-    cleanup_known_hosts(tf_output_json_path)
+    def terraform_output_infra(span):
+        try:
+            output_bytes = phase_report.check_output(["terraform", "output", "-json"], span=span, cwd=terraform_infra_dir,
+                                                     env=ws.terraform_env(tf_env, terraform_infra_dir))
+            with open(tf_output_json_path, "wb") as f:
+                f.write(output_bytes)
+        except subprocess.CalledProcessError:
+            print("Failed to get terraform output.")
+            sys.exit(1)
 
-    print(f"\n--- Phase 2: Configuration (Ansible) ---")
-    
-    # 6. Wait for SSH
-    if not wait_for_ssh(inventory_ini_path, ansible_dir):
-        print("Error: Could not connect to nodes via SSH.")
-        sys.exit(1)
+    def cluster_info():
+        # Read from the output file: terraform_output_infra may have been skipped
+        if "cluster_info" not in state:
+            state["cluster_info"] = get_cluster_info(tf_output_json_path)
+        return state["cluster_info"]
 
-    # 7. Run Ansible
-    ansible_env = os.environ.copy()
-    ansible_env["ANSIBLE_HOST_KEY_CHECKING"] = "False" 
-    cmd = ["ansible-playbook", "-i", inventory_ini_path, ansible_playbook_path]
-    try:
-        subprocess.check_call(cmd, env=ansible_env, cwd=ansible_dir)
-    except subprocess.CalledProcessError:
-        print("\nAnsible Playbook execution failed.")
-        sys.exit(1)
+    def build_ssh_config(span):
+        with open(tf_output_json_path, 'r') as f:
+            hosts = json.load(f).get('server_private_ips', {}).get('value', {})
+        ssh_config.write_ssh_config(
+            ssh_config_path,
+            hosts=hosts,
+            bastion_ip=cluster_info()[2],
+            ssh_key_path=os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+        )
+        print(f"SSH config with connection multiplexing saved to {ssh_config_path}")
+
+    def build_inventory(span):
+        generate_inventory(
+            input_file=tf_output_json_path,
+            output_file=inventory_ini_path,
+            ssh_key_path=os.path.abspath(os.path.expanduser(args.ssh_private_key_path)),
+            ssh_config_path=ssh_config_path
+        )
 
-    print(f"\n--- Phase 3: Post-Configuration & Kubernetes Apps ---")
+    def build_ansible_cfg(span):
+        with open(tf_output_json_path, 'r') as f:
+            node_count = len(json.load(f).get('server_private_ips', {}).get('value', {}))
+        ansible_cfg.write_ansible_cfg(ansible_cfg_path, node_count, ansible_fact_cache_dir,
+                                      timings_path=ansible_timings_path)
+        pruned = ansible_cfg.prune_fact_cache(ansible_fact_cache_dir, fact_cache_servers(tf_output_json_path))
+        if pruned:
+            print(f"Dropped cached Ansible facts of new or removed servers: {', '.join(pruned)}")
+        span.attrs["forks"] = ansible_cfg.forks_for(node_count)
+        print(f"Ansible config saved to {ansible_cfg_path} (forks={span.attrs['forks']})")
+
+    def clean_known_hosts(span):
+        # Clean known_hosts to prevent key mismatch errors
+        known_hosts.remove_cluster_hosts(tf_output_json_path)
+
+    # ------------------------------------------
+    # Phase 2: Configuration (Ansible)
+    # ------------------------------------------
+    def wait_for_nodes(span):
+        ssh_key_path = os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+        if not wait_for_ssh(tf_output_json_path, ssh_key_path, span=span, ssh_config_path=ssh_config_path):
+            print("Error: Could not connect to nodes via SSH.")
+            sys.exit(1)
 
-    # 8. Fetch Kubeconfig
-    print("Retrieving kubeconfig from control plane...")
-    master_pub_ip, master_priv_ip, bastion_ip = get_cluster_info(tf_output_json_path)
-    
-    scp_cmd = []
-    
-    # Construct SCP command based on Bastion presence
-    if bastion_ip:
-        # scp -o ProxyCommand="..." root@<priv_ip>:/root/.kube/config ./kubeconfig
-        proxy_cmd = f"ssh -i {args.ssh_private_key_path} -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -W %h:%p -q root@{bastion_ip}"
-        scp_cmd = [
-            "scp",
-            "-i", args.ssh_private_key_path,
-            "-o", "StrictHostKeyChecking=no",
-            "-o", "UserKnownHostsFile=/dev/null",
-            "-o", f"ProxyCommand={proxy_cmd}",
-            f"root@{master_priv_ip}:/root/.kube/config",
-            local_kubeconfig_path
+    def ansible_playbook(span):
+        span.attrs["playbook"] = os.path.basename(ansible_playbook_path)
+        ansible_env = os.environ.copy()
+        # Forks, pipelining and fact caching come from the generated config
+        ansible_env["ANSIBLE_CONFIG"] = ansible_cfg_path
+        cmd = [
+            "ansible-playbook", "-i", inventory_ini_path,
+            "-e", f"join_batch_size={args.join_batch_size}",
+            "-e", f"node_cache_enabled={str(args.node_cache).lower()}",
+            "-e", nfs_storage.ansible_vars(args.storage_profile),
+            ansible_playbook_path
         ]
-    else:
-        # scp root@<pub_ip>:/root/.kube/config ./kubeconfig
+        # The task_timings callback appends; keep only this run's records
+        if os.path.exists(ansible_timings_path):
+            os.remove(ansible_timings_path)
+        span.attrs["task_timings"] = ansible_timings_path
+        try:
+            phase_report.check_call(cmd, span=span, env=ansible_env, cwd=ansible_dir)
+        except subprocess.CalledProcessError:
+            print("Ansible Playbook execution failed.")
+            sys.exit(1)
+        finally:
+            task_timings.print_report(ansible_timings_path, top_n=args.slowest_tasks)
+        nfs_storage.write_server_profile(ws.path(nfs_storage.SERVER_PROFILE), args.storage_profile)
+
+    # ------------------------------------------
+    # Phase 3: Post-Configuration & Kubernetes Apps
+    # ------------------------------------------
+    def fetch_kubeconfig(span):
+        print("Retrieving kubeconfig from control plane...")
+        master_pub_ip, master_priv_ip, bastion_ip = cluster_info()
+        
+        # The generated ssh_config routes private IPs through the bastion and
+        # reuses the master left behind by the readiness probe.
+        target_ip = master_priv_ip if bastion_ip else master_pub_ip
         scp_cmd = [
             "scp",
-            "-i", args.ssh_private_key_path,
-            "-o", "StrictHostKeyChecking=no",
-            "-o", "UserKnownHostsFile=/dev/null",
-            f"root@{master_pub_ip}:/root/.kube/config",
+            "-F", ssh_config_path,
+            f"root@{target_ip}:/root/.kube/config",
             local_kubeconfig_path
         ]
-        
-    try:
-        subprocess.check_call(scp_cmd)
-        print(f"Kubeconfig downloaded to {local_kubeconfig_path}")
-    except subprocess.CalledProcessError:
-        print("Failed to download kubeconfig.")
-        sys.exit(1)
 
-    # 9. Patch Kubeconfig
-    patch_kubeconfig(local_kubeconfig_path)
+        try:
+            phase_report.check_call(scp_cmd, span=span)
+            print(f"Kubeconfig downloaded to {local_kubeconfig_path}")
+        except subprocess.CalledProcessError:
+            print("Failed to download kubeconfig.")
+            sys.exit(1)
 
-    # 10. START SOCKS5 PROXY (Fix for connection refused)
-    # If we have a bastion, we target the master's private IP through the bastion.
-    # If no bastion, we target the master's public IP.
-    target_ip_for_proxy = master_priv_ip if bastion_ip else master_pub_ip
-    
-    proxy_proc = start_socks_proxy(
-        bastion_ip=bastion_ip,
-        master_ip=target_ip_for_proxy,
-        ssh_key_path=args.ssh_private_key_path
-    )
-    
-    # Ensure proxy is killed when script exits
-    def cleanup_proxy():
-        if proxy_proc and proxy_proc.poll() is None:
-            print("\nShutting down SOCKS5 tunnel...")
-            proxy_proc.terminate()
-            
-    atexit.register(cleanup_proxy)
+        patch_kubeconfig(local_kubeconfig_path, f"socks5://localhost:{ws.tunnel_port}")
 
-    # 11. Terraform Kubernetes & Example App
-    try:
-        print("\n--- Applying Terraform (Kubernetes Apps) ---")
-        
-        # Update Env Vars for K8s phase
-        tf_k8s_env = tf_env.copy()
-        
-        # --- NEW LOGIC START: Get NFS Private IP ---
-        # We need to read the JSON again to get the private IP of the volume node
-        with open(tf_output_json_path, 'r') as f:
-            tf_data_for_nfs = json.load(f)
+    def socks_proxy(span):
+        # If we have a bastion, we target the master's private IP through the bastion.
+        # If no bastion, we target the master's public IP.
+        master_pub_ip, master_priv_ip, bastion_ip = cluster_info()
+        target_ip_for_proxy = master_priv_ip if bastion_ip else master_pub_ip
+        probe_target = socks_tunnel.api_server_from_kubeconfig(local_kubeconfig_path)
 
-        volume_data_nfs = tf_data_for_nfs.get('volume_node_ip', {}).get('value', {})
-        private_ips_nfs = tf_data_for_nfs.get('server_private_ips', {}).get('value', {})
-        
-        nfs_server_ip = ""
-        if volume_data_nfs:
-            # volume_node_ip output is { "node-name": "public_ip" }
-            # We want the node-name key
-            vol_node_name = next(iter(volume_data_nfs.keys()))
-            # Look up its private IP
-            nfs_server_ip = private_ips_nfs.get(vol_node_name, "")
-            
+        # Reuse a tunnel daemon that is already up for this cluster
+        daemon = tunnel_daemon.find_running(tunnel_state_path)
+        if daemon and socks_tunnel.socks5_connect(daemon["port"], *probe_target):
+            print(f"Using running tunnel daemon on localhost:{daemon['port']} (pid {daemon['pid']}).")
+            span.attrs.update(port=daemon["port"], reused_daemon=True)
+            patch_kubeconfig(local_kubeconfig_path, f"socks5://localhost:{daemon['port']}", dest=tunnel_kubeconfig_path)
+            return
+
+        try:
+            if args.persistent_tunnel:
+                daemon = tunnel_daemon.spawn(tunnel_state_path, tunnel_log_path, [
+                    "--master-ip", target_ip_for_proxy,
+                    "--bastion-ip", bastion_ip or "",
+                    "--ssh-private-key-path", os.path.abspath(os.path.expanduser(args.ssh_private_key_path)),
+                    "--probe-target", f"{probe_target[0]}:{probe_target[1]}",
+                    "--port", str(ws.tunnel_port),
+                ] + (["--cluster-name", ws.name] if ws.name else []))
+                print(f"Tunnel daemon started on localhost:{daemon['port']} (pid {daemon['pid']}).")
+                span.attrs.update(port=daemon["port"], started_daemon=True)
+                patch_kubeconfig(local_kubeconfig_path, f"socks5://localhost:{daemon['port']}", dest=tunnel_kubeconfig_path)
+                return
+
+            tunnel = socks_tunnel.start_socks_proxy(
+                bastion_ip=bastion_ip,
+                master_ip=target_ip_for_proxy,
+                ssh_key_path=args.ssh_private_key_path,
+                probe_target=probe_target,
+                ssh_config_path=ssh_config_path
+            )
+        except socks_tunnel.TunnelError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        state["tunnel"] = tunnel
+        span.attrs["port"] = tunnel.port
+        patch_kubeconfig(local_kubeconfig_path, tunnel.proxy_url, dest=tunnel_kubeconfig_path)
+
+    def kubernetes_variables(span):
+        master_pub_ip = cluster_info()[0]
+
+        nfs_server_ip = get_nfs_server_ip(tf_output_json_path)
         if not nfs_server_ip:
             print("Error: Could not determine NFS Server Private IP. Ensure Terraform output 'volume_node_ip' and 'server_private_ips' exist.")
             sys.exit(1)
             
         print(f"NFS Server IP determined as: {nfs_server_ip}")
-        # --- NEW LOGIC END ---
 
+        # Update Env Vars for K8s phase
+        tf_k8s_env = ws.terraform_env(tf_env, terraform_k8s_dir)
         tf_k8s_env["TF_VAR_metallb_ip"] = f"{master_pub_ip}/32"
         tf_k8s_env["TF_VAR_acme_email"] = args.acme_email
-        tf_k8s_env["TF_VAR_kube_config_path"] = local_kubeconfig_path
-        tf_k8s_env["TF_VAR_nfs_server_ip"] = nfs_server_ip  # <--- Added Variable
-        tf_k8s_env["KUBECONFIG"] = local_kubeconfig_path
+        tf_k8s_env["TF_VAR_kube_config_path"] = tunnel_kubeconfig_path
+        tf_k8s_env["TF_VAR_nfs_server_ip"] = nfs_server_ip
+        tf_k8s_env["TF_VAR_nfs_mount_options"] = nfs_storage.mount_options(args.storage_profile)
+        tf_k8s_env["KUBECONFIG"] = tunnel_kubeconfig_path
 
         print(f"MetalLB IP set to: {master_pub_ip}/32")
         print(f"ACME Email set to: {args.acme_email}")
-        print(f"Kubeconfig set to: {local_kubeconfig_path}")
-
-        print("\n--- Initializing Terraform (K8s) ---")
-        subprocess.check_call(["terraform", "init"], cwd=terraform_k8s_dir, env=tf_k8s_env)
-
-        print("\n--- Applying Terraform (K8s) ---")
-        # Removed stdout suppression so user can see output
-        subprocess.check_call(
-            ["terraform", "apply", "-auto-approve"], 
-            cwd=terraform_k8s_dir, 
-            env=tf_k8s_env
+        print(f"Storage profile: {args.storage_profile} (mount options: {', '.join(nfs_storage.PROFILES[args.storage_profile]['mount_options']) or 'defaults'})")
+        print(f"Kubeconfig set to: {tunnel_kubeconfig_path}")
+
+        state["nfs_server_ip"] = nfs_server_ip
+        state["tf_k8s_env"] = tf_k8s_env
+
+    def terraform_init_k8s(span):
+        # 'init' only needs the backend and providers, not the cluster
+        print("--- Initializing Terraform (K8s) ---")
+        phase_report.check_call(["terraform", "init"] + ws.terraform_init_args(terraform_k8s_dir), span=span,
+                                cwd=terraform_k8s_dir, env=ws.terraform_env(tf_env, terraform_k8s_dir))
+
+    def terraform_apply_k8s(span):
+        print("--- Applying Terraform (K8s) ---")
+        if args.pending_timeout <= 0:
+            phase_report.check_call(["terraform", "apply", "-auto-approve"], span=span,
+                                    cwd=terraform_k8s_dir, env=state["tf_k8s_env"])
+            return
+
+        # Abort the apply as soon as a pod is stuck instead of waiting for Helm's timeout
+        running = {}
+        def abort_apply(key, problem):
+            if "terraform" in running:
+                print("Interrupting terraform apply...")
+                readiness.interrupt(running["terraform"])
+        watcher = readiness.ReadinessWatcher(state["tf_k8s_env"], pending_timeout=args.pending_timeout,
+                                             on_failure=abort_apply, prefix="readiness")
+        watcher.start()
+        try:
+            phase_report.check_call(["terraform", "apply", "-auto-approve"], span=span,
+                                    cwd=terraform_k8s_dir, env=state["tf_k8s_env"],
+                                    on_start=lambda proc: running.update(terraform=proc))
+        except subprocess.CalledProcessError:
+            if watcher.failure:
+                span.attrs["stuck_pod"] = watcher.failure[0]
+                print(watcher.diagnosis())
+            raise
+        finally:
+            watcher.stop()
+        if watcher.ready_after_s is not None:
+            span.attrs["pods_ready_s"] = round(watcher.ready_after_s, 1)
+
+    def render_manifests(span):
+        variables = manifest_pipeline.template_variables(
+            domain=ws.domain(args.hetzner_zone_domain),
+            metallb_ip=cluster_info()[0],
+            nfs_server_ip=state["nfs_server_ip"],
+            acme_email=args.acme_email,
         )
-        
-        # 12. Deploy Nginx Example App
-        print("\n--- Deploying Nginx Example App ---")
         try:
-            # Read source manifest
-            with open(nginx_manifest_src, 'r') as f:
-                content = f.read()
-            
-            # Replace example.com with the provided domain
-            content = content.replace("example.com", args.hetzner_zone_domain)
-            
-            # Write to temp file
-            with open(nginx_manifest_tmp, 'w') as f:
-                f.write(content)
-            
-            # Apply via kubectl
-            subprocess.check_call(
-                ["kubectl", "apply", "-f", nginx_manifest_tmp], 
-                env=tf_k8s_env
-            )
-            print(f"Nginx example deployed from {nginx_manifest_tmp}")
-            
-        except FileNotFoundError:
-             print(f"Warning: {nginx_manifest_src} not found. Skipping Nginx deployment.")
+            state["manifests"] = manifest_pipeline.render_dir(manifest_pipeline.TEMPLATE_DIR, manifests_dir,
+                                                              variables, ws.path(manifest_pipeline.RENDER_CACHE))
+        except manifest_pipeline.ManifestError as e:
+            span.status = "failed"
+            print(f"Error: {e}")
+            return
+        span.attrs["objects"] = len(state["manifests"])
+        print(f"Rendered {len(state['manifests'])} objects into {manifests_dir}")
+
+    def deploy_manifests(span):
+        print("--- Deploying Manifests ---")
+        if not state.get("manifests"):
+            span.status = "skipped"
+            return
+        try:
+            manifest_pipeline.apply(state["manifests"], ws.path(manifest_pipeline.APPLIED_STATE),
+                                    ws.path(manifest_pipeline.APPLY_BATCH),
+                                    manifest_pipeline.cluster_id(local_kubeconfig_path),
+                                    span=span, force=args.force_manifests, env=state["tf_k8s_env"])
         except subprocess.CalledProcessError:
-             print("Failed to deploy Nginx example.")
-        
+            span.status = "failed"
+            print("Failed to deploy the manifests.")
+
+    # ------------------------------------------
+    # Task Graph
+    # ------------------------------------------
+    # inputs= lists what a task's checkpoint digest covers on top of its
+    # dependencies' digests; tasks without inputs are cheap and always run.
+    tf_infra_files = checkpoint.Files(os.path.join(terraform_infra_dir, "*.tf"),
+                                      os.path.join(terraform_infra_dir, ".terraform.lock.hcl"))
+    tf_k8s_files = checkpoint.Files(os.path.join(terraform_k8s_dir, "*.tf"),
+                                    os.path.join(terraform_k8s_dir, ".terraform.lock.hcl"))
+    tf_output_file = checkpoint.Files(tf_output_json_path)
+
+    executor = phase_executor.PhaseExecutor(
+        report,
+        max_workers=args.max_parallel_tasks,
+        checkpoint=checkpoint.Checkpoint(checkpoint_path, enabled=not args.no_checkpoint)
+    )
+    executor.add("terraform_plugin_cache", terraform_plugin_cache)
+    executor.add("terraform_init_infra", terraform_init_infra, deps=["terraform_plugin_cache"],
+                 inputs=lambda: [tf_infra_files], outputs=[ws.terraform_data_dir(terraform_infra_dir)])
+    executor.add("terraform_init_k8s", terraform_init_k8s, deps=["terraform_plugin_cache"],
+                 inputs=lambda: [tf_k8s_files], outputs=[ws.terraform_data_dir(terraform_k8s_dir)])
+    executor.add("render_manifests", render_manifests, deps=["kubernetes_variables"])
+    executor.add("terraform_apply_infra", terraform_apply_infra, deps=["terraform_init_infra"],
+                 inputs=lambda: [tf_infra_files, checkpoint.Files(os.path.expanduser(args.ssh_public_key_path)),
+                                 args.hetzner_zone_domain, args.ssh_public_key_path, args.workers,
+                                 args.control_plane_server_type, args.worker_server_type, args.snapshot])
+    executor.add("terraform_output_infra", terraform_output_infra, deps=["terraform_apply_infra"],
+                 inputs=lambda: [], outputs=[tf_output_json_path])
+    executor.add("write_ssh_config", build_ssh_config, deps=["terraform_output_infra"])
+    executor.add("generate_inventory", build_inventory, deps=["terraform_output_infra"])
+    executor.add("write_ansible_cfg", build_ansible_cfg, deps=["terraform_output_infra"])
+    executor.add("cleanup_known_hosts", clean_known_hosts, deps=["terraform_output_infra"])
+    executor.add("kubernetes_variables", kubernetes_variables, deps=["terraform_output_infra"])
+    executor.add("wait_for_ssh", wait_for_nodes, deps=["write_ssh_config"],
+                 inputs=lambda: [tf_output_file])
+    executor.add("ansible_playbook", ansible_playbook, deps=["wait_for_ssh", "generate_inventory", "write_ansible_cfg"],
+                 inputs=lambda: [checkpoint.Files(ansible_dir), checkpoint.Files(inventory_ini_path, ansible_cfg_path),
+                                 tf_output_file, args.join_batch_size, args.node_cache, args.storage_profile])
+    executor.add("fetch_kubeconfig", fetch_kubeconfig, deps=["ansible_playbook"],
+                 inputs=lambda: [tf_output_file], outputs=[local_kubeconfig_path])
+    executor.add("start_socks_proxy", socks_proxy, deps=["fetch_kubeconfig"])
+    executor.add("terraform_apply_k8s", terraform_apply_k8s,
+                 deps=["terraform_init_k8s", "fetch_kubeconfig", "start_socks_proxy", "kubernetes_variables"],
+                 inputs=lambda: [tf_k8s_files, tf_output_file, args.acme_email, args.hetzner_zone_domain,
+                                 args.storage_profile])
+    # No checkpoint: apply() itself finds the objects to send, including ones deleted in the cluster
+    executor.add("deploy_manifests", deploy_manifests, deps=["terraform_apply_k8s", "render_manifests"])
+
+    # Ensure proxy is killed when script exits
+    def cleanup_proxy():
+        tunnel = state.get("tunnel")
+        if tunnel and tunnel.alive():
+            print("\nShutting down SOCKS5 tunnel...")
+            tunnel.stop()
+            
+    atexit.register(cleanup_proxy)
+
+    try:
+        executor.run()
+    except phase_executor.PhaseFailed as e:
+        print(f"\nCluster setup failed: {e}")
+        sys.exit(1)
     finally:
         # Stop the proxy after terraform finishes (or fails)
         cleanup_proxy()
         # Unregister to avoid double calling
         atexit.unregister(cleanup_proxy)
 
+    master_pub_ip, master_priv_ip, bastion_ip = cluster_info()
+    nfs_server_ip = state["nfs_server_ip"]
+
     # 13. Summary Output (Console + File)
     
     # Reconstruct the command line string
@@ -530,17 +739,22 @@ def main():
         "==============================================",
         f"MetalLB IP set to: {master_pub_ip}/32",
         f"ACME Email set to: {args.acme_email}",
+        f"Cluster: {ws.label} (domain {ws.domain(args.hetzner_zone_domain)})",
         f"NFS Server is {nfs_server_ip}",
         f"0. You can up cluster again using your original command: {original_command}",
         f"1. Kubeconfig: {local_kubeconfig_path}",
-        f"2. To remove the example app: kubectl delete -f {nginx_manifest_tmp}",
-        "3. To access the cluster, open an SSH tunnel in a separate terminal:"
+        f"2. To remove the deployed manifests: kubectl delete -f {manifests_dir}",
+        "   Deleted objects are applied again by the next run; add --force-manifests to also undo edits made in the cluster",
+        "3. To access the cluster, start the persistent tunnel (reconnects automatically):",
+        f"   python3 {os.path.join(script_dir, 'cluster_ctl.py')} tunnel start --ssh-private-key-path {args.ssh_private_key_path}"
+        + (f" --cluster-name {ws.name}" if ws.name else ""),
+        "   or open an SSH tunnel by hand in a separate terminal:"
     ]
     
     if bastion_ip:
-        summary_lines.append(f"   ssh -i {args.ssh_private_key_path} -D 1080 -q -N -J root@{bastion_ip} root@{master_priv_ip}")
+        summary_lines.append(f"   ssh -i {args.ssh_private_key_path} -D {ws.tunnel_port} -q -N -J root@{bastion_ip} root@{master_priv_ip}")
     else:
-        summary_lines.append(f"   ssh -i {args.ssh_private_key_path} -D 1080 -q -N root@{master_pub_ip}")
+        summary_lines.append(f"   ssh -i {args.ssh_private_key_path} -D {ws.tunnel_port} -q -N root@{master_pub_ip}")
         
     summary_lines.append("\n4. Then use kubectl with the generated config:")
     summary_lines.append(f"   export KUBECONFIG={local_kubeconfig_path}")
@@ -559,5 +773,10 @@ def main():
     except IOError as e:
         print(f"\nWarning: Failed to save summary file: {e}")
 
+    # 14. Timing Report
+    report.close("ok")
+    atexit.unregister(report.close)
+    report.print_summary()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
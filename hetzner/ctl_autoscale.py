@@ -0,0 +1,240 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import autoscaler
+import cluster_up
+import ctl_common
+import ctl_metrics
+import ctl_scale
+import metrics_ring
+import workspace
+
+# ==========================================
+# Autoscale Subcommands
+# ==========================================
+# 'autoscale' polls pending pods, nodes and metrics-server through the
+# tunnel kubeconfig, lets autoscaler.Autoscaler decide and runs add-workers /
+# remove-workers as child processes, one at a time. Every observation is
+# recorded, so 'autoscale-replay' can run other policies over the same
+# history (or over the 'sample' metrics ring) against a stub provisioner.
+AUTOSCALE_OBSERVATIONS = "tmpfile_autoscale_observations.jsonl"
+AUTOSCALE_REPORT = "tmpfile_autoscale_report.jsonl"
+NODE_READY_TIMEOUT = 600
+
+
+def autoscale_policy(args):
+    if args.scale_in_utilization >= args.scale_out_utilization:
+        print("Error: --scale-in-utilization must be below --scale-out-utilization.")
+        sys.exit(1)
+    return autoscaler.Policy(
+        min_workers=args.min_workers, max_workers=args.max_workers,
+        scale_out_utilization=args.scale_out_utilization, scale_in_utilization=args.scale_in_utilization,
+        pending_grace_s=args.pending_grace, scale_out_stable_s=args.scale_out_stable,
+        scale_in_stable_s=args.scale_in_stable, scale_out_cooldown_s=args.scale_out_cooldown,
+        scale_in_cooldown_s=args.scale_in_cooldown, max_step=args.max_step)
+
+
+def scale_command(args, verb, count):
+    """The add-workers / remove-workers command line for the autoscaler's own arguments."""
+    cmd = [sys.executable, ctl_common.CLUSTER_CTL, f"{verb}-workers", str(count),
+           "--hetzner-zone-domain", args.hetzner_zone_domain,
+           "--ssh-public-key-path", args.ssh_public_key_path, "--ssh-private-key-path", args.ssh_private_key_path,
+           "--control-plane-server-type", args.control_plane_server_type,
+           "--worker-server-type", args.worker_server_type]
+    for flag, value in (("--cluster-name", args.cluster_name), ("--snapshot", args.snapshot),
+                        ("--terraform-mirror", args.terraform_mirror)):
+        if value:
+            cmd += [flag, value]
+    if verb == "add":
+        cmd += ["--join-batch-size", args.join_batch_size] + (["--node-cache"] if args.node_cache else [])
+    else:
+        cmd += ["--drain-timeout", str(args.drain_timeout)]
+    return cmd
+
+
+def observe_cluster(env, workers):
+    return autoscaler.observation(
+        time.time(), workers,
+        ctl_common.kubectl_json(["get", "nodes", "-o", "json"], env),
+        ctl_common.kubectl_json(["get", "--raw", "/apis/metrics.k8s.io/v1beta1/nodes"], env),
+        ctl_common.kubectl_json(["get", "pods", "--all-namespaces", "--field-selector=status.phase=Pending", "-o", "json"], env))
+
+
+def wait_for_ready_workers(env, expected, timeout):
+    """Seconds until at least `expected` workers are Ready in Kubernetes, None on timeout."""
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        try:
+            if len(autoscaler.ready_workers(ctl_common.kubectl_json(["get", "nodes", "-o", "json"], env))) >= expected:
+                return time.monotonic() - start
+        except (subprocess.CalledProcessError, ValueError):
+            pass
+        time.sleep(5)
+    return None
+
+
+def append_jsonl(path, entry):
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def run_scale_action(args, ws, env, obs, result):
+    """Runs add-workers / remove-workers for a decision and records how long it took."""
+    verb = "add" if result["action"] == "out" else "remove"
+    print(f"--- Autoscaler: {verb} {result['count']} worker(s): {result['reason']} ---")
+    start = time.monotonic()
+    rc = subprocess.call(scale_command(args, verb, result["count"]), env={**os.environ, cluster_up.TOKEN_ENV: args.hetzner_token})
+    entry = {"time": time.time(), "action": result["action"], "count": result["count"], "reason": result["reason"],
+             "workers_before": obs["workers"], "rc": rc, "duration_s": round(time.monotonic() - start, 1)}
+    if rc == 0 and verb == "add":
+        ready_s = wait_for_ready_workers(env, obs["workers"] + result["count"], NODE_READY_TIMEOUT)
+        entry["node_ready_wait_s"] = None if ready_s is None else round(ready_s, 1)
+        if ready_s is None:
+            print(f"Warning: new workers not Ready after {NODE_READY_TIMEOUT}s.")
+        elif obs["pending_pods"]:
+            # From the oldest unschedulable pod's creation to the new workers being Ready
+            waited = time.time() - (obs["time"] - obs["pending_oldest_s"])
+            entry["pending_to_ready_s"] = round(waited, 1)
+            print(f"Pending pod to Ready worker: {waited:.1f}s (scaling {entry['duration_s']:.1f}s).")
+    elif rc != 0:
+        print(f"Error: {verb}-workers failed with code {rc}.")
+    append_jsonl(ws.path(AUTOSCALE_REPORT), entry)
+    return rc == 0
+
+
+def cmd_autoscale(args):
+    ws = workspace.Workspace(args.cluster_name)
+    if not os.path.exists(ws.path(ctl_common.TF_OUTPUT_JSON)):
+        print(f"Error: {ws.path(ctl_common.TF_OUTPUT_JSON)} not found. Run cluster_up.py first.")
+        sys.exit(1)
+    env = ctl_common.kubectl_env(ws)
+    policy = autoscale_policy(args)
+    scaler = autoscaler.Autoscaler(policy)
+
+    print(f"Autoscaling '{ws.label}' between {policy.min_workers} and {policy.max_workers} workers "
+          f"every {args.interval}s{' (dry run)' if args.dry_run else ''}. Ctrl-C to stop.")
+    try:
+        while True:
+            workers = cluster_up.existing_worker_count(ws.path(ctl_common.TF_OUTPUT_JSON))
+            try:
+                obs = observe_cluster(env, workers)
+            except subprocess.CalledProcessError as e:
+                print(f"{time.strftime('%H:%M:%S')} cluster unavailable: {e.stderr.decode(errors='replace').strip()}")
+                time.sleep(args.interval)
+                continue
+            except ValueError as e:
+                print(f"{time.strftime('%H:%M:%S')} unreadable API response: {e}")
+                time.sleep(args.interval)
+                continue
+            result = scaler.decide(obs)
+            append_jsonl(ws.path(AUTOSCALE_OBSERVATIONS), dict(obs, decision=result))
+            print(f"{time.strftime('%H:%M:%S')} {workers} workers, cpu {obs['cpu_utilization']:.0%}, "
+                  f"mem {obs['memory_utilization']:.0%}, {obs['pending_pods']} unschedulable -> "
+                  f"{result['action']}{' ' + str(result['count']) if result['count'] else ''} ({result['reason']})")
+            if result["action"] != "none" and not args.dry_run:
+                run_scale_action(args, ws, env, obs, result)
+                # Cooldowns count from the end of the operation, not from the decision
+                if result["action"] == "out":
+                    scaler.last_scale_out = time.time()
+                else:
+                    scaler.last_scale_in = time.time()
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def cmd_autoscale_replay(args):
+    ws = workspace.Workspace(args.cluster_name)
+    since = time.time() - args.window if args.window else None
+    if args.from_ring:
+        if not os.path.exists(ws.path(ctl_metrics.METRICS_RING)):
+            print(f"Error: no samples for cluster '{ws.label}'. Run 'cluster_ctl.py sample' first.")
+            sys.exit(1)
+        index = metrics_ring.SeriesIndex(ws.path(ctl_metrics.METRICS_SERIES))
+        nodes = sorted((name[len("node/"):] for name in index.series if name.startswith("node/")),
+                       key=cluster_up.node_sort_key)
+        ring = metrics_ring.RingBuffer(ws.path(ctl_metrics.METRICS_RING))
+        try:
+            # The first node in server order is the control plane
+            observations = list(autoscaler.observations_from_ring(ring, index, since=since, exclude=nodes[:1]))
+        finally:
+            ring.close()
+    else:
+        path = args.observations or ws.path(AUTOSCALE_OBSERVATIONS)
+        if not os.path.exists(path):
+            print(f"Error: {path} not found. Record with 'cluster_ctl.py autoscale' (or use --from-ring).")
+            sys.exit(1)
+        with open(path, "r") as f:
+            observations = [json.loads(line) for line in f if line.strip()]
+        observations = [o for o in observations if since is None or o["time"] >= since]
+    if not observations:
+        print("No observations in the window.")
+        sys.exit(1)
+
+    provisioner = autoscaler.StubProvisioner(args.workers or observations[0]["workers"],
+                                             provision_delay_s=args.provision_delay, drain_delay_s=args.drain_delay)
+    timeline, summary = autoscaler.replay(observations, autoscale_policy(args), provisioner)
+    if args.json:
+        print(json.dumps({"timeline": timeline, "summary": summary}, indent=2))
+        return
+
+    start = timeline[0]["time"]
+    print(f"Replaying {len(timeline)} observations over {(timeline[-1]['time'] - start) / 60:.1f} min "
+          f"(provisioning {args.provision_delay}s, draining {args.drain_delay}s):")
+    for entry in timeline:
+        if entry["action"] != "none":
+            print(f"  +{entry['time'] - start:>7.0f}s  {entry['workers']:>3} workers  "
+                  f"util {entry['utilization']:>4.0%}  {entry['pending_pods']:>3} pending  "
+                  f"{entry['action']} {entry['count']}: {entry['reason']}")
+    print(f"{summary['scale_outs']} scale-outs, {summary['scale_ins']} scale-ins, "
+          f"{provisioner.workers} workers at the end.")
+    waits = sorted(summary["pending_to_ready_s"])
+    if waits:
+        print(f"Pending pod to new worker: p50 {metrics_ring.percentile(waits, 50):.0f}s, "
+              f"max {waits[-1]:.0f}s over {len(waits)} scale-outs.")
+
+
+def add_policy_arguments(parser):
+    defaults = autoscaler.Policy()
+    parser.add_argument("--min-workers", type=int, default=defaults.min_workers, help="Fewest workers (at least 1, node-2 stays)")
+    parser.add_argument("--max-workers", type=int, default=defaults.max_workers, help="Most workers")
+    parser.add_argument("--scale-out-utilization", type=float, default=defaults.scale_out_utilization,
+                        help="Worker CPU or memory usage / allocatable that adds workers")
+    parser.add_argument("--scale-in-utilization", type=float, default=defaults.scale_in_utilization,
+                        help="Worker CPU and memory usage / allocatable below which a worker is removed")
+    parser.add_argument("--pending-grace", type=float, default=defaults.pending_grace_s,
+                        help="Seconds a pod may be unschedulable before workers are added")
+    parser.add_argument("--scale-out-stable", type=float, default=defaults.scale_out_stable_s,
+                        help="Seconds utilization must stay above the scale-out threshold")
+    parser.add_argument("--scale-in-stable", type=float, default=defaults.scale_in_stable_s,
+                        help="Seconds utilization must stay below the scale-in threshold")
+    parser.add_argument("--scale-out-cooldown", type=float, default=defaults.scale_out_cooldown_s,
+                        help="Seconds after a scale-out before the next one")
+    parser.add_argument("--scale-in-cooldown", type=float, default=defaults.scale_in_cooldown_s,
+                        help="Seconds after any scaling before a scale-in")
+    parser.add_argument("--max-step", type=int, default=defaults.max_step, help="Most workers added at once")
+
+
+def add_parsers(subparsers):
+    autoscale = subparsers.add_parser("autoscale", help="Add and remove workers from pending pods and metrics-server utilization")
+    ctl_scale.add_scale_arguments(autoscale, add=True, remove=True)
+    add_policy_arguments(autoscale)
+    autoscale.add_argument("--interval", type=float, default=30, help="Seconds between evaluations")
+    autoscale.add_argument("--dry-run", action="store_true", help="Record and print decisions without scaling")
+    autoscale.set_defaults(func=cmd_autoscale)
+
+    replay = subparsers.add_parser("autoscale-replay", help="Run the autoscaler policy over recorded observations with a stub provisioner")
+    replay.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    source = replay.add_mutually_exclusive_group()
+    source.add_argument("--observations", help="Observations JSONL (default: the cluster's 'autoscale' recording)")
+    source.add_argument("--from-ring", action="store_true", help="Replay the 'sample' metrics ring instead (utilization only)")
+    replay.add_argument("--window", type=ctl_metrics.parse_window, help="Only the most recent window, e.g. 6h")
+    replay.add_argument("--workers", type=int, help="Workers at the start (default: as recorded)")
+    replay.add_argument("--provision-delay", type=float, default=180, help="Seconds until an added worker is Ready")
+    replay.add_argument("--drain-delay", type=float, default=60, help="Seconds until a removed worker is gone")
+    replay.add_argument("--json", action="store_true", help="Print the timeline and summary as JSON")
+    add_policy_arguments(replay)
+    replay.set_defaults(func=cmd_autoscale_replay)
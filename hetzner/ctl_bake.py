@@ -0,0 +1,164 @@
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import ansible_cfg
+import checkpoint
+import ctl_common
+import phase_report
+import ssh_probe
+import task_timings
+import tf_plugins
+
+# ==========================================
+# Bake-Image Subcommand
+# ==========================================
+TERRAFORM_BAKE_DIR = os.path.join(ctl_common.SCRIPT_DIR, "terraform-bake")
+BAKE_STATE_PATH = os.path.join(ctl_common.SCRIPT_DIR, "tmpfile_bake.tfstate")
+BAKE_INVENTORY_PATH = os.path.join(ctl_common.SCRIPT_DIR, "tmpfile_bake_inventory.ini")
+BAKE_ANSIBLE_CFG_PATH = os.path.join(ctl_common.SCRIPT_DIR, "tmpfile_bake_ansible.cfg")
+BAKE_REPORT_PATH = os.path.join(ctl_common.SCRIPT_DIR, "tmpfile_bake_report.jsonl")
+BAKE_FACT_CACHE_DIR = os.path.join(ctl_common.SCRIPT_DIR, "tmpfile_bake_ansible_facts")
+BAKE_TIMINGS_PATH = os.path.join(ctl_common.SCRIPT_DIR, "tmpfile_bake_ansible_timings.jsonl")
+BAKED_PLAYBOOKS = [
+    "1_disable_swap.yaml",
+    "2_install_containerd.yaml",
+    "3_configure_network.yaml",
+    "4_install_kube_tools.yaml",
+    "bake_image.yaml",
+    "tasks/registry_mirrors.yaml",
+    "tasks/image_prepull.yaml",
+    "group_vars/all.yaml",
+]
+
+
+def bake_recipe_hash():
+    """Short hash of the baked playbooks, stored as a label on the snapshot."""
+    files = checkpoint.Files(*[os.path.join(ctl_common.ANSIBLE_DIR, name) for name in BAKED_PLAYBOOKS])
+    return checkpoint.Checkpoint.digest("bake-image", [files], [])[:16]
+
+
+def bake_output(state_arg, tf_env, span, name):
+    """A value of the terraform-bake outputs; KeyError if it is missing or null."""
+    output = json.loads(phase_report.check_output(["terraform", "output", "-json", state_arg], span=span,
+                                                  cwd=TERRAFORM_BAKE_DIR, env=tf_env))
+    value = output.get(name, {}).get("value")
+    if value is None:
+        raise KeyError(name)
+    return value
+
+
+def cmd_bake_image(args):
+    """
+    Builds a node snapshot: temporary server -> ansible/bake_image.yaml
+    (phases 1-4) -> hcloud_snapshot, which is then removed from the state so
+    that destroying the server keeps it.
+    """
+    ssh_key_path = os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+    recipe = bake_recipe_hash()
+
+    tf_env = os.environ.copy()
+    tf_env["TF_VAR_hcloud_token"] = args.hetzner_token
+    tf_env["TF_VAR_ssh_public_key_path"] = os.path.abspath(os.path.expanduser(args.ssh_public_key_path))
+    tf_env["TF_VAR_image_name"] = args.name
+    tf_env["TF_VAR_server_type"] = args.server_type
+    tf_env["TF_VAR_location"] = args.location
+    tf_env["TF_VAR_recipe_hash"] = recipe
+    mirror_dir = os.path.abspath(os.path.expanduser(args.terraform_mirror)) if args.terraform_mirror else None
+    tf_env = tf_plugins.terraform_env(tf_env, mirror_dir=mirror_dir, cli_config_path=ctl_common.TERRAFORMRC_PATH)
+    state_arg = f"-state={BAKE_STATE_PATH}"
+
+    report = phase_report.PhaseReport(BAKE_REPORT_PATH, "bake_image")
+    atexit.register(report.close, "failed")
+    server_created = False
+    snapshot_id = None
+    try:
+        with report.span("terraform_init_bake") as span:
+            phase_report.check_call(["terraform", "init"], span=span, cwd=TERRAFORM_BAKE_DIR, env=tf_env)
+
+        with report.span("create_build_server") as span:
+            print("--- Creating build server ---")
+            server_created = True
+            phase_report.check_call(["terraform", "apply", "-auto-approve", state_arg], span=span,
+                                    cwd=TERRAFORM_BAKE_DIR, env=tf_env)
+            bake_ip = bake_output(state_arg, tf_env, span, "bake_ip")
+            print(f"Build server: {bake_ip}")
+
+        with report.span("wait_for_ssh") as span:
+            probes = ssh_probe.wait_for_hosts({args.name: bake_ip}, None, ssh_key_path, timeout=300)
+            span.retries = sum(max(0, p.attempts - 1) for p in probes)
+            if probes[0].ready_after_s is None:
+                print(f"Error: build server unreachable: {probes[0].last_error}")
+                sys.exit(1)
+
+        with report.span("ansible_bake", playbook="bake_image.yaml") as span:
+            with open(BAKE_INVENTORY_PATH, "w") as f:
+                f.write("\n".join([
+                    "[all]",
+                    f"{args.name} ansible_host={bake_ip}",
+                    "",
+                    "[all:vars]",
+                    "ansible_user=root",
+                    f"ansible_ssh_private_key_file={ssh_key_path}",
+                    "ansible_ssh_common_args='-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null'",
+                    "",
+                ]))
+            # Every build server is new: don't reuse facts of the previous one
+            shutil.rmtree(BAKE_FACT_CACHE_DIR, ignore_errors=True)
+            if os.path.exists(BAKE_TIMINGS_PATH):
+                os.remove(BAKE_TIMINGS_PATH)
+            ansible_env = os.environ.copy()
+            ansible_env["ANSIBLE_CONFIG"] = ansible_cfg.write_ansible_cfg(BAKE_ANSIBLE_CFG_PATH, 1, BAKE_FACT_CACHE_DIR,
+                                                                          timings_path=BAKE_TIMINGS_PATH)
+            try:
+                phase_report.check_call(["ansible-playbook", "-i", BAKE_INVENTORY_PATH, "bake_image.yaml"],
+                                        span=span, cwd=ctl_common.ANSIBLE_DIR, env=ansible_env)
+            finally:
+                task_timings.print_report(BAKE_TIMINGS_PATH)
+
+        with report.span("create_snapshot") as span:
+            print("--- Creating snapshot ---")
+            phase_report.check_call(["terraform", "apply", "-auto-approve", state_arg, "-var", "create_snapshot=true"],
+                                    span=span, cwd=TERRAFORM_BAKE_DIR, env=tf_env)
+            snapshot_id = str(bake_output(state_arg, tf_env, span, "snapshot_id"))
+            # Forget the snapshot so 'destroy' below only removes the server
+            phase_report.check_call(["terraform", "state", "rm", state_arg, "hcloud_snapshot.image[0]"],
+                                    span=span, cwd=TERRAFORM_BAKE_DIR, env=tf_env)
+            span.attrs["snapshot_id"] = snapshot_id
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {' '.join(e.cmd[:3])} failed with code {e.returncode}.")
+        snapshot_id = None
+    except KeyError as e:
+        print(f"Error: terraform output of {TERRAFORM_BAKE_DIR} has no '{e.args[0]}' value.")
+        snapshot_id = None
+    finally:
+        if server_created and not args.keep_server:
+            with report.span("destroy_build_server") as span:
+                print("--- Destroying build server ---")
+                phase_report.call(["terraform", "destroy", "-auto-approve", state_arg], span=span,
+                                  cwd=TERRAFORM_BAKE_DIR, env=tf_env)
+
+    report.close("ok" if snapshot_id else "failed")
+    atexit.unregister(report.close)
+    report.print_summary()
+    if not snapshot_id:
+        sys.exit(1)
+
+    print(f"\nSnapshot {snapshot_id} ready (recipe {recipe}). Boot a cluster from it with:")
+    print(f"   python3 {os.path.join(ctl_common.SCRIPT_DIR, 'cluster_up.py')} ... --snapshot {snapshot_id}")
+
+
+def add_parsers(subparsers):
+    bake = subparsers.add_parser("bake-image", help="Build a Hetzner snapshot with Ansible phases 1-4 applied (for cluster_up.py --snapshot)")
+    bake.add_argument("--hetzner-token", required=True, help="Hetzner Cloud API Token")
+    bake.add_argument("--ssh-public-key-path", required=True, help="Path to SSH public key")
+    bake.add_argument("--ssh-private-key-path", required=True, help="Path to SSH private key")
+    bake.add_argument("--name", default="pmk-node-image", help="Build server name and snapshot description")
+    bake.add_argument("--server-type", default="cx23", help="Server type of the build server")
+    bake.add_argument("--location", default="nbg1", help="Hetzner location of the build server")
+    bake.add_argument("--terraform-mirror", help="Filesystem provider mirror (see 'tf-cache mirror')")
+    bake.add_argument("--keep-server", action="store_true", help="Do not destroy the build server afterwards (for debugging)")
+    bake.set_defaults(func=cmd_bake_image)
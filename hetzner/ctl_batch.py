@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ctl_common
+import tf_plugins
+import workspace
+
+# ==========================================
+# Batch Subcommand
+# ==========================================
+# Runs cluster_up.py / cluster_down.py for several named clusters at once,
+# each in its own workspace with its own log. Terraform's plugin cache is not
+# safe for concurrent installs of the same provider, so it is filled once up
+# front and the parallel inits only link from it.
+BATCH_LOG = "tmpfile_batch.log"
+
+
+def batch_cluster_names(args):
+    if args.clusters:
+        names = [n.strip() for n in args.clusters.split(",") if n.strip()]
+    else:
+        names = [f"{args.prefix}-{i + 1}" for i in range(args.count)]
+    for name in names:
+        error = workspace.validate_name(name)
+        if error:
+            print(f"Error: {error}")
+            sys.exit(1)
+    if len(set(names)) != len(names):
+        print("Error: duplicate cluster names.")
+        sys.exit(1)
+    return names
+
+
+def warm_plugin_cache(cache_dir):
+    """Installs the providers of both roots into the shared cache (no backend, throwaway data dir)."""
+    env = tf_plugins.terraform_env(os.environ.copy(), cache_dir=cache_dir)
+    for root in (ctl_common.TERRAFORM_INFRA_DIR, ctl_common.TERRAFORM_K8S_DIR):
+        with tempfile.TemporaryDirectory(prefix="tfdata-") as data_dir:
+            env["TF_DATA_DIR"] = data_dir
+            subprocess.run(["terraform", "init", "-backend=false", "-input=false"],
+                           cwd=root, env=env, check=True, stdout=subprocess.DEVNULL)
+
+
+def run_batch_member(script, name, script_args, env=None):
+    """Runs one cluster's cluster_up.py / cluster_down.py, output to its workspace log."""
+    ws = workspace.Workspace(name)
+    log_path = ws.path(BATCH_LOG)
+    start = time.monotonic()
+    with open(log_path, "w") as log:
+        rc = subprocess.call([sys.executable, os.path.join(ctl_common.SCRIPT_DIR, script), "--cluster-name", name] + script_args,
+                             stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, cwd=ctl_common.SCRIPT_DIR, env=env)
+    return {"cluster": name, "rc": rc, "duration_s": time.monotonic() - start, "log": log_path}
+
+
+def cmd_batch(args):
+    names = batch_cluster_names(args)
+    script = "cluster_up.py" if args.action == "up" else "cluster_down.py"
+    cache_dir = os.path.abspath(os.path.expanduser(args.terraform_plugin_cache))
+    script_args = args.script_args + ["--terraform-plugin-cache", cache_dir]
+
+    print(f"--- Warming Terraform plugin cache {cache_dir} ---")
+    try:
+        warm_plugin_cache(cache_dir)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: terraform init failed with code {e.returncode}.")
+        sys.exit(1)
+
+    max_parallel = args.max_parallel or len(names)
+    print(f"--- {script} for {len(names)} clusters ({max_parallel} at a time) ---")
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        futures = [pool.submit(run_batch_member, script, name, script_args) for name in names]
+        results = []
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            print(f"  {result['cluster']:<20} {'ok' if result['rc'] == 0 else 'FAILED':<7} {result['duration_s']:7.1f}s  {result['log']}")
+
+    failed = [r["cluster"] for r in results if r["rc"] != 0]
+    if failed:
+        print(f"Error: {len(failed)} of {len(results)} clusters failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"All {len(results)} clusters {'up' if args.action == 'up' else 'down'}.")
+
+
+def add_parsers(subparsers):
+    batch = subparsers.add_parser("batch", help="Run cluster_up.py / cluster_down.py for several named clusters in parallel",
+                                  description="Arguments after '--' are passed to every cluster_up.py / cluster_down.py run.")
+    batch.add_argument("action", choices=["up", "down"])
+    names = batch.add_mutually_exclusive_group(required=True)
+    names.add_argument("--clusters", help="Comma-separated cluster names")
+    names.add_argument("--count", type=int, help="Number of clusters named <prefix>-1..<prefix>-N")
+    batch.add_argument("--prefix", default="batch", help="Name prefix for --count")
+    batch.add_argument("--max-parallel", type=int, help="Clusters processed at the same time (default: all)")
+    batch.add_argument("--terraform-plugin-cache", default=tf_plugins.DEFAULT_CACHE_DIR, help="Provider plugin cache shared by all clusters")
+    batch.set_defaults(func=cmd_batch)
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import cluster_up
+import tunnel_daemon
+
+# ==========================================
+# cluster_ctl.py Paths and Shared Helpers
+# ==========================================
+# Per-cluster file names and helpers used by more than one cluster_ctl.py
+# subcommand module (ctl_<feature>.py).
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Subcommands that run other subcommands in the background start this script
+CLUSTER_CTL = os.path.join(SCRIPT_DIR, "cluster_ctl.py")
+# Per-cluster files, inside the cluster's workspace (see workspace.py)
+TF_OUTPUT_JSON = "tmpfile_terraform_output.json"
+KUBECONFIG = "tmpfile_kube_config"
+TUNNEL_KUBECONFIG = "tmpfile_kube_config_tunnel"
+SSH_CONFIG = "tmpfile_ssh_config"
+TUNNEL_STATE = "tmpfile_tunnel_state.json"
+TUNNEL_LOG = "tmpfile_tunnel.log"
+TERRAFORMRC = "tmpfile_terraformrc"
+INVENTORY = "tmpfile_inventory.ini"
+ANSIBLE_CFG = "tmpfile_ansible.cfg"
+ANSIBLE_FACT_CACHE = "tmpfile_ansible_facts"
+ANSIBLE_TIMINGS = "tmpfile_ansible_timings.jsonl"
+# Shared by all clusters
+TERRAFORMRC_PATH = os.path.join(SCRIPT_DIR, TERRAFORMRC)
+TERRAFORM_INFRA_DIR = os.path.join(SCRIPT_DIR, "terraform")
+TERRAFORM_K8S_DIR = os.path.join(SCRIPT_DIR, "terraform-kubernetes")
+ANSIBLE_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, "..", "ansible"))
+
+
+def load_cluster_info(tf_output_path):
+    """
+    Returns (master_public_ip, master_private_ip, bastion_ip, private_ips)
+    from the Terraform output written by cluster_up.py.
+    """
+    try:
+        with open(tf_output_path, 'r') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        print(f"Error: {tf_output_path} not found or invalid. Run cluster_up.py first.")
+        sys.exit(1)
+
+    dns_root = data.get('dns_root_record_ip', {}).get('value', {})
+    master_public_ip = next(iter(dns_root.values())) if dns_root else None
+    master_node_name = next(iter(dns_root.keys())) if dns_root else None
+    private_ips = data.get('server_private_ips', {}).get('value', {})
+    master_private_ip = private_ips.get(master_node_name)
+
+    return master_public_ip, master_private_ip, cluster_up.select_bastion_ip(data), private_ips
+
+
+def kubectl_json(kubectl_args, env):
+    return json.loads(subprocess.check_output(["kubectl"] + kubectl_args, env=env, stderr=subprocess.PIPE))
+
+
+def kubectl_env(ws):
+    """
+    Environment for kubectl with the cluster's kubeconfig; exits if there is
+    none yet.
+    """
+    if not os.path.exists(ws.path(KUBECONFIG)):
+        print(f"Error: {ws.path(KUBECONFIG)} not found. Run cluster_up.py first.")
+        sys.exit(1)
+    if not tunnel_daemon.find_running(ws.path(TUNNEL_STATE)):
+        print("Note: no tunnel daemon running; the kubeconfig needs a SOCKS5 proxy on "
+              f"localhost:{ws.tunnel_port} (cluster_ctl.py tunnel start).")
+    env = os.environ.copy()
+    env["KUBECONFIG"] = ws.path(KUBECONFIG)
+    return env
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import ctl_common
+import metrics_ring
+import workspace
+
+# ==========================================
+# Sample / Top Subcommands
+# ==========================================
+# 'sample' polls metrics-server (kubectl get --raw, through the cluster's
+# tunnel kubeconfig) into the cluster's metrics ring; 'top' reports
+# percentiles and peaks per node or pod over a time window of that ring.
+METRICS_RING = "tmpfile_metrics.ring"
+METRICS_SERIES = "tmpfile_metrics_series.json"
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_window(value):
+    """'90s', '15m', '6h', '2d' -> seconds."""
+    if value[-1:] in WINDOW_UNITS and value[:-1].isdigit():
+        return int(value[:-1]) * WINDOW_UNITS[value[-1]]
+    raise argparse.ArgumentTypeError(f"invalid window '{value}' (use e.g. 90s, 15m, 6h, 2d)")
+
+
+def node_allocatable(env):
+    """{node name: (allocatable CPU millicores, allocatable memory bytes)}."""
+    nodes = ctl_common.kubectl_json(["get", "nodes", "-o", "json"], env)
+    result = {}
+    for node in nodes.get("items", []):
+        alloc = node.get("status", {}).get("allocatable", {})
+        result[node["metadata"]["name"]] = (metrics_ring.parse_cpu(alloc.get("cpu", "0")),
+                                            metrics_ring.parse_memory(alloc.get("memory", "0")))
+    return result
+
+
+def cmd_sample(args):
+    ws = workspace.Workspace(args.cluster_name)
+    env = ctl_common.kubectl_env(ws)
+
+    ring = metrics_ring.RingBuffer(ws.path(METRICS_RING), capacity=args.capacity)
+    index = metrics_ring.SeriesIndex(ws.path(METRICS_SERIES))
+    try:
+        allocatable = node_allocatable(env)
+    except (subprocess.CalledProcessError, ValueError) as e:
+        print(f"Warning: could not read node allocatable resources: {e}")
+        allocatable = {}
+
+    print(f"Sampling every {args.interval}s into {ring.path} ({len(ring)}/{ring.capacity} records). Ctrl-C to stop.")
+    deadline = time.monotonic() + args.duration if args.duration else None
+    taken = 0
+    next_poll = time.monotonic()
+    try:
+        while True:
+            timestamp = time.time()
+            try:
+                nodes = ctl_common.kubectl_json(["get", "--raw", "/apis/metrics.k8s.io/v1beta1/nodes"], env)
+                pods = ctl_common.kubectl_json(["get", "--raw", "/apis/metrics.k8s.io/v1beta1/pods"], env)
+                records = metrics_ring.usage_records(timestamp, index, nodes, pods, allocatable)
+            except subprocess.CalledProcessError as e:
+                print(f"{time.strftime('%H:%M:%S')} metrics API unavailable: {e.stderr.decode(errors='replace').strip()}")
+            except ValueError as e:
+                print(f"{time.strftime('%H:%M:%S')} unreadable metrics: {e}")
+            else:
+                ring.append(records)
+                index.save()
+                node_records = [r for r in records if index.name(r[1]).startswith("node/")]
+                print(f"{time.strftime('%H:%M:%S')} {len(node_records)} nodes, {len(records) - len(node_records)} pods, "
+                      f"nodes CPU {sum(r[2] for r in node_records)}m, "
+                      f"memory {sum(r[3] for r in node_records) / 2 ** 20:.0f}Mi")
+                taken += 1
+            if args.count and taken >= args.count:
+                break
+            next_poll += args.interval
+            if deadline is not None and next_poll > deadline:
+                break
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.flush()
+        ring.close()
+    print(f"{taken} samples written.")
+
+
+def cmd_top(args):
+    ws = workspace.Workspace(args.cluster_name)
+    if not os.path.exists(ws.path(METRICS_RING)):
+        print(f"Error: no samples for cluster '{ws.label}'. Run 'cluster_ctl.py sample' first.")
+        sys.exit(1)
+    percentiles = [float(p) for p in args.percentiles.split(",")]
+    ring = metrics_ring.RingBuffer(ws.path(METRICS_RING))
+    index = metrics_ring.SeriesIndex(ws.path(METRICS_SERIES))
+    prefix = {"nodes": "node/", "pods": "pod/", "all": ""}[args.kind]
+    try:
+        summary = metrics_ring.summarize(ring, index, since=time.time() - args.window,
+                                         percentiles=percentiles, prefix=prefix)
+    finally:
+        ring.close()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    if not summary:
+        print(f"No samples in the last {args.window}s.")
+        return
+
+    rows = sorted(summary.items(), key=lambda item: item[1][args.sort]["peak"], reverse=True)
+    keys = [f"p{p:g}" for p in percentiles] + ["peak"]
+    print(f"{'series':<48} {'n':>5}  " + " ".join(f"{'cpu ' + k:>9}" for k in keys)
+          + "  " + " ".join(f"{'mem ' + k:>9}" for k in keys) + "  peak % of allocatable")
+    for name, stats in rows[:args.limit]:
+        cpu = " ".join(f"{str(stats['cpu_m'][k]) + 'm':>9}" for k in keys)
+        mem = " ".join(f"{stats['memory'][k] / 2 ** 20:>7.0f}Mi" for k in keys)
+        meta = index.series.get(name, {})
+        share = ""
+        if meta.get("allocatable_cpu_m") and meta.get("allocatable_memory"):
+            share = (f"cpu {stats['cpu_m']['peak'] / meta['allocatable_cpu_m'] * 100:.0f}%, "
+                     f"mem {stats['memory']['peak'] / meta['allocatable_memory'] * 100:.0f}%")
+        label = name if len(name) <= 48 else "..." + name[-45:]
+        print(f"{label:<48} {stats['samples']:>5}  {cpu}  {mem}  {share}")
+    if len(rows) > args.limit:
+        print(f"... {len(rows) - args.limit} more (--limit)")
+
+
+def add_parsers(subparsers):
+    sample = subparsers.add_parser("sample", help="Poll node and pod metrics (metrics-server) into the cluster's metrics ring")
+    sample.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    sample.add_argument("--interval", type=float, default=15, help="Seconds between polls")
+    sample.add_argument("--count", type=int, help="Stop after this many samples")
+    sample.add_argument("--duration", type=float, help="Stop after this many seconds")
+    sample.add_argument("--capacity", type=int, default=metrics_ring.DEFAULT_CAPACITY,
+                        help="Records kept when the ring is created (one per node and pod per poll)")
+    sample.set_defaults(func=cmd_sample)
+
+    top = subparsers.add_parser("top", help="Percentile and peak CPU/memory per node or pod from the sampled metrics")
+    top.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    top.add_argument("--window", type=parse_window, default="1h", help="Time window, e.g. 15m, 6h, 2d")
+    top.add_argument("--kind", choices=["nodes", "pods", "all"], default="nodes", help="Which series to report")
+    top.add_argument("--percentiles", default="50,95,99", help="Comma-separated percentiles")
+    top.add_argument("--sort", choices=["cpu_m", "memory"], default="cpu_m", help="Order by peak CPU or memory")
+    top.add_argument("--limit", type=int, default=20, help="Number of rows")
+    top.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    top.set_defaults(func=cmd_top)
@@ -0,0 +1,303 @@
+import argparse
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cluster_up
+import ctl_batch
+import ctl_common
+import ctl_scale
+import manifest_pipeline
+import nfs_storage
+import phase_report
+import socks_tunnel
+import tf_plugins
+import tunnel_daemon
+import warm_pool
+import workspace
+
+# ==========================================
+# Warm Pool Subcommand
+# ==========================================
+# 'fill' sets the pool size and starts the missing clusters, each as a
+# detached 'pool provision <name>' process running cluster_up.py. 'claim'
+# hands out the oldest ready cluster and starts a detached 'pool refill'.
+POOL_LOG = "tmpfile_pool.log"
+CLAIM_REPORT = "tmpfile_claim_report.jsonl"
+
+
+def spawn_pool_process(pool_args, log_path, env):
+    """Starts 'cluster_ctl.py pool <pool_args>' detached from the terminal, returns its pid."""
+    with open(log_path, "a") as log:
+        proc = subprocess.Popen(
+            [sys.executable, ctl_common.CLUSTER_CTL, "pool"] + pool_args,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+            cwd=ctl_common.SCRIPT_DIR,
+            env=env,
+        )
+    return proc.pid
+
+
+def refill_pool(env):
+    """Starts provisioners for the clusters missing to reach the pool size. Returns their names."""
+    with warm_pool.locked_state() as state:
+        names = warm_pool.plan_refill(state)
+        for name in names:
+            # Counts as alive until the provisioner's own pid is recorded
+            state["clusters"][name]["pid"] = os.getpid()
+        up_args = state["up_args"]
+    if not names:
+        return []
+
+    if len(names) > 1:
+        cache_dir = warm_pool.parse_up_args(up_args).terraform_plugin_cache or tf_plugins.DEFAULT_CACHE_DIR
+        try:
+            ctl_batch.warm_plugin_cache(os.path.abspath(os.path.expanduser(cache_dir)))
+        except subprocess.CalledProcessError as e:
+            print(f"Warning: warming the plugin cache failed with code {e.returncode}.")
+
+    for name in names:
+        pid = spawn_pool_process(["provision", name], workspace.Workspace(name).path(POOL_LOG), env)
+        with warm_pool.locked_state() as state:
+            cluster = state["clusters"][name]
+            if cluster["status"] == "provisioning":
+                cluster["pid"] = pid
+    return names
+
+
+def provision_pool_cluster(name, env):
+    """Runs cluster_up.py for one pool cluster and records the result."""
+    up_args = warm_pool.read_state()["up_args"]
+    start = time.monotonic()
+    rc = subprocess.call([sys.executable, os.path.join(ctl_common.SCRIPT_DIR, "cluster_up.py"), "--cluster-name", name] + up_args,
+                         stdin=subprocess.DEVNULL, cwd=ctl_common.SCRIPT_DIR, env=env)
+    with warm_pool.locked_state() as state:
+        cluster = state["clusters"].setdefault(name, {"created": time.time()})
+        cluster["provision_s"] = round(time.monotonic() - start, 1)
+        if rc == 0:
+            cluster.update(status="ready", ready_at=time.time())
+        else:
+            cluster.update(status="failed", error=f"cluster_up.py exited with code {rc}")
+    return rc
+
+
+def open_tunnel(ws, ssh_key_path):
+    """
+    A SOCKS tunnel to the cluster (its running tunnel daemon, else a new
+    'ssh -D') and TUNNEL_KUBECONFIG pointing at it. Stop it when done.
+    """
+    master_pub_ip, master_priv_ip, bastion_ip, _ = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+    probe_target = socks_tunnel.api_server_from_kubeconfig(ws.path(ctl_common.KUBECONFIG))
+    daemon = tunnel_daemon.find_running(ws.path(ctl_common.TUNNEL_STATE))
+    if daemon and socks_tunnel.socks5_connect(daemon["port"], *probe_target):
+        tunnel = socks_tunnel.SocksTunnel(None, daemon["port"])
+    else:
+        tunnel = socks_tunnel.start_socks_proxy(
+            bastion_ip=bastion_ip,
+            master_ip=master_priv_ip if bastion_ip else master_pub_ip,
+            ssh_key_path=os.path.abspath(os.path.expanduser(ssh_key_path)),
+            probe_target=probe_target,
+            ssh_config_path=ws.path(ctl_common.SSH_CONFIG),
+        )
+    cluster_up.patch_kubeconfig(ws.path(ctl_common.KUBECONFIG), tunnel.proxy_url, dest=ws.path(ctl_common.TUNNEL_KUBECONFIG))
+    return tunnel
+
+
+def k8s_tf_env(args, ws, kubeconfig_path):
+    """Environment for terraform in terraform-kubernetes, with the values cluster_up.py uses."""
+    mirror_dir = os.path.abspath(os.path.expanduser(args.terraform_mirror)) if args.terraform_mirror else None
+    cache_dir = os.path.abspath(os.path.expanduser(args.terraform_plugin_cache or tf_plugins.DEFAULT_CACHE_DIR))
+    tf_env = tf_plugins.terraform_env(os.environ.copy(), cache_dir=cache_dir, mirror_dir=mirror_dir,
+                                      cli_config_path=ws.path(ctl_common.TERRAFORMRC))
+    tf_env = ws.terraform_env(tf_env, ctl_common.TERRAFORM_K8S_DIR)
+    profile = nfs_storage.read_server_profile(ws.path(nfs_storage.SERVER_PROFILE)) or nfs_storage.DEFAULT_PROFILE
+    tf_env["TF_VAR_metallb_ip"] = f"{ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))[0]}/32"
+    tf_env["TF_VAR_acme_email"] = ws.acme_email or args.acme_email
+    tf_env["TF_VAR_kube_config_path"] = kubeconfig_path
+    tf_env["TF_VAR_nfs_server_ip"] = cluster_up.get_nfs_server_ip(ws.path(ctl_common.TF_OUTPUT_JSON))
+    tf_env["TF_VAR_nfs_mount_options"] = nfs_storage.mount_options(profile)
+    tf_env["KUBECONFIG"] = kubeconfig_path
+    return tf_env
+
+
+def claim_pool_cluster(name, args, up_args):
+    """Points the claimed cluster's DNS record, ACME account and manifests at the claimant."""
+    ws = workspace.Workspace(name)
+    shared = warm_pool.parse_up_args(up_args)
+    shared.hetzner_token = args.hetzner_token
+    master_pub_ip, master_priv_ip, bastion_ip, _ = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+    master = f"root@{master_priv_ip if bastion_ip else master_pub_ip}"
+
+    report = phase_report.PhaseReport(ws.path(CLAIM_REPORT), "claim")
+    atexit.register(report.close, "failed")
+    ok = False
+    try:
+        if args.dns_name:
+            with report.span("dns_record") as span:
+                ws.set_dns_name(args.dns_name)
+                workers = cluster_up.existing_worker_count(ws.path(ctl_common.TF_OUTPUT_JSON))
+                print(f"--- Pointing {ws.domain(shared.hetzner_zone_domain)} at {name} ---")
+                phase_report.check_call(["terraform", "apply", "-auto-approve", "-target=hcloud_zone_rrset.root"],
+                                        span=span, cwd=ctl_common.TERRAFORM_INFRA_DIR, env=ctl_scale.infra_tf_env(shared, ws, workers))
+
+        if args.acme_email:
+            with report.span("acme_email") as span:
+                # Saved first, so later cluster_up.py runs keep it too
+                ws.set_acme_email(args.acme_email)
+                print(f"--- Setting the ACME email of {name} to {args.acme_email} ---")
+                tunnel = open_tunnel(ws, shared.ssh_private_key_path)
+                try:
+                    phase_report.check_call(["terraform", "apply", "-auto-approve",
+                                             "-target=kubectl_manifest.letsencrypt_cluster_issuer"],
+                                            span=span, cwd=ctl_common.TERRAFORM_K8S_DIR,
+                                            env=k8s_tf_env(shared, ws, ws.path(ctl_common.TUNNEL_KUBECONFIG)))
+                finally:
+                    tunnel.stop()
+
+        with report.span("manifests") as span:
+            # Same variables as at provisioning time, with the claimant's domain and email
+            variables = manifest_pipeline.last_variables(ws.path(manifest_pipeline.RENDER_CACHE))
+            variables.update(domain=ws.domain(shared.hetzner_zone_domain))
+            if ws.acme_email:
+                variables.update(acme_email=ws.acme_email)
+            objects = manifest_pipeline.render_dir(manifest_pipeline.TEMPLATE_DIR, ws.path(manifest_pipeline.RENDERED_DIR),
+                                                   variables, ws.path(manifest_pipeline.RENDER_CACHE))
+            manifest_pipeline.apply(objects, ws.path(manifest_pipeline.APPLIED_STATE), ws.path(manifest_pipeline.APPLY_BATCH),
+                                    manifest_pipeline.cluster_id(ws.path(ctl_common.KUBECONFIG)),
+                                    kubectl=["ssh", "-F", ws.path(ctl_common.SSH_CONFIG), master, "kubectl"], span=span)
+        ok = True
+    except (manifest_pipeline.ManifestError, socks_tunnel.TunnelError) as e:
+        print(f"Error: {e}")
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {' '.join(e.cmd[:3])} failed with code {e.returncode}.")
+    finally:
+        report.close("ok" if ok else "failed")
+        atexit.unregister(report.close)
+        report.print_summary()
+    return ok, ws
+
+
+def print_pool_status(state):
+    c = warm_pool.counts(state)
+    print(f"Pool size {state['size']}: {c['ready']} ready, {c['provisioning']} provisioning, "
+          f"{c['claimed']} claimed, {c['failed']} failed")
+    for name, cluster in sorted(state["clusters"].items(), key=lambda item: item[1].get("created", 0)):
+        details = cluster.get("claimed_by") or cluster.get("error") or ""
+        took = f"{cluster['provision_s']:7.1f}s" if "provision_s" in cluster else " " * 8
+        print(f"  {name:<20} {cluster['status']:<13} {took}  {details}")
+
+
+def cmd_pool(args):
+    if args.action == "fill":
+        args.script_args, token = warm_pool.without_token(args.script_args)
+        args.hetzner_token = token or args.hetzner_token
+    if args.action != "status" and not args.hetzner_token:
+        print(f"Error: 'pool {args.action}' needs the Hetzner token (--hetzner-token or ${cluster_up.TOKEN_ENV}).")
+        sys.exit(1)
+    env = {**os.environ, cluster_up.TOKEN_ENV: args.hetzner_token} if args.hetzner_token else None
+
+    if args.action == "provision":
+        if not args.name:
+            print("Error: 'pool provision' needs a cluster name.")
+            sys.exit(1)
+        sys.exit(0 if provision_pool_cluster(args.name, env) == 0 else 1)
+
+    if args.action == "refill":
+        names = refill_pool(env)
+        print(f"Started {len(names)} cluster(s): {', '.join(names)}" if names else "Pool is full.")
+        return
+
+    if args.action == "fill":
+        with warm_pool.locked_state() as state:
+            if args.script_args:
+                state["up_args"] = args.script_args
+            if not state["up_args"]:
+                print("Error: the first 'pool fill' needs the cluster_up.py arguments after '--'.")
+                sys.exit(1)
+            if args.size is not None:
+                state["size"] = args.size
+        names = refill_pool(env)
+        print(f"Started {len(names)} cluster(s): {', '.join(names)}" if names else "Pool is full.")
+        print_pool_status(warm_pool.read_state())
+        return
+
+    if args.action == "status":
+        with warm_pool.locked_state() as state:
+            warm_pool.reap_dead(state)
+        print_pool_status(state)
+        return
+
+    if args.action == "claim":
+        if args.dns_name and not workspace.NAME_PATTERN.match(args.dns_name):
+            print(f"Error: invalid DNS name '{args.dns_name}'.")
+            sys.exit(1)
+        claimant = args.claimant or args.dns_name or os.environ.get("USER", "unknown")
+        with warm_pool.locked_state() as state:
+            warm_pool.reap_dead(state)
+            name = warm_pool.take_ready(state, claimant)
+            up_args = state["up_args"]
+            if name:
+                state["clusters"][name].update(dns_name=args.dns_name, acme_email=args.acme_email)
+        spawn_pool_process(["refill"], os.path.join(ctl_common.SCRIPT_DIR, POOL_LOG), env)
+        if not name:
+            print("Error: no ready cluster in the pool (see 'pool status'); a refill was started.")
+            sys.exit(1)
+
+        ok, ws = claim_pool_cluster(name, args, up_args)
+        domain = ws.domain(warm_pool.parse_up_args(up_args).hetzner_zone_domain)
+        print(f"\nClaimed {name} for {claimant} (domain {domain}).")
+        print(f"   python3 cluster_ctl.py tunnel start --cluster-name {name} --ssh-private-key-path <key>")
+        print(f"   export KUBECONFIG={ws.path(ctl_common.KUBECONFIG)}")
+        print(f"   python3 cluster_down.py --cluster-name {name} ...   # when done")
+        if not ok:
+            sys.exit(1)
+        return
+
+    if args.action == "drain":
+        # Tears down every unclaimed cluster; claimed ones belong to their claimants
+        with warm_pool.locked_state() as state:
+            state["size"] = 0
+            warm_pool.reap_dead(state)
+            names = [n for n, c in state["clusters"].items() if c["status"] in ("ready", "failed")]
+            busy = [n for n, c in state["clusters"].items() if c["status"] == "provisioning"]
+            up_args = state["up_args"]
+        if busy:
+            print(f"Note: still provisioning, drain again later: {', '.join(busy)}")
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, len(names))) as pool:
+            futures = [pool.submit(ctl_batch.run_batch_member, "cluster_down.py", n, warm_pool.down_args(up_args) + ["--fast"], env)
+                       for n in names]
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                print(f"  {result['cluster']:<20} {'ok' if result['rc'] == 0 else 'FAILED':<7} {result['duration_s']:7.1f}s  {result['log']}")
+        with warm_pool.locked_state() as state:
+            for result in results:
+                if result["rc"] == 0:
+                    state["clusters"].pop(result["cluster"], None)
+                    shutil.rmtree(workspace.Workspace(result["cluster"]).dir, ignore_errors=True)
+        if any(r["rc"] != 0 for r in results):
+            sys.exit(1)
+        return
+
+
+def add_parsers(subparsers):
+    pool = subparsers.add_parser("pool", help="Warm pool of ready clusters that can be claimed in seconds",
+                                 description="'pool fill' takes the cluster_up.py arguments after '--'.")
+    pool.add_argument("action", choices=["fill", "status", "claim", "drain", "refill", "provision"],
+                      help="'refill' and 'provision' are started in the background by 'fill' and 'claim'")
+    pool.add_argument("name", nargs="?", help=argparse.SUPPRESS)
+    pool.add_argument("--hetzner-token", default=os.environ.get(cluster_up.TOKEN_ENV),
+                      help=f"Hetzner Cloud API Token (default: ${cluster_up.TOKEN_ENV}); not stored in the pool state")
+    pool.add_argument("--size", type=int, help="fill: number of ready clusters to keep on standby")
+    pool.add_argument("--dns-name", help="claim: DNS label for the claimed cluster (<dns-name>.<zone>)")
+    pool.add_argument("--acme-email", help="claim: Let's Encrypt account email for the claimed cluster")
+    pool.add_argument("--claimant", help="claim: who the cluster is handed to (default: --dns-name or $USER)")
+    pool.set_defaults(func=cmd_pool)
@@ -0,0 +1,242 @@
+import atexit
+import json
+import os
+import subprocess
+import sys
+
+import ansible_cfg
+import cluster_up
+import ctl_common
+import known_hosts
+import phase_report
+import ssh_config
+import ssh_probe
+import task_timings
+import tf_plugins
+import workspace
+
+# ==========================================
+# Add-Workers / Remove-Workers Subcommands
+# ==========================================
+# Only the servers being added or removed are touched: Terraform runs with
+# -target on their hcloud_server instances, SSH probing and Ansible are
+# limited to the new hosts and the existing nodes never see a playbook run.
+SCALE_REPORT = "tmpfile_scale_report.jsonl"
+
+
+def worker_alias(node_index):
+    """Inventory alias of hcloud_server.node[node_index] (see cluster_up.generate_inventory)."""
+    return f"k8s-worker-node{node_index}"
+
+
+def infra_tf_env(args, ws, worker_count):
+    tf_env = os.environ.copy()
+    tf_env["TF_VAR_hcloud_token"] = args.hetzner_token
+    tf_env["TF_VAR_hetzner_zone_domain"] = args.hetzner_zone_domain
+    tf_env["TF_VAR_ssh_public_key_path"] = os.path.abspath(os.path.expanduser(args.ssh_public_key_path))
+    tf_env["TF_VAR_worker_count"] = str(worker_count)
+    tf_env["TF_VAR_control_plane_server_type"] = args.control_plane_server_type
+    tf_env["TF_VAR_worker_server_type"] = args.worker_server_type
+    if args.snapshot:
+        tf_env["TF_VAR_node_image"] = args.snapshot
+    mirror_dir = os.path.abspath(os.path.expanduser(args.terraform_mirror)) if args.terraform_mirror else None
+    tf_env = tf_plugins.terraform_env(tf_env, mirror_dir=mirror_dir, cli_config_path=ws.path(ctl_common.TERRAFORMRC))
+    return ws.terraform_env(tf_env, ctl_common.TERRAFORM_INFRA_DIR)
+
+
+def sorted_node_names(ws):
+    """Server names of the cluster, control plane first (hcloud_server.node index order)."""
+    _, _, _, private_ips = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+    return sorted(private_ips, key=cluster_up.node_sort_key)
+
+
+def apply_node_targets(ws, node_indices, tf_env, span):
+    """Targeted apply of the given hcloud_server instances, then refreshes the output file."""
+    targets = [f"-target=hcloud_server.node[{i}]" for i in node_indices]
+    phase_report.check_call(["terraform", "apply", "-auto-approve"] + targets,
+                            span=span, cwd=ctl_common.TERRAFORM_INFRA_DIR, env=tf_env)
+    output_bytes = phase_report.check_output(["terraform", "output", "-json"],
+                                             span=span, cwd=ctl_common.TERRAFORM_INFRA_DIR, env=tf_env)
+    with open(ws.path(ctl_common.TF_OUTPUT_JSON), "wb") as f:
+        f.write(output_bytes)
+
+
+def refresh_cluster_files(ws, ssh_key_path):
+    """
+    Rewrites ssh_config, inventory and ansible.cfg from the current Terraform
+    output and drops the cached facts of created or destroyed servers.
+    """
+    _, _, bastion_ip, private_ips = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+    ssh_config.write_ssh_config(ws.path(ctl_common.SSH_CONFIG), private_ips, bastion_ip, ssh_key_path)
+    cluster_up.generate_inventory(ws.path(ctl_common.TF_OUTPUT_JSON), ws.path(ctl_common.INVENTORY), ssh_key_path, ssh_config_path=ws.path(ctl_common.SSH_CONFIG))
+    ansible_cfg.write_ansible_cfg(ws.path(ctl_common.ANSIBLE_CFG), len(private_ips), ws.path(ctl_common.ANSIBLE_FACT_CACHE),
+                                  timings_path=ws.path(ctl_common.ANSIBLE_TIMINGS))
+    ansible_cfg.prune_fact_cache(ws.path(ctl_common.ANSIBLE_FACT_CACHE), cluster_up.fact_cache_servers(ws.path(ctl_common.TF_OUTPUT_JSON)))
+
+
+def server_public_ips(ws):
+    with open(ws.path(ctl_common.TF_OUTPUT_JSON), "r") as f:
+        return json.load(f).get("server_public_ips", {}).get("value", {})
+
+
+def finish_scale_report(report, ok):
+    report.close("ok" if ok else "failed")
+    atexit.unregister(report.close)
+    report.print_summary()
+    if not ok:
+        sys.exit(1)
+
+
+def cmd_add_workers(args):
+    """
+    Creates args.count more workers and joins them: targeted terraform apply
+    -> SSH probe of the new hosts -> scale_out playbook with --limit.
+    """
+    ws = workspace.Workspace(args.cluster_name)
+    ssh_key_path = os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+    current = cluster_up.existing_worker_count(ws.path(ctl_common.TF_OUTPUT_JSON))
+    if current is None:
+        print(f"Error: {ws.path(ctl_common.TF_OUTPUT_JSON)} not found or invalid. Run cluster_up.py first.")
+        sys.exit(1)
+    if args.count < 1:
+        print("Error: count must be at least 1.")
+        sys.exit(1)
+    new_indices = list(range(current + 1, current + 1 + args.count))
+    tf_env = infra_tf_env(args, ws, current + args.count)
+
+    report = phase_report.PhaseReport(ws.path(SCALE_REPORT), "add_workers")
+    atexit.register(report.close, "failed")
+    ok = False
+    try:
+        with report.span("terraform_apply_new_nodes", nodes=len(new_indices)) as span:
+            print(f"--- Creating {len(new_indices)} worker(s) ---")
+            apply_node_targets(ws, new_indices, tf_env, span)
+
+        with report.span("refresh_cluster_files"):
+            refresh_cluster_files(ws, ssh_key_path)
+            _, _, bastion_ip, private_ips = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+            names = sorted_node_names(ws)
+            new_hosts = {names[i]: private_ips[names[i]] for i in new_indices}
+            public_ips = server_public_ips(ws)
+            known_hosts.remove_hosts(set(new_hosts.values()) | {public_ips[n] for n in new_hosts if n in public_ips})
+
+        with report.span("wait_for_ssh", nodes=len(new_hosts)) as span:
+            def on_ready(probe):
+                print(f"  {probe.name} ({probe.ip}) ready after {probe.ready_after_s:.1f}s")
+            probes = ssh_probe.wait_for_hosts(new_hosts, bastion_ip, ssh_key_path, timeout=300,
+                                              on_ready=on_ready, ssh_config=ws.path(ctl_common.SSH_CONFIG))
+            span.retries = sum(max(0, p.attempts - 1) for p in probes)
+            not_ready = [p for p in probes if p.ready_after_s is None]
+            if not_ready:
+                for p in not_ready:
+                    print(f"  {p.name} ({p.ip}) unreachable: {p.last_error}")
+                print("Error: Could not connect to the new nodes via SSH.")
+                return
+
+        playbook = "scale_out_snapshot.yaml" if args.snapshot else "scale_out.yaml"
+        with report.span("ansible_scale_out", playbook=playbook) as span:
+            if os.path.exists(ws.path(ctl_common.ANSIBLE_TIMINGS)):
+                os.remove(ws.path(ctl_common.ANSIBLE_TIMINGS))
+            ansible_env = os.environ.copy()
+            ansible_env["ANSIBLE_CONFIG"] = ws.path(ctl_common.ANSIBLE_CFG)
+            try:
+                phase_report.check_call([
+                    "ansible-playbook", "-i", ws.path(ctl_common.INVENTORY),
+                    "--limit", ",".join(worker_alias(i) for i in new_indices),
+                    "-e", f"join_batch_size={args.join_batch_size}",
+                    "-e", f"node_cache_enabled={str(args.node_cache).lower()}",
+                    playbook
+                ], span=span, cwd=ctl_common.ANSIBLE_DIR, env=ansible_env)
+            finally:
+                task_timings.print_report(ws.path(ctl_common.ANSIBLE_TIMINGS))
+        ok = True
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {' '.join(e.cmd[:3])} failed with code {e.returncode}.")
+    finally:
+        finish_scale_report(report, ok)
+
+    print(f"\nCluster now has {current + args.count} workers.")
+
+
+def cmd_remove_workers(args):
+    """
+    Drains and deletes the args.count highest-numbered workers from
+    Kubernetes, then destroys their servers with a targeted apply.
+    """
+    ws = workspace.Workspace(args.cluster_name)
+    ssh_key_path = os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+    current = cluster_up.existing_worker_count(ws.path(ctl_common.TF_OUTPUT_JSON))
+    if current is None:
+        print(f"Error: {ws.path(ctl_common.TF_OUTPUT_JSON)} not found or invalid. Run cluster_up.py first.")
+        sys.exit(1)
+    # node-2 (hcloud_server.node[1]) carries the data volume and is the bastion
+    if args.count < 1 or current - args.count < 1:
+        print(f"Error: can remove between 1 and {current - 1} workers (node-2 must stay).")
+        sys.exit(1)
+    removed_indices = list(range(current + 1 - args.count, current + 1))
+    removed_nodes = sorted_node_names(ws)[-args.count:]
+    master_pub_ip, master_priv_ip, bastion_ip, private_ips = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+    removed_ips = {private_ips[n] for n in removed_nodes if n in private_ips}
+    public_ips = server_public_ips(ws)
+    removed_ips |= {public_ips[n] for n in removed_nodes if n in public_ips}
+    tf_env = infra_tf_env(args, ws, current - args.count)
+
+    report = phase_report.PhaseReport(ws.path(SCALE_REPORT), "remove_workers")
+    atexit.register(report.close, "failed")
+    ok = False
+    try:
+        master = f"root@{master_priv_ip if bastion_ip else master_pub_ip}"
+        nodes = " ".join(removed_nodes)
+        with report.span("drain_nodes", nodes=len(removed_nodes)) as span:
+            print(f"--- Draining {nodes} ---")
+            phase_report.check_call([
+                "ssh", "-F", ws.path(ctl_common.SSH_CONFIG), master,
+                f"kubectl drain {nodes} --ignore-daemonsets --delete-emptydir-data --timeout={args.drain_timeout}s"
+            ], span=span)
+
+        with report.span("delete_nodes") as span:
+            phase_report.check_call(["ssh", "-F", ws.path(ctl_common.SSH_CONFIG), master,
+                                     f"kubectl delete node --ignore-not-found {nodes}"], span=span)
+
+        with report.span("terraform_destroy_nodes", nodes=len(removed_indices)) as span:
+            print(f"--- Destroying {nodes} ---")
+            apply_node_targets(ws, removed_indices, tf_env, span)
+
+        with report.span("refresh_cluster_files"):
+            ssh_config.close_masters(ws.path(ctl_common.SSH_CONFIG), [f"root@{private_ips[n]}" for n in removed_nodes if n in private_ips])
+            refresh_cluster_files(ws, ssh_key_path)
+            known_hosts.remove_hosts(removed_ips)
+        ok = True
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {' '.join(e.cmd[:3])} failed with code {e.returncode}.")
+    finally:
+        finish_scale_report(report, ok)
+
+    print(f"\nCluster now has {current - args.count} workers.")
+
+
+def add_scale_arguments(parser, add, remove):
+    """Arguments of add-workers / remove-workers (both for autoscale)."""
+    parser.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    parser.add_argument("--hetzner-token", default=os.environ.get(cluster_up.TOKEN_ENV), required=not os.environ.get(cluster_up.TOKEN_ENV),
+                        help=f"Hetzner Cloud API Token (default: ${cluster_up.TOKEN_ENV})")
+    parser.add_argument("--hetzner-zone-domain", required=True, help="Hetzner DNS Zone Domain")
+    parser.add_argument("--ssh-public-key-path", required=True, help="Path to SSH public key")
+    parser.add_argument("--ssh-private-key-path", required=True, help="Path to SSH private key")
+    parser.add_argument("--control-plane-server-type", default="cx23", help="Must match the value used with cluster_up.py")
+    parser.add_argument("--worker-server-type", default="cx23", help="Server type of the workers")
+    parser.add_argument("--snapshot", help="Snapshot the cluster was created from (see 'bake-image')")
+    parser.add_argument("--terraform-mirror", help="Filesystem provider mirror (see 'tf-cache mirror')")
+    if add:
+        parser.add_argument("--join-batch-size", default="20", help="Workers joining per wave (number or percentage, e.g. 25%%)")
+        parser.add_argument("--node-cache", action="store_true", help="The cluster uses the apt/registry cache on the volume node")
+    if remove:
+        parser.add_argument("--drain-timeout", type=int, default=300, help="Seconds to wait for 'kubectl drain'")
+
+
+def add_parsers(subparsers):
+    for name, func, verb in (("add-workers", cmd_add_workers, "add"), ("remove-workers", cmd_remove_workers, "remove")):
+        scale = subparsers.add_parser(name, help=f"{verb.capitalize()} worker nodes without touching the rest of the cluster")
+        scale.add_argument("count", type=int, help=f"Number of workers to {verb}")
+        add_scale_arguments(scale, add=verb == "add", remove=verb == "remove")
+        scale.set_defaults(func=func)
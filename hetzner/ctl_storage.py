@@ -0,0 +1,150 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import ctl_common
+import nfs_storage
+import workspace
+
+# ==========================================
+# Storage Benchmark Subcommand
+# ==========================================
+# Runs fio in a Job on a PVC per client profile. Each profile gets its own
+# temporary StorageClass with the profile's mount options, served by the
+# same provisioner and NFS server as nfs-storage, so client options can be
+# compared without re-provisioning; the server side is whatever
+# cluster_up.py --storage-profile configured and is recorded with the results.
+STORAGE_BENCH_REPORT = "tmpfile_storage_bench.jsonl"
+
+
+def kubectl_apply_json(objects, env):
+    subprocess.run(["kubectl", "apply", "-f", "-"], input=json.dumps(objects).encode(), env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def wait_for_job(name, env, timeout):
+    """'succeeded' or 'failed' once the Job has finished, None on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = ctl_common.kubectl_json(["get", "job", name, "-n", nfs_storage.BENCH_NAMESPACE, "-o", "json"], env).get("status", {})
+        if status.get("succeeded"):
+            return "succeeded"
+        if status.get("failed"):
+            return "failed"
+        time.sleep(5)
+    return None
+
+
+def run_storage_bench(profile, provisioner, args, env):
+    """Results of one profile's fio Job (see nfs_storage.parse_fio); exits on failure."""
+    objects = nfs_storage.bench_objects(profile, provisioner, args.image, args.size, args.runtime)
+    name = f"fio-{profile}"
+    print(f"--- Benchmarking profile '{profile}' "
+          f"({', '.join(nfs_storage.PROFILES[profile]['mount_options']) or 'default mount options'}) ---")
+    try:
+        kubectl_apply_json(objects, env)
+        outcome = wait_for_job(name, env, args.timeout)
+        logs = subprocess.run(["kubectl", "logs", f"job/{name}", "-n", nfs_storage.BENCH_NAMESPACE], env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).stdout
+        if outcome != "succeeded":
+            print(f"Error: fio job {'timed out' if outcome is None else 'failed'} for profile '{profile}':")
+            print(logs.strip()[-2000:])
+            return None
+        return nfs_storage.parse_fio(logs)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: {' '.join(e.cmd[:3])} failed with code {e.returncode}.")
+        return None
+    except ValueError as e:
+        print(f"Error: unreadable fio output for profile '{profile}': {e}")
+        return None
+    finally:
+        # PVC first, so the provisioner still finds the StorageClass when it deletes the directory
+        for kind, obj_name, namespaced in (("job", name, True), ("pvc", name, True),
+                                           ("storageclass", f"nfs-bench-{profile}", False)):
+            cmd = ["kubectl", "delete", kind, obj_name, "--ignore-not-found", "--wait=true"]
+            if namespaced:
+                cmd += ["-n", nfs_storage.BENCH_NAMESPACE]
+            subprocess.call(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def print_storage_results(runs):
+    latency = " ".join(f"{'p' + str(p) + ' ms':>9}" for p in nfs_storage.PERCENTILES)
+    print(f"{'server':<11} {'client':<11} {'test':<16} {'IOPS':>9} {'MiB/s':>8} {latency}")
+    for run in runs:
+        for test, stats in run["results"].items():
+            lat = " ".join(f"{stats['lat_ms'][f'p{p}']:>9.2f}" for p in nfs_storage.PERCENTILES)
+            print(f"{run['server_profile'] or '?':<11} {run['client_profile']:<11} {test:<16} "
+                  f"{stats['iops']:>9.0f} {stats['mib_s']:>8.1f} {lat}")
+
+
+def cmd_bench_storage(args):
+    ws = workspace.Workspace(args.cluster_name)
+    report_path = ws.path(STORAGE_BENCH_REPORT)
+    if args.report:
+        if not os.path.exists(report_path):
+            print(f"Error: no storage benchmarks recorded for cluster '{ws.label}'.")
+            sys.exit(1)
+        with open(report_path, "r") as f:
+            runs = [json.loads(line) for line in f if line.strip()]
+        # The latest run per server/client profile pair
+        latest = {(r["server_profile"], r["client_profile"]): r for r in runs}
+        print_storage_results(sorted(latest.values(), key=lambda r: (r["server_profile"] or "", r["client_profile"])))
+        return
+
+    profiles = sorted(nfs_storage.PROFILES) if args.profiles == "all" else args.profiles.split(",")
+    unknown = [p for p in profiles if p not in nfs_storage.PROFILES]
+    if unknown:
+        print(f"Error: unknown profile(s) {', '.join(unknown)} (choose from {', '.join(sorted(nfs_storage.PROFILES))}).")
+        sys.exit(1)
+    env = ctl_common.kubectl_env(ws)
+
+    try:
+        provisioner = ctl_common.kubectl_json(["get", "storageclass", "nfs-storage", "-o", "json"], env)["provisioner"]
+        kubectl_apply_json({"apiVersion": "v1", "kind": "Namespace",
+                            "metadata": {"name": nfs_storage.BENCH_NAMESPACE}}, env)
+    except subprocess.CalledProcessError as e:
+        print(f"Error: cluster unavailable: {e.stderr.decode(errors='replace').strip() if e.stderr else e}")
+        sys.exit(1)
+    server_profile = nfs_storage.read_server_profile(ws.path(nfs_storage.SERVER_PROFILE))
+
+    runs = []
+    failed = False
+    try:
+        for profile in profiles:
+            results = run_storage_bench(profile, provisioner, args, env)
+            if results is None:
+                failed = True
+                continue
+            run = {"time": time.time(), "server_profile": server_profile, "client_profile": profile,
+                   "mount_options": nfs_storage.PROFILES[profile]["mount_options"],
+                   "size": args.size, "runtime_s": args.runtime, "results": results}
+            runs.append(run)
+            with open(report_path, "a") as f:
+                f.write(json.dumps(run) + "\n")
+    finally:
+        subprocess.call(["kubectl", "delete", "namespace", nfs_storage.BENCH_NAMESPACE, "--ignore-not-found",
+                         "--wait=false"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    if args.json:
+        print(json.dumps(runs, indent=2))
+    elif runs:
+        print()
+        print_storage_results(runs)
+    if failed:
+        sys.exit(1)
+
+
+def add_parsers(subparsers):
+    bench_storage = subparsers.add_parser("bench-storage", help="fio benchmark of the NFS storage with each client mount profile")
+    bench_storage.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    bench_storage.add_argument("--profiles", default="all",
+                               help=f"Comma-separated client profiles ({', '.join(sorted(nfs_storage.PROFILES))}) or 'all'")
+    bench_storage.add_argument("--size", default="512m", help="fio file size per test (fio units, e.g. 512m, 2g)")
+    bench_storage.add_argument("--runtime", type=int, default=30, help="Seconds per fio test")
+    bench_storage.add_argument("--image", default="alpine:3.20", help="Job image (fio is installed with apk if missing)")
+    bench_storage.add_argument("--timeout", type=int, default=900, help="Seconds to wait for each fio Job")
+    bench_storage.add_argument("--report", action="store_true", help="Only print the latest recorded result per profile")
+    bench_storage.add_argument("--json", action="store_true", help="Print this run's results as JSON")
+    bench_storage.set_defaults(func=cmd_bench_storage)
@@ -0,0 +1,41 @@
+import os
+import shlex
+import subprocess
+import sys
+
+import ctl_common
+import tf_plugins
+
+# ==========================================
+# Terraform Provider Cache Subcommand
+# ==========================================
+def cmd_tf_cache(args):
+    cache_dir = os.path.abspath(os.path.expanduser(args.cache_dir))
+    mirror_dir = os.path.abspath(os.path.expanduser(args.mirror_dir))
+
+    if args.action == "mirror":
+        # Covers every root in the repo, including terraform-state-bucket and aws/
+        try:
+            mirrored = tf_plugins.build_mirror(mirror_dir)
+        except subprocess.CalledProcessError as e:
+            print(f"Error: terraform providers mirror failed with code {e.returncode}.")
+            sys.exit(1)
+        providers = tf_plugins.lock_file_providers()
+        print(f"Mirror {mirror_dir}: {len(providers)} providers pinned, {len(mirrored)} roots updated.")
+        return
+
+    if args.action == "env":
+        # For running terraform by hand in any root: eval "$(cluster_ctl.py tf-cache env)"
+        env = tf_plugins.terraform_env({}, cache_dir=cache_dir, mirror_dir=mirror_dir, cli_config_path=ctl_common.TERRAFORMRC_PATH)
+        for key in ("TF_PLUGIN_CACHE_DIR", "TF_CLI_CONFIG_FILE"):
+            if key in env:
+                print(f"export {key}={shlex.quote(env[key])}")
+
+
+def add_parsers(subparsers):
+    tf_cache = subparsers.add_parser("tf-cache", help="Shared Terraform provider cache and filesystem mirror for all roots")
+    tf_cache.add_argument("action", choices=["mirror", "env"],
+                          help="'mirror' downloads the providers pinned in the lock files, 'env' prints shell exports")
+    tf_cache.add_argument("--cache-dir", default=tf_plugins.DEFAULT_CACHE_DIR, help="Plugin cache directory")
+    tf_cache.add_argument("--mirror-dir", default=tf_plugins.DEFAULT_MIRROR_DIR, help="Filesystem mirror directory")
+    tf_cache.set_defaults(func=cmd_tf_cache)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import ctl_common
+import task_timings
+import workspace
+
+# ==========================================
+# Ansible Timings Subcommand
+# ==========================================
+def cmd_ansible_timings(args):
+    path = os.path.abspath(os.path.expanduser(args.file or workspace.Workspace(args.cluster_name).path(ctl_common.ANSIBLE_TIMINGS)))
+    if not os.path.exists(path):
+        print(f"Error: {path} not found. Timings are written by every cluster_up.py / add-workers playbook run.")
+        sys.exit(1)
+    task_timings.print_report(path, top_n=args.top, max_hosts=args.hosts)
+
+
+def add_parsers(subparsers):
+    timings = subparsers.add_parser("ansible-timings", help="Slowest Ansible tasks and per-host skew of the last playbook run")
+    timings.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    timings.add_argument("--file", help="Timings JSONL written by the task_timings callback (default: the cluster's last run)")
+    timings.add_argument("--top", type=int, default=20, help="Number of slowest tasks to list")
+    timings.add_argument("--hosts", type=int, default=10, help="Number of hosts to list in the skew table")
+    timings.set_defaults(func=cmd_ansible_timings)
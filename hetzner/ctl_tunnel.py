@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import sys
+
+import ctl_common
+import socks_tunnel
+import ssh_config
+import tunnel_daemon
+import workspace
+
+# ==========================================
+# Tunnel Subcommand
+# ==========================================
+def tunnel_run_args(args, ws):
+    """Builds the 'tunnel run' arguments the detached daemon is started with."""
+    master_pub_ip, master_priv_ip, bastion_ip, private_ips = ctl_common.load_cluster_info(ws.path(ctl_common.TF_OUTPUT_JSON))
+    ssh_key_path = os.path.abspath(os.path.expanduser(args.ssh_private_key_path))
+
+    # Reuse (or create) the multiplexed ssh_config so reconnects are cheap
+    ssh_config.write_ssh_config(ws.path(ctl_common.SSH_CONFIG), private_ips, bastion_ip, ssh_key_path)
+
+    host, port = socks_tunnel.api_server_from_kubeconfig(ws.path(ctl_common.KUBECONFIG))
+    return [
+        "--master-ip", master_priv_ip if bastion_ip else master_pub_ip,
+        "--bastion-ip", bastion_ip or "",
+        "--ssh-private-key-path", ssh_key_path,
+        "--probe-target", f"{host}:{port}",
+        "--port", str(args.port),
+    ] + (["--cluster-name", ws.name] if ws.name else [])
+
+
+def cmd_tunnel(args):
+    ws = workspace.Workspace(args.cluster_name)
+    if args.port is None:
+        args.port = ws.tunnel_port
+    if args.action == "run":
+        host, _, port = args.probe_target.rpartition(":")
+        tunnel_daemon.run_forever(
+            ws.path(ctl_common.TUNNEL_STATE),
+            bastion_ip=args.bastion_ip or None,
+            master_ip=args.master_ip,
+            ssh_key_path=args.ssh_private_key_path,
+            probe_target=(host, int(port)),
+            ssh_config_path=ws.path(ctl_common.SSH_CONFIG) if os.path.exists(ws.path(ctl_common.SSH_CONFIG)) else None,
+            port=args.port,
+        )
+        return
+
+    if args.action == "start":
+        running = tunnel_daemon.find_running(ws.path(ctl_common.TUNNEL_STATE))
+        if running:
+            print(f"Tunnel already running on localhost:{running['port']} (pid {running['pid']}).")
+            return
+        if not args.ssh_private_key_path:
+            print("Error: --ssh-private-key-path is required to start the tunnel.")
+            sys.exit(1)
+        if args.port == 0:
+            args.port = socks_tunnel.find_free_port()
+        try:
+            state = tunnel_daemon.spawn(ws.path(ctl_common.TUNNEL_STATE), ws.path(ctl_common.TUNNEL_LOG), tunnel_run_args(args, ws))
+        except socks_tunnel.TunnelError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Tunnel daemon started on localhost:{state['port']} (pid {state['pid']}).")
+        print(f"   export KUBECONFIG={ws.path(ctl_common.KUBECONFIG)}")
+        if state["port"] != ws.tunnel_port:
+            print(f"   (proxy-url in your kubeconfig must be socks5://localhost:{state['port']})")
+        return
+
+    if args.action == "stop":
+        if tunnel_daemon.stop(ws.path(ctl_common.TUNNEL_STATE)):
+            print("Tunnel daemon stopped.")
+        else:
+            print("No tunnel daemon running.")
+        return
+
+    if args.action == "status":
+        state = tunnel_daemon.read_state(ws.path(ctl_common.TUNNEL_STATE))
+        if not state or not tunnel_daemon.pid_alive(state.get("pid", -1)):
+            print("No tunnel daemon running.")
+            sys.exit(1)
+        healthy = socks_tunnel.socks5_connect(state["port"], *state["probe_target"])
+        print(json.dumps(dict(state, healthy=healthy), indent=2))
+        sys.exit(0 if healthy else 2)
+
+
+def add_parsers(subparsers):
+    tunnel = subparsers.add_parser("tunnel", help="Manage a persistent, auto-reconnecting SOCKS5 tunnel to the cluster")
+    tunnel.add_argument("action", choices=["start", "stop", "status", "run"],
+                        help="'run' is the daemon itself and is normally started by 'start'")
+    tunnel.add_argument("--ssh-private-key-path", help="Path to SSH private key")
+    tunnel.add_argument("--cluster-name", help="Named cluster (see cluster_up.py --cluster-name)")
+    tunnel.add_argument("--port", type=int, help="Local SOCKS5 port (default 1080, or the named cluster's port; 0 = pick a free one)")
+    tunnel.add_argument("--master-ip", help=argparse.SUPPRESS)
+    tunnel.add_argument("--bastion-ip", help=argparse.SUPPRESS)
+    tunnel.add_argument("--probe-target", help=argparse.SUPPRESS)
+    tunnel.set_defaults(func=cmd_tunnel)
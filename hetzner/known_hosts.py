@@ -0,0 +1,121 @@
+import base64
+import binascii
+import hmac
+import json
+import os
+import shutil
+import tempfile
+
+# ==========================================
+# Single-Pass known_hosts Rewriter
+# ==========================================
+# Replaces one 'ssh-keygen -R' process per IP (each rewriting the whole file)
+# with a single read/filter/write of ~/.ssh/known_hosts. Handles plain and
+# '[host]:22' patterns, comma-separated host lists, @cert-authority /
+# @revoked markers and hashed '|1|salt|hash' entries.
+
+DEFAULT_PATH = os.path.expanduser("~/.ssh/known_hosts")
+
+
+def _parse_hashed(entry):
+    """'|1|salt|hash' -> (salt, hash) as bytes, or None if malformed."""
+    try:
+        _, magic, salt_b64, hash_b64 = entry.split("|")
+        if magic != "1":
+            return None
+        return base64.b64decode(salt_b64), base64.b64decode(hash_b64)
+    except (ValueError, binascii.Error):
+        return None
+
+
+def _line_matches(line, candidates, digests_by_salt):
+    stripped = line.strip()
+    if not stripped or stripped.startswith("#"):
+        return False
+    fields = stripped.split()
+    if fields[0].startswith("@"):
+        fields = fields[1:]
+    if not fields:
+        return False
+    for pattern in fields[0].split(","):
+        if pattern.startswith("!"):
+            # Negated patterns exclude a host from the line, never select it
+            continue
+        if pattern.startswith("|"):
+            parsed = _parse_hashed(pattern)
+            if parsed is None:
+                continue
+            salt, expected = parsed
+            # Hashed entries can only be matched by hashing the candidates with
+            # the entry's salt; a salt shared by several lines is hashed once
+            digests = digests_by_salt.get(salt)
+            if digests is None:
+                digests = {hmac.digest(salt, c.encode(), "sha1") for c in candidates}
+                digests_by_salt[salt] = digests
+            if expected in digests:
+                return True
+        elif pattern in candidates:
+            return True
+    return False
+
+
+def remove_hosts(ips, path=DEFAULT_PATH):
+    """
+    Removes every known_hosts line that refers to one of `ips` on port 22
+    (bare or '[ip]:22', plain or hashed), like 'ssh-keygen -R'.
+    The file is rewritten atomically and the previous version is kept as
+    known_hosts.old. Returns the number of removed lines.
+    """
+    hosts = set(ips)
+    if not hosts or not os.path.exists(path):
+        return 0
+
+    candidates = {h for ip in hosts for h in (ip, f"[{ip}]:22")}
+    digests_by_salt = {}
+
+    with open(path, "r") as f:
+        lines = f.readlines()
+
+    kept = []
+    removed = 0
+    for line in lines:
+        if _line_matches(line, candidates, digests_by_salt):
+            removed += 1
+        else:
+            kept.append(line)
+
+    if not removed:
+        return 0
+
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".known_hosts.", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.writelines(kept)
+        shutil.copymode(path, tmp_path)
+        shutil.copy2(path, path + ".old")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return removed
+
+
+def remove_cluster_hosts(tf_output_path, path=DEFAULT_PATH):
+    """
+    Removes the public and private IPs of the cluster's servers (from the
+    Terraform output JSON) to prevent 'Remote Host Identification Has
+    Changed' errors once they are reused. Failures are only a warning.
+    """
+    print("\n--- Cleaning up known_hosts for cluster IPs ---")
+    try:
+        with open(tf_output_path, "r") as f:
+            data = json.load(f)
+        ips = set()
+        for output in ("server_public_ips", "server_private_ips"):
+            ips.update(data.get(output, {}).get("value", {}).values())
+        removed = remove_hosts(ips, path)
+        print(f"Removed {removed} known_hosts entries for {len(ips)} IPs.")
+    except Exception as e:
+        print(f"Warning: Failed to clean known_hosts: {e}")
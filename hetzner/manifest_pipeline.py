@@ -0,0 +1,241 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+
+import phase_report
+
+# ==========================================
+# Templated Manifest Pipeline
+# ==========================================
+# Every *.yaml in the template directory is rendered with the cluster's
+# variables (${domain}, ${metallb_ip}, ...), split into objects and sent to
+# the API server as one server-side apply: a single kubectl process and
+# connection through the tunnel, however many files there are. Rendering
+# is cached by the hash of template and variables. Objects whose rendered
+# text was already applied to this cluster are only looked up (one 'kubectl
+# get' for all of them) and sent again if they were deleted in the cluster;
+# force re-sends everything, which also undoes edits made in the cluster.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_DIR = os.path.join(SCRIPT_DIR, "manifests")
+FIELD_MANAGER = "poormans-kubernetes"
+# Only ${name} is a placeholder; a bare $ (shell snippets, nginx config) is left alone
+VARIABLE_PATTERN = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
+# Per-cluster files, inside the cluster's workspace
+RENDERED_DIR = "tmpfile_manifests"
+RENDER_CACHE = "tmpfile_manifests_cache.json"
+APPLIED_STATE = "tmpfile_manifests_applied.json"
+APPLY_BATCH = "tmpfile_manifests_batch.yaml"
+
+
+class ManifestError(Exception):
+    pass
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def template_variables(domain, metallb_ip, nfs_server_ip, acme_email):
+    """The variables available to the templates."""
+    return {
+        "domain": domain,
+        "metallb_ip": metallb_ip,
+        "nfs_server_ip": nfs_server_ip,
+        "acme_email": acme_email,
+    }
+
+
+def last_variables(cache_path):
+    """Variables of the last render_dir() run with this cache (empty if none)."""
+    return _read_json(cache_path).get("variables", {})
+
+
+def render(text, variables, source="template"):
+    """Substitutes ${name} placeholders; unknown names are an error, not an empty string."""
+    def substitute(match):
+        name = match.group(1)
+        if name not in variables:
+            raise ManifestError(f"{source}: unknown variable ${{{name}}}")
+        return str(variables[name])
+    return VARIABLE_PATTERN.sub(substitute, text)
+
+
+def split_documents(text):
+    """Splits a multi-document YAML file, dropping documents with only comments."""
+    docs = re.split(r"^---[ \t]*$", text, flags=re.MULTILINE)
+    return [d.strip("\n") + "\n" for d in docs
+            if any(line.strip() and not line.lstrip().startswith("#") for line in d.splitlines())]
+
+
+def object_key(doc, source="manifest"):
+    """
+    'apiVersion/kind/namespace/name' of a manifest. Reads only the top-level
+    apiVersion/kind and metadata's direct name/namespace keys, which is all
+    the templates need and avoids a YAML dependency.
+    """
+    fields = {}
+    in_metadata = False
+    for line in doc.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        indent = len(line) - len(line.lstrip(" "))
+        key, _, value = line.strip().partition(":")
+        value = value.split(" #")[0].strip().strip("'\"")
+        if indent == 0:
+            in_metadata = key == "metadata"
+            if key in ("apiVersion", "kind"):
+                fields[key] = value
+        elif in_metadata and indent == 2 and key in ("name", "namespace"):
+            fields[key] = value
+    if not all(k in fields for k in ("apiVersion", "kind", "name")):
+        raise ManifestError(f"{source}: document without apiVersion, kind or metadata.name")
+    return f"{fields['apiVersion']}/{fields['kind']}/{fields.get('namespace', '')}/{fields['name']}"
+
+
+def render_dir(template_dir, output_dir, variables, cache_path):
+    """
+    Renders every *.yaml of template_dir into output_dir (skipping files
+    whose template and variables are unchanged since the last render) and
+    returns the objects as a list of (key, sha256, text), in file order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache = _read_json(cache_path).get("files", {})
+    variables_json = json.dumps(variables, sort_keys=True)
+    templates = sorted(glob.glob(os.path.join(template_dir, "*.yaml")))
+    objects = []
+    seen = set()
+    for template_path in templates:
+        filename = os.path.basename(template_path)
+        output_path = os.path.join(output_dir, filename)
+        with open(template_path, "r") as f:
+            template = f.read()
+        digest = _sha256(template + variables_json)
+        if cache.get(filename) != digest or not os.path.exists(output_path):
+            rendered = render(template, variables, source=filename)
+            with open(output_path, "w") as f:
+                f.write(rendered)
+            cache[filename] = digest
+        else:
+            with open(output_path, "r") as f:
+                rendered = f.read()
+        for doc in split_documents(rendered):
+            key = object_key(doc, source=filename)
+            if key in seen:
+                raise ManifestError(f"{filename}: {key} is defined twice")
+            seen.add(key)
+            objects.append((key, _sha256(doc), doc))
+
+    # Drop rendered files whose template is gone so 'kubectl delete -f <dir>' stays accurate
+    names = {os.path.basename(p) for p in templates}
+    for path in glob.glob(os.path.join(output_dir, "*.yaml")):
+        if os.path.basename(path) not in names:
+            os.remove(path)
+    _write_json(cache_path, {"variables": variables, "files": {k: v for k, v in cache.items() if k in names}})
+    return objects
+
+
+def cluster_id(kubeconfig_path):
+    """Identifies the cluster behind a kubeconfig by its CA, so a recreated cluster starts with no applied hashes."""
+    try:
+        with open(kubeconfig_path, "r") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    match = re.search(r"certificate-authority-data:\s*(\S+)", content) or re.search(r"server:\s*(\S+)", content)
+    return _sha256(match.group(1))[:16] if match else None
+
+
+def _key_of_object(obj, namespace=None):
+    """object_key() of an object from the API server."""
+    metadata = obj.get("metadata", {})
+    if namespace is None:
+        namespace = metadata.get("namespace", "")
+    return f"{obj.get('apiVersion')}/{obj.get('kind')}/{namespace}/{metadata.get('name')}"
+
+
+def missing_objects(objects, batch_path, kubectl=("kubectl",), span=None, **kwargs):
+    """
+    Keys of the objects that do not exist in the cluster, looked up with a
+    single 'kubectl get'. A namespaced object rendered without a namespace
+    matches in any namespace.
+    """
+    with open(batch_path, "w") as f:
+        f.write("---\n".join(doc for _, _, doc in objects))
+    with open(batch_path, "rb") as f:
+        output = phase_report.check_output(list(kubectl) + ["get", "--ignore-not-found", "-o", "json", "-f", "-"],
+                                           span=span, stdin=f, **kwargs)
+    found = json.loads(output) if output.strip() else {}
+    items = found.get("items", []) if found.get("kind") == "List" else [found] if found else []
+    existing = set()
+    for obj in items:
+        existing.add(_key_of_object(obj))
+        existing.add(_key_of_object(obj, namespace=""))
+    return {key for key, _, _ in objects if key not in existing}
+
+
+def apply(objects, applied_path, batch_path, cluster, kubectl=("kubectl",), span=None, force=False, **kwargs):
+    """
+    Server-side applies, as one 'kubectl apply -f -' batch, the objects that
+    differ from what applied_path records for this cluster or that are gone
+    from it (all of them with force). kubectl may be a command prefix (e.g.
+    ssh to the control plane). Returns the number of objects sent.
+    """
+    applied = _read_json(applied_path)
+    hashes = applied.get("objects", {}) if applied.get("cluster") == cluster and not force else {}
+    unchanged = [obj for obj in objects if hashes.get(obj[0]) == obj[1]]
+    missing = set()
+    if unchanged:
+        try:
+            missing = missing_objects(unchanged, batch_path, kubectl, span=span, **kwargs)
+        except (subprocess.CalledProcessError, ValueError):
+            print("Warning: could not look up the applied objects in the cluster, applying all of them again.")
+            missing = {key for key, _, _ in unchanged}
+        if missing:
+            print(f"Applied before but missing in the cluster: {', '.join(sorted(missing))}")
+    changed = [(key, digest, doc) for key, digest, doc in objects if hashes.get(key) != digest or key in missing]
+    unchanged = len(objects) - len(changed)
+    if span is not None:
+        span.attrs.update(objects=len(objects), applied=len(changed), unchanged=unchanged, missing=len(missing))
+    if not changed:
+        print(f"All {len(objects)} objects unchanged, nothing to apply.")
+        return 0
+
+    print(f"Applying {len(changed)} of {len(objects)} objects ({unchanged} unchanged) in one server-side apply...")
+    with open(batch_path, "w") as f:
+        f.write("---\n".join(doc for _, _, doc in changed))
+    with open(batch_path, "rb") as f:
+        phase_report.check_call(list(kubectl) + ["apply", "--server-side", f"--field-manager={FIELD_MANAGER}",
+                                                 "--force-conflicts", "-f", "-"],
+                                span=span, stdin=f, **kwargs)
+
+    # Objects no longer rendered are forgotten, not deleted
+    current = {key for key, _, _ in objects}
+    hashes = {key: digest for key, digest in hashes.items() if key in current}
+    hashes.update({key: digest for key, digest, _ in changed})
+    _write_json(applied_path, {"cluster": cluster, "objects": hashes})
+    return len(changed)
+
+
+def forget(applied_path):
+    """Clears the applied hashes (after the objects were deleted)."""
+    if os.path.exists(applied_path):
+        os.remove(applied_path)
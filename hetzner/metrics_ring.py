@@ -0,0 +1,213 @@
+import json
+import math
+import mmap
+import os
+import re
+import struct
+
+# ==========================================
+# Fixed-Record Metrics Ring Buffer
+# ==========================================
+# 'cluster_ctl.py sample' appends one record per node and pod per poll to a
+# memory-mapped file of fixed-width records that wraps around once it is
+# full, so the history has a constant size on disk. Records are written in
+# time order, so a window query binary-searches its start and reads only
+# the records inside it. Series names (node/<name>, pod/<ns>/<name>) are
+# kept in a small JSON index next to the ring and referenced by id.
+
+MAGIC = b"PMKRING1"
+VERSION = 1
+# magic, version, record size, capacity, records written in total
+HEADER = struct.Struct("<8sIIQQ")
+# timestamp, series id, CPU millicores, memory bytes
+RECORD = struct.Struct("<dIIQ")
+DEFAULT_CAPACITY = 200000  # ~4.6 MB
+
+
+class RingError(Exception):
+    pass
+
+
+class RingBuffer:
+    """
+    The ring file at path, created with capacity records if missing. An
+    existing file keeps its own capacity.
+    """
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, 0))
+                f.truncate(HEADER.size + capacity * RECORD.size)
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, record_size, self.capacity, _ = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise RingError(f"{path} is not a version {VERSION} metrics ring")
+        if len(self._map) < HEADER.size + self.capacity * RECORD.size:
+            self.close()
+            raise RingError(f"{path} is truncated")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    @property
+    def written(self):
+        return HEADER.unpack_from(self._map, 0)[4]
+
+    def __len__(self):
+        return min(self.written, self.capacity)
+
+    def append(self, records):
+        """
+        Appends (timestamp, series_id, cpu_millicores, memory_bytes) tuples.
+        The header counter is bumped after the records are in place, so a
+        concurrent reader never sees a half-written batch.
+        """
+        written = self.written
+        for record in records:
+            offset = HEADER.size + (written % self.capacity) * RECORD.size
+            RECORD.pack_into(self._map, offset, *record)
+            written += 1
+        struct.pack_into("<Q", self._map, HEADER.size - 8, written)
+
+    def flush(self):
+        self._map.flush()
+
+    def _offset(self, written, count, index):
+        """File offset of the index-th oldest of the count records kept."""
+        return HEADER.size + ((written - count + index) % self.capacity) * RECORD.size
+
+    def window(self, since=None, until=None):
+        """Yields the records with since <= timestamp < until, oldest first."""
+        written = self.written
+        count = min(written, self.capacity)
+        lo, hi = 0, count
+        if since is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if struct.unpack_from("<d", self._map, self._offset(written, count, mid))[0] < since:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        for index in range(lo, count):
+            record = RECORD.unpack_from(self._map, self._offset(written, count, index))
+            if until is not None and record[0] >= until:
+                return
+            yield record
+
+
+class SeriesIndex:
+    """name -> {"id": n, ...metadata} for the series of one ring, stored as JSON."""
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.series = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.series = {}
+        self._names = {entry["id"]: name for name, entry in self.series.items()}
+
+    def id_for(self, name, **metadata):
+        entry = self.series.get(name)
+        if entry is None:
+            entry = self.series[name] = {"id": len(self.series)}
+            self._names[entry["id"]] = name
+        entry.update({k: v for k, v in metadata.items() if v is not None})
+        return entry["id"]
+
+    def name(self, series_id):
+        return self._names.get(series_id, f"#{series_id}")
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.series, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+# ------------------------------------------
+# Kubernetes quantities & metrics API
+# ------------------------------------------
+CPU_UNITS = {"n": 1e-6, "u": 1e-3, "m": 1.0, "": 1000.0}
+MEMORY_UNITS = {"": 1, "k": 1000, "M": 1000 ** 2, "G": 1000 ** 3, "T": 1000 ** 4,
+                "Ki": 1024, "Mi": 1024 ** 2, "Gi": 1024 ** 3, "Ti": 1024 ** 4}
+QUANTITY = re.compile(r"^([0-9.]+)([A-Za-z]*)$")
+
+
+def parse_cpu(value):
+    """'250m', '1', '123456789n' -> millicores."""
+    match = QUANTITY.match(str(value))
+    if not match or match.group(2) not in CPU_UNITS:
+        raise ValueError(f"unsupported CPU quantity {value!r}")
+    return int(round(float(match.group(1)) * CPU_UNITS[match.group(2)]))
+
+
+def parse_memory(value):
+    """'512Mi', '1Gi', '123456Ki', '1000' -> bytes."""
+    match = QUANTITY.match(str(value))
+    if not match or match.group(2) not in MEMORY_UNITS:
+        raise ValueError(f"unsupported memory quantity {value!r}")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2)])
+
+
+def usage_records(timestamp, index, node_metrics, pod_metrics, allocatable=None):
+    """
+    Records for one poll from the metrics.k8s.io NodeMetricsList and
+    PodMetricsList (pod usage is the sum of its containers).
+    allocatable maps node name -> (cpu_millicores, memory_bytes).
+    """
+    allocatable = allocatable or {}
+    records = []
+    for item in node_metrics.get("items", []):
+        name = item["metadata"]["name"]
+        cpu_m, mem = allocatable.get(name, (None, None))
+        series_id = index.id_for(f"node/{name}", allocatable_cpu_m=cpu_m, allocatable_memory=mem)
+        usage = item.get("usage", {})
+        records.append((timestamp, series_id, parse_cpu(usage.get("cpu", "0")), parse_memory(usage.get("memory", "0"))))
+    for item in pod_metrics.get("items", []):
+        meta = item["metadata"]
+        containers = item.get("containers", [])
+        cpu = sum(parse_cpu(c.get("usage", {}).get("cpu", "0")) for c in containers)
+        mem = sum(parse_memory(c.get("usage", {}).get("memory", "0")) for c in containers)
+        records.append((timestamp, index.id_for(f"pod/{meta.get('namespace', '')}/{meta['name']}"), cpu, mem))
+    return records
+
+# ------------------------------------------
+# Queries
+# ------------------------------------------
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(ring, index, since=None, until=None, percentiles=(50, 95, 99), prefix=""):
+    """
+    Per-series statistics over the window: {name: {"samples", "cpu_m": {p50.., "peak"},
+    "memory": {...}}}, for series whose name starts with prefix.
+    """
+    cpu = {}
+    memory = {}
+    for _, series_id, cpu_m, mem in ring.window(since, until):
+        cpu.setdefault(series_id, []).append(cpu_m)
+        memory.setdefault(series_id, []).append(mem)
+
+    result = {}
+    for series_id, cpu_values in cpu.items():
+        name = index.name(series_id)
+        if not name.startswith(prefix):
+            continue
+        cpu_values.sort()
+        mem_values = sorted(memory[series_id])
+        stats = {"samples": len(cpu_values), "cpu_m": {}, "memory": {}}
+        for p in percentiles:
+            stats["cpu_m"][f"p{p:g}"] = percentile(cpu_values, p)
+            stats["memory"][f"p{p:g}"] = percentile(mem_values, p)
+        stats["cpu_m"]["peak"] = cpu_values[-1]
+        stats["memory"]["peak"] = mem_values[-1]
+        result[name] = stats
+    return result
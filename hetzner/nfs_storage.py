@@ -0,0 +1,155 @@
+import json
+import shlex
+
+# ==========================================
+# NFS Storage Profiles & fio Benchmark
+# ==========================================
+# Every PVC goes through the single NFS server on the volume node. A
+# profile bundles the server side (nfsd threads, sync/async export, ext4
+# mount options of the volume; applied by ansible/7_setup_volumes.yaml) and
+# the client side (mountOptions of the nfs-storage StorageClass; applied by
+# terraform-kubernetes). 'cluster_ctl.py bench-storage' measures client
+# profiles with fio against the server profile the cluster runs.
+
+PROFILES = {
+    # What the cluster used before profiles existed
+    "default": {
+        "nfs_threads": 8,
+        "nfs_export_sync": True,
+        "data_volume_mount_options": "defaults",
+        "mount_options": [],
+    },
+    "balanced": {
+        "nfs_threads": 16,
+        "nfs_export_sync": True,
+        "data_volume_mount_options": "defaults,noatime",
+        "mount_options": ["nfsvers=4.2", "nconnect=4", "rsize=1048576", "wsize=1048576", "noatime"],
+    },
+    # async acknowledges writes before they reach the disk: a crash of the
+    # volume node loses the last seconds of writes
+    "throughput": {
+        "nfs_threads": 32,
+        "nfs_export_sync": False,
+        "data_volume_mount_options": "defaults,noatime,commit=60",
+        "mount_options": ["nfsvers=4.2", "nconnect=8", "rsize=1048576", "wsize=1048576", "noatime", "nodiratime"],
+    },
+}
+DEFAULT_PROFILE = "default"
+# Per-cluster file: the profile the NFS server was last configured with
+SERVER_PROFILE = "tmpfile_storage_profile"
+
+
+def ansible_vars(profile):
+    """Extra vars (one JSON -e value) for the server side of a profile."""
+    settings = PROFILES[profile]
+    return json.dumps({
+        "nfs_threads": settings["nfs_threads"],
+        "nfs_export_sync": settings["nfs_export_sync"],
+        "data_volume_mount_options": settings["data_volume_mount_options"],
+    })
+
+
+def mount_options(profile):
+    """TF_VAR_nfs_mount_options value (a JSON list) for the client side of a profile."""
+    return json.dumps(PROFILES[profile]["mount_options"])
+
+
+def write_server_profile(path, profile):
+    with open(path, "w") as f:
+        f.write(profile + "\n")
+
+
+def read_server_profile(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+# ------------------------------------------
+# fio Benchmark
+# ------------------------------------------
+BENCH_NAMESPACE = "storage-bench"
+MOUNT_PATH = "/data"
+# name, fio job options
+FIO_TESTS = [
+    ("randread-4k", ["--rw=randread", "--bs=4k", "--iodepth=32"]),
+    ("randwrite-4k", ["--rw=randwrite", "--bs=4k", "--iodepth=32"]),
+    # One synchronous writer, as a database commit log would do
+    ("fsync-write-4k", ["--rw=write", "--bs=4k", "--iodepth=1", "--ioengine=psync", "--fsync=1"]),
+    ("seqread-1m", ["--rw=read", "--bs=1M", "--iodepth=8"]),
+    ("seqwrite-1m", ["--rw=write", "--bs=1M", "--iodepth=8"]),
+]
+PERCENTILES = (50, 95, 99)
+# nfs-subdir-external-provisioner does not enforce the requested size
+PVC_REQUEST = "1Gi"
+
+
+def fio_command(size, runtime):
+    """One fio run with the tests one after another (--stonewall), JSON output."""
+    cmd = ["fio", f"--directory={MOUNT_PATH}", f"--size={size}", f"--runtime={runtime}", "--time_based",
+           "--ioengine=libaio", "--direct=1", "--output-format=json", "--output=/tmp/fio.json",
+           "--percentile_list=" + ":".join(str(p) for p in PERCENTILES)]
+    for name, options in FIO_TESTS:
+        cmd += [f"--name={name}", "--stonewall"] + options
+    return cmd
+
+
+def bench_objects(profile, provisioner, image, size, runtime):
+    """
+    StorageClass (the profile's mount options, same provisioner as
+    nfs-storage), PVC and fio Job for one profile, as a kubectl List.
+    """
+    name = f"fio-{profile}"
+    storage_class = f"nfs-bench-{profile}"
+    # Images without fio (the default alpine) install it first; only the JSON report goes to stdout
+    script = (f"command -v fio >/dev/null || apk add --no-cache fio >/dev/null && "
+              f"{shlex.join(fio_command(size, runtime))} && cat /tmp/fio.json")
+    return {"apiVersion": "v1", "kind": "List", "items": [
+        {
+            "apiVersion": "storage.k8s.io/v1", "kind": "StorageClass",
+            "metadata": {"name": storage_class},
+            "provisioner": provisioner,
+            "parameters": {"archiveOnDelete": "false"},
+            "reclaimPolicy": "Delete",
+            "mountOptions": PROFILES[profile]["mount_options"],
+        },
+        {
+            "apiVersion": "v1", "kind": "PersistentVolumeClaim",
+            "metadata": {"name": name, "namespace": BENCH_NAMESPACE},
+            "spec": {"storageClassName": storage_class, "accessModes": ["ReadWriteOnce"],
+                     "resources": {"requests": {"storage": PVC_REQUEST}}},
+        },
+        {
+            "apiVersion": "batch/v1", "kind": "Job",
+            "metadata": {"name": name, "namespace": BENCH_NAMESPACE},
+            "spec": {"backoffLimit": 0, "template": {"spec": {
+                "restartPolicy": "Never",
+                "containers": [{"name": "fio", "image": image, "command": ["sh", "-c", script],
+                                "volumeMounts": [{"name": "data", "mountPath": MOUNT_PATH}]}],
+                "volumes": [{"name": "data", "persistentVolumeClaim": {"claimName": name}}],
+            }}},
+        },
+    ]}
+
+
+def parse_fio(output):
+    """
+    {test: {"iops", "mib_s", "lat_ms": {"p50", ...}}} from fio's JSON report.
+    Leading non-JSON lines (warnings in the pod log) are skipped.
+    """
+    start = output.find("{")
+    if start < 0:
+        raise ValueError("no fio JSON report in the output")
+    report, _ = json.JSONDecoder().raw_decode(output[start:])
+    results = {}
+    for job in report.get("jobs", []):
+        side = max(("read", "write"), key=lambda s: job.get(s, {}).get("io_bytes", 0))
+        stats = job[side]
+        percentiles = stats.get("clat_ns", {}).get("percentile", {})
+        results[job["jobname"]] = {
+            "iops": round(stats.get("iops", 0.0), 1),
+            "mib_s": round(stats.get("bw_bytes", 0) / 2 ** 20, 1),
+            "lat_ms": {f"p{p}": round(percentiles.get(f"{p:.6f}", 0) / 1e6, 3) for p in PERCENTILES},
+        }
+    return results
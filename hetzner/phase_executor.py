@@ -0,0 +1,184 @@
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# ==========================================
+# Dependency-Aware Phase Executor
+# ==========================================
+# The bring-up is described as a DAG of named tasks. A task starts as soon as
+# all of its dependencies have finished, so independent work (e.g. the two
+# 'terraform init' runs) overlaps. Each task runs inside a report span, and
+# everything it prints is prefixed with "[task-name]".
+# With a checkpoint, tasks whose inputs and upstream tasks are unchanged since
+# their last successful run are skipped.
+
+class Task:
+    def __init__(self, name, func, deps=(), inputs=None, outputs=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        # Callable returning the task's inputs for the checkpoint digest;
+        # None means the task always runs (e.g. it only sets up runtime state)
+        self.inputs = inputs
+        self.outputs = tuple(outputs)
+
+
+class PhaseFailed(Exception):
+    """Raised by PhaseExecutor.run() when one or more tasks failed."""
+    def __init__(self, failed):
+        super().__init__(f"Failed tasks: {', '.join(failed)}")
+        self.failed = failed
+
+
+class _PrefixedWriter:
+    """
+    sys.stdout replacement that prefixes each complete line with the name of
+    the task running on the current thread. Partial lines are buffered per
+    thread so output from concurrent tasks never interleaves mid-line.
+    """
+    def __init__(self, target):
+        self.target = target
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def set_prefix(self, prefix):
+        self._local.prefix = prefix
+        self._local.buffer = ""
+
+    def write(self, text):
+        prefix = getattr(self._local, "prefix", None)
+        if prefix is None:
+            with self._lock:
+                return self.target.write(text)
+        self._local.buffer += text
+        *lines, self._local.buffer = self._local.buffer.split("\n")
+        if lines:
+            with self._lock:
+                self.target.write("".join(f"[{prefix}] {line}\n" for line in lines if line.strip()))
+        return len(text)
+
+    def flush(self):
+        prefix = getattr(self._local, "prefix", None)
+        if prefix is not None and self._local.buffer:
+            with self._lock:
+                self.target.write(f"[{prefix}] {self._local.buffer}\n")
+            self._local.buffer = ""
+        self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+class PhaseExecutor:
+    """
+    Runs a set of Tasks respecting their dependencies with a thread pool.
+    On the first failure no new tasks are started; tasks already running
+    are allowed to finish, then PhaseFailed is raised.
+    """
+    def __init__(self, report, max_workers=4, checkpoint=None):
+        self.report = report
+        self.max_workers = max_workers
+        self.checkpoint = checkpoint
+        self.tasks = {}
+        self.digests = {}
+
+    def add(self, name, func, deps=(), inputs=None, outputs=()):
+        """
+        Registers a task. func is called with the task's span. inputs is a
+        callable returning the values/checkpoint.Files the task depends on,
+        evaluated once its dependencies are done; outputs are paths that must
+        still exist for the task to be skipped.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        self.tasks[name] = Task(name, func, deps, inputs, outputs)
+
+    def _validate(self):
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task '{task.name}' depends on unknown task '{dep}'")
+
+        # Kahn's algorithm: every task must be reachable without a cycle
+        indegree = {name: len(task.deps) for name, task in self.tasks.items()}
+        dependents = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in task.deps:
+                dependents[dep].append(task.name)
+        queue = [name for name, d in indegree.items() if d == 0]
+        visited = 0
+        while queue:
+            name = queue.pop()
+            visited += 1
+            for child in dependents[name]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+        if visited != len(self.tasks):
+            raise ValueError("Task graph contains a cycle")
+
+    def _run_task(self, task, writer):
+        writer.set_prefix(task.name)
+        try:
+            with self.report.span(task.name) as span:
+                span.output_prefix = task.name
+                digest = None
+                if self.checkpoint is not None:
+                    inputs = task.inputs() if task.inputs is not None else None
+                    digest = self.checkpoint.digest(task.name, inputs, [self.digests[d] for d in task.deps])
+                    self.digests[task.name] = digest
+                    if inputs is not None and self.checkpoint.is_current(task.name, digest, task.outputs):
+                        span.status = "skipped"
+                        span.attrs["checkpoint"] = "unchanged"
+                        print("Inputs unchanged since the last run, skipping.")
+                        return
+                    # Forget the old entry first so a failed re-run is not skipped next time
+                    self.checkpoint.forget(task.name)
+                task.func(span)
+                if digest is not None and task.inputs is not None and span.status != "failed":
+                    self.checkpoint.record(task.name, digest)
+        finally:
+            writer.flush()
+            writer.set_prefix(None)
+
+    def run(self):
+        self._validate()
+
+        done = set()
+        failed = []
+        pending = dict(self.tasks)
+        running = {}
+
+        writer = _PrefixedWriter(sys.stdout)
+        original_stdout = sys.stdout
+        sys.stdout = writer
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                while pending or running:
+                    if not failed:
+                        ready = [t for t in pending.values() if all(d in done for d in t.deps)]
+                        for task in ready:
+                            del pending[task.name]
+                            running[pool.submit(self._run_task, task, writer)] = task
+
+                    if not running:
+                        break
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        task = running.pop(future)
+                        try:
+                            future.result()
+                            done.add(task.name)
+                        except BaseException as e:
+                            failed.append(task.name)
+                            if not isinstance(e, SystemExit):
+                                print(f"Error: task '{task.name}' failed: {e}")
+        finally:
+            sys.stdout = original_stdout
+
+        if failed:
+            skipped = sorted(pending)
+            if skipped:
+                print(f"Skipped because of earlier failures: {', '.join(skipped)}")
+            raise PhaseFailed(failed)
@@ -0,0 +1,251 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ==========================================
+# Phase Timing Spans & Provisioning Report
+# ==========================================
+# Every step of cluster_up.py / cluster_down.py is wrapped in a span. A span
+# records wall time, exit code, retries and the CPU time of the child
+# processes it started. Finished spans are appended to a JSONL report, one
+# line per span, and a final summary line is written when the run ends.
+
+class Span:
+    """
+    Timing record for a single provisioning step.
+    """
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.wall_s = None
+        self.status = "running"
+        self.exit_code = None
+        self.retries = 0
+        self.child_cpu_user_s = 0.0
+        self.child_cpu_sys_s = 0.0
+        self.error = None
+        # Set by the phase executor when tasks run concurrently; subprocess
+        # output is then streamed line by line instead of inherited.
+        self.output_prefix = None
+
+    def add_child_usage(self, rusage):
+        """Accumulates the CPU time of a reaped child process."""
+        self.child_cpu_user_s += rusage.ru_utime
+        self.child_cpu_sys_s += rusage.ru_stime
+
+    def finish(self, status, error=None):
+        self.wall_s = time.perf_counter() - self._start
+        self.status = status
+        if error is not None:
+            self.error = error
+
+    def to_dict(self):
+        return {
+            "type": "span",
+            "name": self.name,
+            "started_at": round(self.started_at, 3),
+            "wall_s": round(self.wall_s, 3) if self.wall_s is not None else None,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "retries": self.retries,
+            "child_cpu_user_s": round(self.child_cpu_user_s, 3),
+            "child_cpu_sys_s": round(self.child_cpu_sys_s, 3),
+            "error": self.error,
+            "attrs": self.attrs,
+        }
+
+
+class PhaseReport:
+    """
+    Collects spans for one script invocation and writes them as JSONL.
+    The report file is truncated when the run starts so it always
+    describes the latest run only.
+    """
+    def __init__(self, path, script_name):
+        self.path = path
+        self.script_name = script_name
+        self.spans = []
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._closed = False
+
+        with open(self.path, "w") as f:
+            f.write(json.dumps({
+                "type": "run_start",
+                "script": self.script_name,
+                "started_at": round(self.started_at, 3),
+                "argv": _redact_argv(sys.argv),
+            }) + "\n")
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Context manager that times the enclosed block. SystemExit and
+        exceptions are recorded as a failed span and then re-raised.
+        """
+        span = Span(name, attrs)
+        try:
+            yield span
+        except SystemExit as e:
+            if span.exit_code is None and isinstance(e.code, int):
+                span.exit_code = e.code
+            span.finish("failed", error=f"SystemExit({e.code})")
+            self._record(span)
+            raise
+        except BaseException as e:
+            span.finish("failed", error=f"{type(e).__name__}: {e}")
+            self._record(span)
+            raise
+        else:
+            span.finish(span.status if span.status in ("skipped", "failed") else "ok")
+            self._record(span)
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append(span)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(span.to_dict()) + "\n")
+
+    def close(self, status="ok"):
+        """Writes the run summary line. Safe to call more than once."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            summary = {
+                "type": "run_end",
+                "script": self.script_name,
+                "status": status,
+                "wall_s": round(time.perf_counter() - self._start, 3),
+                "child_cpu_s": round(sum(s.child_cpu_user_s + s.child_cpu_sys_s for s in self.spans), 3),
+                "slowest": [
+                    {"name": s.name, "wall_s": round(s.wall_s, 3)}
+                    for s in sorted(self.spans, key=lambda s: s.wall_s or 0, reverse=True)[:5]
+                ],
+            }
+            with open(self.path, "a") as f:
+                f.write(json.dumps(summary) + "\n")
+
+    def print_summary(self):
+        """Prints a short wall-time table of all recorded spans."""
+        if not self.spans:
+            return
+        total = time.perf_counter() - self._start
+        print("\n--- Phase Timings ---")
+        for s in self.spans:
+            share = (s.wall_s / total * 100) if total else 0
+            print(f"  {s.name:<32} {s.wall_s:8.1f}s {share:5.1f}%  {s.status}")
+        print(f"  {'total':<32} {total:8.1f}s")
+        print(f"Report saved to: {self.path}")
+
+
+def _redact_argv(argv):
+    """Hides the value following --hetzner-token so the report can be shared."""
+    redacted = []
+    hide_next = False
+    for arg in argv:
+        if hide_next:
+            redacted.append("***")
+            hide_next = False
+        elif arg == "--hetzner-token":
+            redacted.append(arg)
+            hide_next = True
+        elif arg.startswith("--hetzner-token="):
+            redacted.append("--hetzner-token=***")
+        else:
+            redacted.append(arg)
+    return redacted
+
+# ==========================================
+# Subprocess Helpers
+# ==========================================
+# Drop-in replacements for subprocess.call / check_call / check_output that
+# reap the child with os.wait4() so its CPU time can be attributed to a span.
+# When the span has an output_prefix, the child's output is read through a
+# pipe and re-emitted via sys.stdout so concurrent tasks stay readable.
+
+def _wait_with_rusage(proc, span):
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if span is not None:
+        span.add_child_usage(rusage)
+        span.exit_code = proc.returncode
+    return proc.returncode
+
+
+def run(cmd, span=None, check=True, capture_output=False, on_start=None, **kwargs):
+    """
+    Runs cmd to completion, attributing its exit code and CPU time to span.
+    Returns (returncode, stdout_bytes_or_None). Raises CalledProcessError
+    when check is set and the command fails, like subprocess.check_call.
+    on_start is called with the Popen object once the child is running.
+    """
+    stream = span is not None and span.output_prefix and "stdout" not in kwargs
+    if capture_output:
+        kwargs["stdout"] = subprocess.PIPE
+        if stream and "stderr" not in kwargs:
+            kwargs["stderr"] = subprocess.PIPE
+    elif stream:
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs.setdefault("stderr", subprocess.STDOUT)
+    proc = subprocess.Popen(cmd, **kwargs)
+    if on_start is not None:
+        on_start(proc)
+    output = None
+    try:
+        if capture_output:
+            if kwargs.get("stderr") is subprocess.PIPE:
+                # Drain stderr on a helper thread; communicate() would reap
+                # the child before wait4() can collect its usage.
+                errors = []
+                reader = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+                reader.start()
+                output = proc.stdout.read()
+                reader.join()
+                proc.stdout.close()
+                proc.stderr.close()
+                _emit(errors[0] if errors else b"")
+            else:
+                output = proc.stdout.read()
+                proc.stdout.close()
+        elif stream:
+            for line in proc.stdout:
+                _emit(line)
+            proc.stdout.close()
+    except BaseException:
+        proc.kill()
+        _wait_with_rusage(proc, span)
+        raise
+    returncode = _wait_with_rusage(proc, span)
+    if check and returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=output)
+    return returncode, output
+
+
+def _emit(data):
+    """Writes child output through sys.stdout, which may be a prefixing writer."""
+    if not data:
+        return
+    text = data.decode(errors="replace") if isinstance(data, bytes) else data
+    sys.stdout.write(text if text.endswith("\n") else text + "\n")
+    sys.stdout.flush()
+
+
+def check_call(cmd, span=None, **kwargs):
+    run(cmd, span=span, check=True, **kwargs)
+    return 0
+
+
+def check_output(cmd, span=None, **kwargs):
+    return run(cmd, span=span, check=True, capture_output=True, **kwargs)[1]
+
+
+def call(cmd, span=None, **kwargs):
+    return run(cmd, span=span, check=False, **kwargs)[0]
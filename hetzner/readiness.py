@@ -0,0 +1,239 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+# ==========================================
+# Event-Driven Readiness Watcher
+# ==========================================
+# Helm's 'wait = true' only reports a broken release when its timeout runs
+# out. While the terraform-kubernetes apply runs, this watcher streams pods
+# and Events from the API server ('kubectl get --watch' through the SOCKS
+# tunnel kubeconfig), prints phase changes and warnings as they happen, and
+# reports a pod that will not recover on its own (image pull back-off,
+# crash loop, pending too long) so the apply can be aborted right away.
+
+# Waiting reasons that need a fix, not more time
+FAILING_REASONS = {"ImagePullBackOff", "InvalidImageName", "ErrImageNeverPull", "CreateContainerConfigError"}
+CRASHLOOP_RESTARTS = 3   # webhooks often crash a few times until their certificates exist
+DEFAULT_PENDING_TIMEOUT = 300
+CHECK_INTERVAL = 5       # seconds between pending-age checks when nothing changes
+RESTART_BACKOFF = 2      # seconds before re-establishing a dropped watch
+EVENTS_PER_POD = 5
+
+
+def parse_time(value):
+    """Kubernetes timestamp ('2025-01-01T00:00:00Z') to epoch seconds, None if missing."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def iter_watch_events(stream):
+    """
+    Yields (type, object) from 'kubectl get --watch --output-watch-events -o json'.
+    kubectl prints indented JSON documents back to back, each closed by a
+    '}' in the first column.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    for line in stream:
+        buffer += line
+        if not line.startswith("}"):
+            continue
+        try:
+            doc, _ = decoder.raw_decode(buffer.strip())
+        except json.JSONDecodeError:
+            continue
+        buffer = ""
+        if "object" in doc:
+            yield doc.get("type", "ADDED"), doc["object"]
+        else:
+            yield "ADDED", doc
+
+
+def pod_key(obj):
+    meta = obj.get("metadata", {})
+    return f"{meta.get('namespace', '')}/{meta.get('name', '')}"
+
+
+def pod_ready(pod):
+    status = pod.get("status", {})
+    if status.get("phase") == "Succeeded":
+        return True
+    return status.get("phase") == "Running" and any(
+        c.get("type") == "Ready" and c.get("status") == "True" for c in status.get("conditions", []))
+
+
+def pod_problem(pod, now, watch_start, pending_timeout):
+    """
+    Returns why the pod is stuck for good, or None. Pending time counts from
+    the pod's creation or the start of the watch, whichever is later.
+    """
+    status = pod.get("status", {})
+    for cs in status.get("initContainerStatuses", []) + status.get("containerStatuses", []):
+        waiting = cs.get("state", {}).get("waiting") or {}
+        reason = waiting.get("reason")
+        if reason in FAILING_REASONS:
+            return f"container {cs.get('name')}: {reason}: {waiting.get('message', '')}".rstrip(": ")
+        if reason == "CrashLoopBackOff" and cs.get("restartCount", 0) >= CRASHLOOP_RESTARTS:
+            last = cs.get("lastState", {}).get("terminated") or {}
+            detail = f" (last exit {last.get('exitCode')}, {last.get('reason')})" if last else ""
+            return f"container {cs.get('name')}: CrashLoopBackOff after {cs['restartCount']} restarts{detail}"
+
+    if status.get("phase") == "Pending":
+        created = parse_time(pod.get("metadata", {}).get("creationTimestamp")) or watch_start
+        pending_s = now - max(created, watch_start)
+        if pending_s > pending_timeout:
+            scheduled = next((c for c in status.get("conditions", []) if c.get("type") == "PodScheduled"), {})
+            if scheduled.get("status") == "False":
+                return f"Pending for {pending_s:.0f}s, not scheduled: {scheduled.get('message', scheduled.get('reason', ''))}"
+            return f"Pending for {pending_s:.0f}s"
+    return None
+
+
+def interrupt(proc):
+    """
+    Asks a running terraform to stop (it saves its state on SIGINT). Uses
+    os.kill rather than Popen.send_signal, which would reap the child behind
+    phase_report's wait4().
+    """
+    try:
+        os.kill(proc.pid, signal.SIGINT)
+    except ProcessLookupError:
+        pass
+
+
+class ReadinessWatcher:
+    """
+    Watches all pods and Events with kubectl (env must carry KUBECONFIG) on
+    background threads between start() and stop(). on_failure(key, problem)
+    is called once, for the first stuck pod.
+    """
+    def __init__(self, env, pending_timeout=DEFAULT_PENDING_TIMEOUT, on_failure=None, prefix=None):
+        self.env = env
+        self.pending_timeout = pending_timeout
+        self.on_failure = on_failure
+        self.prefix = prefix
+        self.pods = {}
+        self.events = {}
+        self.failure = None
+        self.started = None
+        self.ready_after_s = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._procs = []
+        self._threads = []
+
+    def start(self):
+        self.started = time.time()
+        for target, arg in ((self._watch, "pods"), (self._watch, "events"), (self._check_loop, None)):
+            thread = threading.Thread(target=target, args=(arg,) if arg else (), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.poll() is None:
+                proc.terminate()
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+    def _set_prefix(self):
+        if self.prefix and hasattr(sys.stdout, "set_prefix"):
+            sys.stdout.set_prefix(self.prefix)
+
+    def _watch(self, resource):
+        self._set_prefix()
+        cmd = ["kubectl", "get", resource, "--all-namespaces", "--watch", "--output-watch-events", "-o", "json"]
+        while not self._stop.is_set():
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True, env=self.env)
+            with self._lock:
+                self._procs.append(proc)
+            for event_type, obj in iter_watch_events(proc.stdout):
+                if resource == "pods":
+                    self._on_pod(event_type, obj)
+                else:
+                    self._on_event(obj)
+            proc.wait()
+            with self._lock:
+                self._procs.remove(proc)
+            # The watch ends when the tunnel drops or the server closes it
+            self._stop.wait(RESTART_BACKOFF)
+
+    def _check_loop(self):
+        self._set_prefix()
+        while not self._stop.wait(CHECK_INTERVAL):
+            self._evaluate()
+
+    def _on_pod(self, event_type, pod):
+        key = pod_key(pod)
+        phase = pod.get("status", {}).get("phase")
+        with self._lock:
+            previous = self.pods.get(key, {}).get("status", {}).get("phase")
+            if event_type == "DELETED":
+                self.pods.pop(key, None)
+            else:
+                self.pods[key] = pod
+        # Pods that are already fine when the watch starts are not listed
+        if event_type != "DELETED" and phase != previous and not (previous is None and pod_ready(pod)):
+            print(f"  pod {key}: {previous or 'new'} -> {phase}")
+        self._evaluate()
+
+    def _on_event(self, event):
+        involved = event.get("involvedObject", {})
+        key = f"{involved.get('namespace', '')}/{involved.get('name', '')}"
+        when = parse_time(event.get("lastTimestamp") or event.get("eventTime")) or time.time()
+        line = f"{event.get('type')} {event.get('reason')}: {event.get('message', '').strip()}"
+        with self._lock:
+            recent = self.events.setdefault(key, [])
+            recent.append(line)
+            del recent[:-EVENTS_PER_POD]
+        # Older events are only kept for the diagnosis
+        if event.get("type") == "Warning" and when >= self.started - CHECK_INTERVAL:
+            print(f"  {involved.get('kind', '').lower()} {key}: {line}")
+
+    def _evaluate(self):
+        now = time.time()
+        report = None
+        with self._lock:
+            if self.failure is None:
+                for key, pod in self.pods.items():
+                    problem = pod_problem(pod, now, self.started, self.pending_timeout)
+                    if problem:
+                        self.failure = report = (key, problem)
+                        break
+            active = [p for p in self.pods.values() if p.get("status", {}).get("phase") != "Failed"]
+            all_ready = bool(active) and all(pod_ready(p) for p in active)
+            newly_ready = all_ready and self.ready_after_s is None
+            if newly_ready:
+                self.ready_after_s = now - self.started
+            elif not all_ready:
+                self.ready_after_s = None
+        if newly_ready:
+            print(f"All {len(active)} pods ready after {now - self.started:.1f}s.")
+        if report:
+            print(f"Stuck pod {report[0]}: {report[1]}")
+            if self.on_failure:
+                self.on_failure(*report)
+
+    def diagnosis(self):
+        """Multi-line description of the stuck pod and its latest events."""
+        if not self.failure:
+            return ""
+        key, problem = self.failure
+        lines = [f"Pod {key} will not become ready: {problem}"]
+        with self._lock:
+            lines += [f"    {line}" for line in self.events.get(key, [])]
+        return "\n".join(lines)
@@ -0,0 +1,163 @@
+import ipaddress
+import re
+import socket
+import struct
+import subprocess
+import time
+
+# ==========================================
+# Readiness-Probed SOCKS5 Tunnel
+# ==========================================
+# Starts 'ssh -D' on a free local port and reports it ready as soon as a real
+# SOCKS5 CONNECT to the API server succeeds through it, instead of sleeping a
+# fixed amount of time and hoping. Two runs on one machine no longer collide
+# on port 1080.
+
+SSH_OPTS = [
+    "-o", "StrictHostKeyChecking=no",     # Accept new keys automatically
+    "-o", "UserKnownHostsFile=/dev/null", # Do not read or write to user's known_hosts
+    "-o", "GlobalKnownHostsFile=/dev/null",
+    "-o", "CheckHostIP=no",               # Do not verify IP address in known_hosts
+]
+
+
+class TunnelError(Exception):
+    pass
+
+
+class SocksTunnel:
+    """A running 'ssh -D' process and the local port it listens on."""
+    def __init__(self, proc, port):
+        self.proc = proc
+        self.port = port
+
+    @property
+    def proxy_url(self):
+        return f"socks5://localhost:{self.port}"
+
+    def alive(self):
+        # proc is None for a tunnel owned by the tunnel daemon
+        return self.proc is not None and self.proc.poll() is None
+
+    def stop(self):
+        if self.alive():
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+def find_free_port(host="127.0.0.1"):
+    """Asks the kernel for an unused TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def api_server_from_kubeconfig(path):
+    """Returns (host, port) of the first 'server: https://...' entry."""
+    with open(path, 'r') as f:
+        for line in f:
+            match = re.search(r"server:\s*https://([^:/\s]+)(?::(\d+))?", line)
+            if match:
+                return match.group(1), int(match.group(2) or 443)
+    raise TunnelError(f"No API server address found in {path}")
+
+
+def socks5_connect(proxy_port, host, port, timeout=2.0):
+    """
+    Performs a SOCKS5 handshake and CONNECT to host:port through the proxy on
+    localhost:proxy_port. Returns True if the proxy reports success.
+    """
+    try:
+        with socket.create_connection(("127.0.0.1", proxy_port), timeout=timeout) as s:
+            s.settimeout(timeout)
+            s.sendall(b"\x05\x01\x00")  # version 5, one method: no auth
+            if _recv_exact(s, 2) != b"\x05\x00":
+                return False
+            try:
+                address = b"\x01" + ipaddress.IPv4Address(host).packed
+            except ipaddress.AddressValueError:
+                encoded = host.encode()
+                address = b"\x03" + bytes([len(encoded)]) + encoded
+            s.sendall(b"\x05\x01\x00" + address + struct.pack(">H", port))
+            reply = _recv_exact(s, 2)
+            return reply == b"\x05\x00"
+    except OSError:
+        return False
+
+
+def _recv_exact(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def build_ssh_command(port, bastion_ip, master_ip, ssh_key_path, ssh_config_path=None):
+    # ExitOnForwardFailure makes ssh die right away if the port was taken
+    # between find_free_port() and the bind, so we can retry with another one.
+    forward = ["-o", "ExitOnForwardFailure=yes", "-D", f"127.0.0.1:{port}", "-q", "-N"]
+
+    if ssh_config_path:
+        # The generated config handles the bastion hop through its shared master.
+        # The tunnel itself does not join the node's master (-S none): forwards
+        # added to a master outlive the client and would keep the port bound.
+        return ["ssh", "-F", ssh_config_path, "-S", "none"] + forward + [f"root@{master_ip}"]
+
+    if bastion_ip:
+        # We use ProxyCommand instead of -J to explicitly force StrictHostKeyChecking=no
+        # on the bastion connection as well.
+        proxy_cmd = (
+            f"ssh {' '.join(SSH_OPTS)} "
+            f"-i {ssh_key_path} "
+            "-W %h:%p "
+            "-q "
+            f"root@{bastion_ip}"
+        )
+        return ["ssh"] + SSH_OPTS + forward + [
+            "-o", f"ProxyCommand={proxy_cmd}",
+            "-i", ssh_key_path,
+            f"root@{master_ip}"
+        ]
+
+    return ["ssh"] + SSH_OPTS + forward + ["-i", ssh_key_path, f"root@{master_ip}"]
+
+
+def start_socks_proxy(bastion_ip, master_ip, ssh_key_path, probe_target, ssh_config_path=None,
+                      port=None, timeout=30, attempts=3, poll_interval=0.05):
+    """
+    Starts a background SSH SOCKS5 proxy on a free local port and waits until
+    a SOCKS5 CONNECT to probe_target (host, port) goes through.
+    Returns a SocksTunnel; raises TunnelError if it never becomes usable.
+    """
+    print("Establishing SOCKS5 tunnel...")
+    last_error = None
+    for _ in range(attempts):
+        tunnel_port = port or find_free_port()
+        cmd = build_ssh_command(tunnel_port, bastion_ip, master_ip, ssh_key_path, ssh_config_path)
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL)
+        tunnel = SocksTunnel(proc, tunnel_port)
+
+        start = time.monotonic()
+        deadline = start + timeout
+        while time.monotonic() < deadline:
+            if not tunnel.alive():
+                last_error = f"ssh exited with code {proc.returncode}"
+                break
+            if socks5_connect(tunnel_port, *probe_target):
+                print(f"SOCKS5 tunnel ready on localhost:{tunnel_port} "
+                      f"({time.monotonic() - start:.2f}s, verified {probe_target[0]}:{probe_target[1]}).")
+                return tunnel
+            time.sleep(poll_interval)
+        else:
+            last_error = f"no SOCKS5 CONNECT to {probe_target[0]}:{probe_target[1]} within {timeout}s"
+            tunnel.stop()
+            # A live ssh that can't reach the target won't get better on another port
+            break
+
+    raise TunnelError(f"SSH proxy failed to start: {last_error}")
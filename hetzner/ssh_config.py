@@ -0,0 +1,91 @@
+import hashlib
+import os
+import shlex
+import subprocess
+import tempfile
+
+# ==========================================
+# Per-Cluster SSH Config with Connection Multiplexing
+# ==========================================
+# All SSH users (readiness probes, Ansible, scp, the SOCKS tunnel) share one
+# generated ssh_config. The bastion and every node use ControlMaster sockets
+# with ControlPersist, so the two-hop handshake through the bastion is paid
+# once per host instead of once per connection.
+
+BASTION_ALIAS = "bastion"
+
+
+def control_dir_for(config_path):
+    """
+    Returns a short per-cluster directory for the control sockets. Unix socket
+    paths are limited to ~104 bytes, so it lives in the temp dir rather than
+    next to the (possibly deeply nested) config file.
+    """
+    digest = hashlib.sha1(os.path.abspath(config_path).encode()).hexdigest()[:10]
+    return os.path.join(tempfile.gettempdir(), f"pmk-{os.getuid()}-{digest}")
+
+
+def _quote(value):
+    return f'"{value}"' if " " in value else value
+
+
+def write_ssh_config(config_path, hosts, bastion_ip, ssh_key_path, persist="5m"):
+    """
+    Writes an ssh_config for the cluster. `hosts` is {name: private_ip}; each
+    IP gets an entry that jumps through the bastion (when there is one).
+    Returns the config path.
+    """
+    control_dir = control_dir_for(config_path)
+    os.makedirs(control_dir, mode=0o700, exist_ok=True)
+    control_path = os.path.join(control_dir, "%C")
+
+    common = [
+        "    User root",
+        f"    IdentityFile {_quote(ssh_key_path)}",
+        "    IdentitiesOnly yes",
+        "    StrictHostKeyChecking no",
+        "    UserKnownHostsFile /dev/null",
+        "    GlobalKnownHostsFile /dev/null",
+        "    CheckHostIP no",
+        "    LogLevel ERROR",
+        "    ServerAliveInterval 15",
+        "    ControlMaster auto",
+        f"    ControlPath {_quote(control_path)}",
+        f"    ControlPersist {persist}",
+    ]
+
+    lines = ["# Generated by cluster_up.py - do not edit", ""]
+    if bastion_ip:
+        lines.append(f"Host {BASTION_ALIAS} {bastion_ip}")
+        lines.append(f"    HostName {bastion_ip}")
+        lines.extend(common)
+        lines.append("")
+
+    ips = sorted(set(hosts.values()) - {bastion_ip})
+    if ips:
+        lines.append("Host " + " ".join(ips))
+        lines.extend(common)
+        if bastion_ip:
+            # The jump goes through the multiplexed bastion master
+            lines.append(f"    ProxyCommand ssh -F {shlex.quote(config_path)} -W %h:%p {BASTION_ALIAS}")
+        lines.append("")
+
+    # Anything else (e.g. public IPs when there is no bastion) still gets the
+    # key and multiplexing settings
+    lines.append("Host *")
+    lines.extend(common)
+    lines.append("")
+
+    with open(config_path, "w") as f:
+        f.write("\n".join(lines))
+    return config_path
+
+
+def close_masters(config_path, targets):
+    """Asks the ControlMaster of every target to exit; missing masters are ignored."""
+    for target in targets:
+        subprocess.call(
+            ["ssh", "-F", config_path, "-O", "exit", target],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
@@ -0,0 +1,180 @@
+import asyncio
+import random
+import time
+
+import ssh_config as ssh_config_mod
+
+# ==========================================
+# Asyncio Per-Host SSH Readiness Probing
+# ==========================================
+# Each host is probed independently with exponential backoff and full jitter:
+#   1. SSH banner: a TCP connection to port 22 must answer with "SSH-".
+#      Private hosts are reached through the bastion with 'ssh -W'.
+#   2. Auth check: a BatchMode 'ssh ... true' must succeed.
+# A host is reported the moment both checks pass, and probing returns as soon
+# as the last host is ready instead of waiting for the next fixed tick.
+# With a generated ssh_config (see ssh_config.py) the probes go through the
+# multiplexed bastion master, and the auth check leaves a warm master behind
+# for Ansible, scp and the tunnel.
+
+# bench.py points this at a local banner server
+SSH_PORT = 22
+
+SSH_OPTS = [
+    "-o", "StrictHostKeyChecking=no",
+    "-o", "UserKnownHostsFile=/dev/null",
+    "-o", "GlobalKnownHostsFile=/dev/null",
+    "-o", "CheckHostIP=no",
+    "-o", "BatchMode=yes",
+    "-o", "LogLevel=ERROR",
+]
+
+
+class HostProbe:
+    """Probe state and outcome for a single host."""
+    def __init__(self, name, ip):
+        self.name = name
+        self.ip = ip
+        self.attempts = 0
+        self.ready_after_s = None
+        self.last_error = None
+
+
+def _proxy_command(bastion_ip, ssh_key_path, connect_timeout):
+    return (
+        f"ssh {' '.join(SSH_OPTS)} -o ConnectTimeout={connect_timeout} "
+        f"-i {ssh_key_path} -W %h:%p -q root@{bastion_ip}"
+    )
+
+
+async def _read_banner_direct(ip, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, SSH_PORT), timeout)
+    try:
+        return await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+
+
+def _ssh_base(ssh_key_path, ssh_config, timeout):
+    if ssh_config:
+        return ["ssh", "-F", ssh_config, "-o", "BatchMode=yes", "-o", f"ConnectTimeout={int(timeout)}"]
+    return ["ssh", *SSH_OPTS, "-o", f"ConnectTimeout={int(timeout)}", "-i", ssh_key_path]
+
+
+async def _read_banner_via_bastion(ip, bastion_ip, ssh_key_path, timeout, ssh_config=None):
+    bastion = ssh_config_mod.BASTION_ALIAS if ssh_config else f"root@{bastion_ip}"
+    proc = await asyncio.create_subprocess_exec(
+        *_ssh_base(ssh_key_path, ssh_config, timeout), "-W", f"{ip}:{SSH_PORT}", "-q", bastion,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        return await asyncio.wait_for(proc.stdout.readline(), timeout)
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+
+async def _auth_check(ip, bastion_ip, ssh_key_path, timeout, ssh_config=None):
+    cmd = _ssh_base(ssh_key_path, ssh_config, timeout)
+    if bastion_ip and not ssh_config:
+        cmd += ["-o", f"ProxyCommand={_proxy_command(bastion_ip, ssh_key_path, int(timeout))}"]
+    cmd += [f"root@{ip}", "true"]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    try:
+        return await asyncio.wait_for(proc.wait(), timeout * 2) == 0
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return False
+
+
+async def _probe(probe, bastion_ip, ssh_key_path, deadline, start, limiter,
+                 connect_timeout, base_delay, max_delay, gate=None, on_ready=None, ssh_config=None):
+    # Private hosts can only be reached once the bastion itself answers
+    if gate is not None:
+        await gate.wait()
+
+    while time.monotonic() < deadline:
+        probe.attempts += 1
+        try:
+            async with limiter:
+                if bastion_ip:
+                    banner = await _read_banner_via_bastion(probe.ip, bastion_ip, ssh_key_path, connect_timeout, ssh_config)
+                else:
+                    banner = await _read_banner_direct(probe.ip, connect_timeout)
+                if not banner.startswith(b"SSH-"):
+                    raise ConnectionError(f"unexpected banner {banner[:32]!r}")
+                if not await _auth_check(probe.ip, bastion_ip, ssh_key_path, connect_timeout, ssh_config):
+                    raise PermissionError("authentication check failed")
+            probe.ready_after_s = time.monotonic() - start
+            if on_ready:
+                on_ready(probe)
+            return probe
+        except (OSError, asyncio.TimeoutError) as e:
+            probe.last_error = f"{type(e).__name__}: {e}"
+
+        # Full jitter: sleep a random time up to the exponential backoff cap
+        backoff = min(max_delay, base_delay * (2 ** (probe.attempts - 1)))
+        delay = random.uniform(0, backoff)
+        await asyncio.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+    return probe
+
+
+async def probe_hosts(hosts, bastion_ip, ssh_key_path, timeout=300, connect_timeout=5,
+                      base_delay=1.0, max_delay=15.0, max_concurrency=32, on_ready=None, ssh_config=None):
+    """
+    Probes every host in `hosts` ({name: ip}) concurrently.
+    Returns a list of HostProbe objects; hosts that never became ready have
+    ready_after_s set to None.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    limiter = asyncio.Semaphore(max_concurrency)
+    probes = [HostProbe(name, ip) for name, ip in sorted(hosts.items())]
+
+    kwargs = dict(
+        ssh_key_path=ssh_key_path, deadline=deadline, start=start, limiter=limiter,
+        connect_timeout=connect_timeout, base_delay=base_delay, max_delay=max_delay,
+        on_ready=on_ready, ssh_config=ssh_config,
+    )
+
+    gate = None
+    coros = []
+    if bastion_ip:
+        gate = asyncio.Event()
+        bastion = HostProbe("bastion", bastion_ip)
+
+        async def probe_bastion():
+            await _probe(bastion, bastion_ip=None, **kwargs)
+            if bastion.ready_after_s is None:
+                for p in probes:
+                    p.last_error = f"bastion {bastion_ip} not reachable ({bastion.last_error})"
+            # Past the deadline the released probes return without an attempt
+            gate.set()
+            return bastion
+
+        coros.append(probe_bastion())
+
+    coros += [_probe(p, bastion_ip=bastion_ip, gate=gate, **kwargs) for p in probes]
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout + connect_timeout * 3)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for t in tasks:
+            t.cancel()
+    return probes
+
+
+def wait_for_hosts(hosts, bastion_ip, ssh_key_path, timeout=300, **kwargs):
+    """Synchronous wrapper around probe_hosts()."""
+    return asyncio.run(probe_hosts(hosts, bastion_ip, ssh_key_path, timeout=timeout, **kwargs))
@@ -0,0 +1,115 @@
+import json
+import os
+
+# ==========================================
+# Ansible Task Timings Report
+# ==========================================
+# The task_timings callback (ansible/callback_plugins) writes one JSONL line
+# per task and host. This module turns those lines into the slowest-task
+# table and the per-host skew printed after every playbook run.
+
+def load_records(path):
+    """Returns the task records of a timings file (missing file = no records)."""
+    records = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def task_file(record):
+    """
+    File the task is defined in, e.g. '3_configure_network.yaml'. The
+    recorded playbook is the one ansible-playbook was started with, which
+    for cluster_setup.yaml (import_playbook of every phase) is always the
+    same; the task path ('<file>:<line>') names the phase.
+    """
+    path = record.get("path") or ""
+    return os.path.basename(path.rpartition(":")[0] or path) or record.get("playbook")
+
+
+def slowest_tasks(records, top_n=10):
+    """
+    Groups the records by task and returns the top_n tasks by their slowest
+    host, as dicts with hosts, max/mean/min duration and the slowest host.
+    """
+    tasks = {}
+    for r in records:
+        if r.get("status") == "skipped":
+            continue
+        key = (r.get("playbook"), r.get("task"), r.get("path"))
+        tasks.setdefault(key, []).append(r)
+
+    rows = []
+    for (playbook, task, path), runs in tasks.items():
+        durations = [r["duration_s"] for r in runs]
+        slowest = max(runs, key=lambda r: r["duration_s"])
+        rows.append({
+            "playbook": playbook,
+            "file": task_file(runs[0]),
+            "task": task,
+            "path": path,
+            "hosts": len(runs),
+            "max_s": max(durations),
+            "mean_s": sum(durations) / len(durations),
+            "min_s": min(durations),
+            "slowest_host": slowest["host"],
+        })
+    rows.sort(key=lambda row: row["max_s"], reverse=True)
+    return rows[:top_n]
+
+
+def host_skew(records):
+    """
+    Per-host busy time (sum of task durations), first start and last end.
+    'lag_s' is how much later than the first finished host each host was done.
+    """
+    hosts = {}
+    for r in records:
+        h = hosts.setdefault(r["host"], {"host": r["host"], "tasks": 0, "busy_s": 0.0,
+                                         "first_start": r["start"], "last_end": r["end"]})
+        h["tasks"] += 1
+        h["busy_s"] += r["duration_s"]
+        h["first_start"] = min(h["first_start"], r["start"])
+        h["last_end"] = max(h["last_end"], r["end"])
+    if not hosts:
+        return []
+    earliest_end = min(h["last_end"] for h in hosts.values())
+    rows = sorted(hosts.values(), key=lambda h: h["last_end"], reverse=True)
+    for h in rows:
+        h["lag_s"] = h["last_end"] - earliest_end
+    return rows
+
+
+def print_report(path, top_n=10, max_hosts=10):
+    """Prints the slowest tasks and the hosts that finished last."""
+    records = load_records(path)
+    if not records:
+        print(f"No task timings recorded in {path}.")
+        return
+
+    print(f"\n--- Slowest Ansible Tasks (top {top_n}) ---")
+    for row in slowest_tasks(records, top_n):
+        name = f"{row['file']}: {row['task']}"
+        if len(name) > 60:
+            name = name[:57] + "..."
+        print(f"  {name:<60} max {row['max_s']:7.1f}s  mean {row['mean_s']:7.1f}s  "
+              f"({row['hosts']} hosts, slowest {row['slowest_host']})")
+
+    skew = host_skew(records)
+    print(f"\n--- Host Skew ({len(skew)} hosts, last finished first) ---")
+    for h in skew[:max_hosts]:
+        print(f"  {h['host']:<24} +{h['lag_s']:6.1f}s  busy {h['busy_s']:7.1f}s  {h['tasks']} tasks")
+    if len(skew) > max_hosts:
+        print(f"  ... {len(skew) - max_hosts} more")
+    print(f"Task timings saved to: {path}")
+
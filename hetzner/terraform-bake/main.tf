@@ -0,0 +1,28 @@
+# Temporary server that 'cluster_ctl.py bake-image' provisions with
+# ansible/bake_image.yaml and then snapshots.
+resource "hcloud_server" "bake" {
+  name        = var.image_name
+  server_type = var.server_type
+  image       = var.base_image
+  location    = var.location
+
+  # The key goes in through cloud-init instead of hcloud_ssh_key: Hetzner
+  # rejects a second key with the same fingerprint while a cluster is up
+  user_data = <<-EOT
+    #cloud-config
+    ssh_authorized_keys:
+      - ${trimspace(file(var.ssh_public_key_path))}
+  EOT
+}
+
+resource "hcloud_snapshot" "image" {
+  count       = var.create_snapshot ? 1 : 0
+  server_id   = hcloud_server.bake.id
+  description = var.image_name
+
+  labels = {
+    "poormans-kubernetes/role"   = "node"
+    "poormans-kubernetes/k8s"    = "v1.34"
+    "poormans-kubernetes/recipe" = var.recipe_hash
+  }
+}
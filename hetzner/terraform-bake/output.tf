@@ -0,0 +1,7 @@
+output "bake_ip" {
+  value = hcloud_server.bake.ipv4_address
+}
+
+output "snapshot_id" {
+  value = one(hcloud_snapshot.image[*].id)
+}
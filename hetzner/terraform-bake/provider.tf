@@ -0,0 +1,14 @@
+terraform {
+  required_providers {
+    hcloud = {
+      source  = "hetznercloud/hcloud"
+      version = "~> 1.45"
+    }
+  }
+  # Local state on purpose: the build server only lives while
+  # 'cluster_ctl.py bake-image' runs, which passes -state=<tmpfile>
+}
+
+provider "hcloud" {
+  token = var.hcloud_token
+}
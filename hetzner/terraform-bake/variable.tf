@@ -0,0 +1,44 @@
+variable "hcloud_token" {
+  sensitive = true
+  type = string
+}
+
+variable "ssh_public_key_path" {
+  sensitive = true
+  type = string
+}
+
+variable "image_name" {
+  description = "Name of the build server and description of the snapshot"
+  type        = string
+  default     = "pmk-node-image"
+}
+
+variable "base_image" {
+  description = "Image the snapshot is built on; must match the cluster's default image"
+  type        = string
+  default     = "debian-13"
+}
+
+variable "server_type" {
+  description = "Server type of the build server (the snapshot works on any type of the same architecture)"
+  type        = string
+  default     = "cx23"
+}
+
+variable "location" {
+  type    = string
+  default = "nbg1"
+}
+
+variable "create_snapshot" {
+  description = "Set by bake-image once the build server has been provisioned"
+  type        = bool
+  default     = false
+}
+
+variable "recipe_hash" {
+  description = "Hash of the baked playbooks, stored as a snapshot label"
+  type        = string
+  default     = ""
+}
@@ -17,8 +17,9 @@ resource "helm_release" "nfs_provisioner" {
   values = [
     yamlencode({
       nfs = {
-        server = var.nfs_server_ip
-        path   = "/mnt/data-vol"
+        server       = var.nfs_server_ip
+        path         = "/mnt/data-vol"
+        mountOptions = var.nfs_mount_options
       }
       storageClass = {
         name         = "nfs-storage"
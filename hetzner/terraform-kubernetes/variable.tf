@@ -16,4 +16,10 @@ variable "kube_config_path" {
 variable "nfs_server_ip" {
   description = "The private IP address of the NFS server (Volume Node)"
   type        = string
+}
+
+variable "nfs_mount_options" {
+  description = "Client mount options of the nfs-storage StorageClass (e.g. nconnect=4, noatime); empty uses the kernel defaults"
+  type        = list(string)
+  default     = []
 }
\ No newline at end of file
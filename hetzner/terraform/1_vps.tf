@@ -1,10 +1,23 @@
+locals {
+  # Named clusters (cluster_up.py --cluster-name) share the project with others
+  name_prefix = var.cluster_name == "" ? "" : "${var.cluster_name}-"
+}
+
+# Hetzner allows a public key only once per project, so named clusters get it
+# through cloud-init instead (like terraform-bake)
 resource "hcloud_ssh_key" "default" {
+  count      = var.cluster_name == "" ? 1 : 0
   name       = "terraform-ssh-key"
   public_key = file(var.ssh_public_key_path) 
 }
 
+moved {
+  from = hcloud_ssh_key.default
+  to   = hcloud_ssh_key.default[0]
+}
+
 resource "hcloud_network" "private_net" {
-  name     = "internal-network"
+  name     = "${local.name_prefix}internal-network"
   ip_range = "10.0.0.0/16"
 }
 
@@ -15,17 +28,25 @@ resource "hcloud_network_subnet" "private_subnet" {
   ip_range     = "10.0.1.0/24"
 }
 
+# node-1 is the control plane, node-2..node-N are workers
+# (node-2 also carries the data volume and acts as bastion)
 resource "hcloud_server" "node" {
-  count       = 2
-  name        = "node-${count.index + 1}" 
-  server_type = "cx23"                    
-  image       = "debian-13" # default user: root
+  count       = 1 + var.worker_count
+  name        = "${local.name_prefix}node-${count.index + 1}" 
+  server_type = count.index == 0 ? var.control_plane_server_type : var.worker_server_type
+  image       = var.node_image # default user: root
   location    = "nbg1"
-  ssh_keys    = [hcloud_ssh_key.default.id]
+  ssh_keys    = hcloud_ssh_key.default[*].id
+  user_data   = var.cluster_name == "" ? null : <<-EOT
+    #cloud-config
+    ssh_authorized_keys:
+      - ${trimspace(file(var.ssh_public_key_path))}
+  EOT
+  firewall_ids = [hcloud_firewall.k8s_protection.id]
 
   network {
     network_id = hcloud_network.private_net.id
-    ip         = "10.0.1.${10 + count.index}" 
+    ip         = cidrhost(hcloud_network_subnet.private_subnet.ip_range, 10 + count.index)
   }
 
   depends_on = [
@@ -5,7 +5,7 @@ data "hcloud_zone" "main" {
 # 2. Define the Existing A Record (e.g., for the root domain @)
 resource "hcloud_zone_rrset" "root" {
     zone = data.hcloud_zone.main.id
-    name    = "@"
+    name    = var.dns_name != "" ? var.dns_name : (var.cluster_name == "" ? "@" : var.cluster_name)
     type    = "A"
     ttl     = 3600
     records = [ {
@@ -1,5 +1,5 @@
 resource "hcloud_volume" "data_vol" {
-  name     = "data-volume"
+  name     = "${local.name_prefix}data-volume"
   size     = 10
   location = hcloud_server.node[1].location
   server_id = hcloud_server.node[1].id
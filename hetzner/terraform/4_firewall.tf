@@ -1,5 +1,5 @@
 resource "hcloud_firewall" "k8s_protection" {
-  name = "k8s-security-group"
+  name = "${local.name_prefix}k8s-security-group"
 
   # -----------------------------------------------------------
   # 1. PUBLIC INBOUND RULES (Exceptions for the Internet)
@@ -63,15 +63,6 @@ resource "hcloud_firewall" "k8s_protection" {
     source_ips = ["10.0.0.0/16"]
   }
 
-  # -----------------------------------------------------------
-  # 3. APPLY TO SERVERS
-  # -----------------------------------------------------------
-
-  # Automatically apply this firewall to all nodes created in "hcloud_server.node"
-  dynamic "apply_to" {
-    for_each = hcloud_server.node
-    content {
-      server = apply_to.value.id
-    }
-  }
-}
\ No newline at end of file
+  # Servers attach themselves via firewall_ids (1_vps.tf), so adding or
+  # removing a node does not have to update this resource.
+}
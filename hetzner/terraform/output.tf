@@ -4,9 +4,23 @@ output "server_public_ips" {
   }
 }
 
+output "server_ids" {
+  description = "A recreated server gets a new ID; cached Ansible facts of its host are dropped then"
+  value = {
+    for server in hcloud_server.node : server.name => server.id
+  }
+}
+
 output "server_private_ips" {
   value = {
-    for server in hcloud_server.node : server.name => "10.0.1.${10 + index(hcloud_server.node.*.id, server.id)}"
+    for i, server in hcloud_server.node : server.name => cidrhost(hcloud_network_subnet.private_subnet.ip_range, 10 + i)
+  }
+}
+
+output "bastion_ip" {
+  description = "The public IP of the node used as SSH jump host for the private network"
+  value = {
+    (hcloud_server.node[1].name) = hcloud_server.node[1].ipv4_address
   }
 }
 
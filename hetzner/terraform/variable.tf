@@ -10,4 +10,50 @@ variable "hetzner_zone_domain" {
 variable "ssh_public_key_path" {
   sensitive = true
   type = string # example: "example.com"
-}
\ No newline at end of file
+}
+variable "worker_count" {
+  description = "Number of worker nodes in addition to the control plane"
+  type        = number
+  default     = 1
+
+  validation {
+    # node-2 holds the data volume; the /24 subnet starts handing out at .10
+    condition     = var.worker_count >= 1 && var.worker_count <= 240
+    error_message = "worker_count must be between 1 and 240."
+  }
+}
+
+variable "control_plane_server_type" {
+  description = "Hetzner server type of the control plane node"
+  type        = string
+  default     = "cx23"
+}
+
+variable "worker_server_type" {
+  description = "Hetzner server type of the worker nodes"
+  type        = string
+  default     = "cx23"
+}
+
+variable "node_image" {
+  description = "Image of all nodes: 'debian-13' or the ID of a snapshot built with 'cluster_ctl.py bake-image'"
+  type        = string
+  default     = "debian-13"
+}
+
+variable "cluster_name" {
+  description = "Empty for the default cluster; otherwise prefixes all resource names and is the DNS record name"
+  type        = string
+  default     = ""
+
+  validation {
+    condition     = can(regex("^([a-z][a-z0-9-]{0,18}[a-z0-9]|[a-z]?)$", var.cluster_name))
+    error_message = "cluster_name must be 1-20 lowercase letters, digits and '-', starting with a letter."
+  }
+}
+
+variable "dns_name" {
+  description = "DNS record name overriding cluster_name (set when a warm pool cluster is claimed)"
+  type        = string
+  default     = ""
+}
@@ -0,0 +1,109 @@
+import unittest
+
+import autoscaler
+
+# ==========================================
+# Autoscaler Decision & Replay Tests
+# ==========================================
+# Run from hetzner/: python3 -m unittest
+
+
+def obs(time, workers=2, utilization=0.5, pending_pods=0, pending_oldest_s=0.0, pending_cpu_m=0):
+    return {
+        "time": time, "workers": workers,
+        "cpu_utilization": utilization, "memory_utilization": 0.0,
+        "pending_pods": pending_pods, "pending_oldest_s": pending_oldest_s,
+        "pending_cpu_m": pending_cpu_m, "pending_memory": 0,
+        "worker_cpu_m": 2000, "worker_memory": 4 * 2 ** 30,
+    }
+
+
+class DecideTest(unittest.TestCase):
+    def setUp(self):
+        self.scaler = autoscaler.Autoscaler(autoscaler.Policy(min_workers=1, max_workers=5))
+
+    def test_pending_pods_wait_for_grace_period(self):
+        self.assertEqual(self.scaler.decide(obs(0, pending_pods=1, pending_oldest_s=10))["action"], "none")
+        result = self.scaler.decide(obs(30, pending_pods=1, pending_oldest_s=30, pending_cpu_m=3000))
+        self.assertEqual((result["action"], result["count"]), ("out", 2))
+
+    def test_scale_out_is_capped(self):
+        result = self.scaler.decide(obs(0, workers=4, pending_pods=5, pending_oldest_s=60, pending_cpu_m=20000))
+        self.assertEqual((result["action"], result["count"]), ("out", 1))
+        scaler = autoscaler.Autoscaler(autoscaler.Policy(max_workers=10, max_step=3))
+        result = scaler.decide(obs(0, workers=2, pending_pods=5, pending_oldest_s=60, pending_cpu_m=20000))
+        self.assertEqual((result["action"], result["count"]), ("out", 3))
+
+    def test_scale_out_cooldown(self):
+        self.scaler.decide(obs(0, pending_pods=1, pending_oldest_s=60))
+        result = self.scaler.decide(obs(60, workers=3, pending_pods=1, pending_oldest_s=120))
+        self.assertEqual(result["action"], "none")
+        self.assertIn("cooldown", result["reason"])
+        self.assertEqual(self.scaler.decide(obs(180, workers=3, pending_pods=1, pending_oldest_s=240))["action"], "out")
+
+    def test_high_utilization_has_to_last(self):
+        self.assertEqual(self.scaler.decide(obs(0, utilization=0.9))["action"], "none")
+        self.assertEqual(self.scaler.decide(obs(30, utilization=0.9))["action"], "none")
+        result = self.scaler.decide(obs(60, utilization=0.9))
+        # 2 workers at 90% need 4 to get back to the middle of the thresholds (55%)
+        self.assertEqual((result["action"], result["count"]), ("out", 2))
+
+    def test_utilization_dip_restarts_hysteresis(self):
+        self.scaler.decide(obs(0, utilization=0.9))
+        self.scaler.decide(obs(30, utilization=0.5))
+        self.assertEqual(self.scaler.decide(obs(60, utilization=0.9))["action"], "none")
+
+    def test_low_utilization_scales_in_one_worker(self):
+        self.assertEqual(self.scaler.decide(obs(0, workers=3, utilization=0.2))["action"], "none")
+        self.assertEqual(self.scaler.decide(obs(599, workers=3, utilization=0.2))["action"], "none")
+        result = self.scaler.decide(obs(600, workers=3, utilization=0.2))
+        self.assertEqual((result["action"], result["count"]), ("in", 1))
+
+    def test_scale_in_must_not_trigger_scale_out(self):
+        scaler = autoscaler.Autoscaler(autoscaler.Policy(scale_in_utilization=0.5))
+        scaler.decide(obs(0, workers=2, utilization=0.4))
+        result = scaler.decide(obs(600, workers=2, utilization=0.4))
+        self.assertEqual(result["action"], "none")
+        self.assertIn("with one worker less", result["reason"])
+
+    def test_pending_pods_block_scale_in(self):
+        self.scaler.decide(obs(0, workers=3, utilization=0.2, pending_pods=1))
+        self.assertEqual(self.scaler.decide(obs(600, workers=3, utilization=0.2, pending_pods=1))["action"], "none")
+
+    def test_worker_bounds(self):
+        result = self.scaler.decide(obs(0, workers=0))
+        self.assertEqual((result["action"], result["count"]), ("out", 1))
+        result = autoscaler.Autoscaler(autoscaler.Policy(max_workers=5)).decide(obs(0, workers=7))
+        self.assertEqual((result["action"], result["count"]), ("in", 2))
+
+    def test_min_workers_is_at_least_one(self):
+        self.assertEqual(autoscaler.Policy(min_workers=0).min_workers, 1)
+        self.assertEqual(autoscaler.Policy(min_workers=4, max_workers=2).max_workers, 4)
+
+
+class ReplayTest(unittest.TestCase):
+    def test_pending_pods_get_a_worker(self):
+        # One worker, two pods of 500m pending from t=0 on; the new worker is up 100s after the scale-out
+        observations = [obs(t, workers=1, pending_pods=2, pending_oldest_s=t, pending_cpu_m=1000)
+                        for t in range(0, 301, 30)]
+        provisioner = autoscaler.StubProvisioner(1, provision_delay_s=100)
+        timeline, summary = autoscaler.replay(observations, autoscaler.Policy(), provisioner)
+
+        self.assertEqual([e["action"] for e in timeline[:2]], ["none", "out"])
+        self.assertEqual({e["reason"] for e in timeline[2:5]}, {"operation in flight"})
+        self.assertEqual(timeline[5]["workers"], 2)
+        self.assertEqual(timeline[5]["pending_pods"], 0)
+        self.assertEqual(summary["scale_outs"], 1)
+        self.assertEqual(summary["scale_ins"], 0)
+        self.assertEqual(summary["final_workers"], 2)
+        # Pending since t=0, worker seen at the first observation after t=130
+        self.assertEqual(summary["pending_to_ready_s"], [150])
+
+    def test_simulate_spreads_load(self):
+        sim = autoscaler.simulate(obs(0, workers=2, utilization=0.8), 4)
+        self.assertEqual(sim["workers"], 4)
+        self.assertAlmostEqual(sim["cpu_utilization"], 0.4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import base64
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import known_hosts
+
+# ==========================================
+# known_hosts Rewriter Tests
+# ==========================================
+# Run from hetzner/: python3 -m unittest
+
+
+def hashed(host, salt=b"0123456789abcdef0123"):
+    digest = hmac.new(salt, host.encode(), hashlib.sha1).digest()
+    return f"|1|{base64.b64encode(salt).decode()}|{base64.b64encode(digest).decode()}"
+
+
+class RemoveHostsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "known_hosts")
+
+    def write(self, *hosts):
+        with open(self.path, "w") as f:
+            f.writelines(f"{h} ssh-ed25519 AAAA\n" for h in hosts)
+
+    def remaining(self):
+        with open(self.path) as f:
+            return [line.split()[0] for line in f]
+
+    def test_plain_bracketed_and_hashed_entries(self):
+        self.write("10.0.1.1", "[10.0.1.1]:22", "[10.0.1.1]:2222", hashed("10.0.1.1"), hashed("[10.0.1.1]:22"),
+                   "10.0.1.10", "other.example,10.0.1.1", hashed("10.0.1.2"))
+        self.assertEqual(known_hosts.remove_hosts(["10.0.1.1"], self.path), 5)
+        self.assertEqual(self.remaining(), ["[10.0.1.1]:2222", "10.0.1.10", hashed("10.0.1.2")])
+        self.assertTrue(os.path.exists(self.path + ".old"))
+
+    def test_missing_file(self):
+        self.assertEqual(known_hosts.remove_hosts(["10.0.1.1"], self.path), 0)
+
+    def test_remove_cluster_hosts(self):
+        self.write("1.2.3.4", "10.0.1.1", "5.6.7.8")
+        tf_output = os.path.join(self.tmp.name, "output.json")
+        with open(tf_output, "w") as f:
+            json.dump({"server_public_ips": {"value": {"node-1": "1.2.3.4"}},
+                       "server_private_ips": {"value": {"node-1": "10.0.1.1"}}}, f)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            known_hosts.remove_cluster_hosts(tf_output, self.path)
+            known_hosts.remove_cluster_hosts(os.path.join(self.tmp.name, "missing.json"), self.path)
+        self.assertEqual(self.remaining(), ["5.6.7.8"])
+        self.assertIn("Removed 2 known_hosts entries for 2 IPs.", out.getvalue())
+        self.assertIn("Warning: Failed to clean known_hosts", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import manifest_pipeline
+
+# ==========================================
+# Manifest Parsing Tests
+# ==========================================
+# Run from hetzner/: python3 -m unittest
+
+DEPLOYMENT = """\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: "web"   # quoted, with a comment
+  namespace: apps
+  labels:
+    name: not-the-name
+spec:
+  template:
+    metadata:
+      name: pod-template
+"""
+
+
+class SplitDocumentsTest(unittest.TestCase):
+    def test_documents_are_split_on_separator_lines(self):
+        docs = manifest_pipeline.split_documents("---\nkind: A\n---  \nkind: B\n\n\n---\nkind: C")
+        self.assertEqual(docs, ["kind: A\n", "kind: B\n", "kind: C\n"])
+
+    def test_comment_only_documents_are_dropped(self):
+        docs = manifest_pipeline.split_documents("# header\n---\nkind: A\n---\n  # nothing here\n\n---\n")
+        self.assertEqual(docs, ["kind: A\n"])
+
+    def test_separator_inside_a_line_is_kept(self):
+        docs = manifest_pipeline.split_documents("kind: A\ndata: a---b\n")
+        self.assertEqual(len(docs), 1)
+
+
+class ObjectKeyTest(unittest.TestCase):
+    def test_only_direct_metadata_keys_count(self):
+        self.assertEqual(manifest_pipeline.object_key(DEPLOYMENT), "apps/v1/Deployment/apps/web")
+
+    def test_cluster_scoped_object(self):
+        doc = "kind: ClusterIssuer\napiVersion: cert-manager.io/v1\nmetadata:\n  name: letsencrypt\n"
+        self.assertEqual(manifest_pipeline.object_key(doc), "cert-manager.io/v1/ClusterIssuer//letsencrypt")
+
+    def test_missing_name_is_an_error(self):
+        doc = "apiVersion: v1\nkind: Service\nspec:\n  name: web\n"
+        with self.assertRaisesRegex(manifest_pipeline.ManifestError, "^svc.yaml: "):
+            manifest_pipeline.object_key(doc, source="svc.yaml")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+import metrics_ring
+
+# ==========================================
+# Metrics Ring Buffer Tests
+# ==========================================
+# Run from hetzner/: python3 -m unittest
+
+
+class RingBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "metrics.ring")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def ring(self, capacity=4):
+        ring = metrics_ring.RingBuffer(self.path, capacity=capacity)
+        self.addCleanup(ring.close)
+        return ring
+
+    def timestamps(self, records):
+        return [r[0] for r in records]
+
+    def test_window_before_wrap(self):
+        ring = self.ring()
+        ring.append([(1.0, 0, 100, 1000), (2.0, 1, 200, 2000)])
+        self.assertEqual(len(ring), 2)
+        self.assertEqual(list(ring.window()), [(1.0, 0, 100, 1000), (2.0, 1, 200, 2000)])
+
+    def test_window_after_wrap_keeps_newest(self):
+        ring = self.ring()
+        ring.append([(float(t), 0, t, t) for t in range(1, 7)])
+        self.assertEqual(ring.written, 6)
+        self.assertEqual(len(ring), 4)
+        self.assertEqual(self.timestamps(ring.window()), [3.0, 4.0, 5.0, 6.0])
+
+    def test_window_bounds_across_wrap(self):
+        ring = self.ring()
+        ring.append([(float(t), 0, t, t) for t in range(1, 8)])
+        # Kept: 4, 5, 6, 7 with 7 at the start of the file
+        self.assertEqual(self.timestamps(ring.window(since=4.5)), [5.0, 6.0, 7.0])
+        self.assertEqual(self.timestamps(ring.window(since=5.0, until=7.0)), [5.0, 6.0])
+        self.assertEqual(self.timestamps(ring.window(since=1.0)), [4.0, 5.0, 6.0, 7.0])
+        self.assertEqual(list(ring.window(since=8.0)), [])
+
+    def test_reopen_keeps_capacity_and_records(self):
+        ring = self.ring(capacity=3)
+        ring.append([(float(t), 0, t, t) for t in range(1, 6)])
+        ring.flush()
+        reopened = self.ring(capacity=100)
+        self.assertEqual(reopened.capacity, 3)
+        self.assertEqual(self.timestamps(reopened.window()), [3.0, 4.0, 5.0])
+
+    def test_foreign_file_is_rejected(self):
+        with open(self.path, "wb") as f:
+            f.write(b"x" * 4096)
+        with self.assertRaises(metrics_ring.RingError):
+            metrics_ring.RingBuffer(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import task_timings
+
+# ==========================================
+# Ansible Task Timings Tests
+# ==========================================
+# Run from hetzner/: python3 -m unittest
+
+
+def record(task, path, host, duration_s, playbook="cluster_setup.yaml", status="ok"):
+    return {"playbook": playbook, "play": "all", "task": task, "path": path, "host": host,
+            "start": 100.0, "end": 100.0 + duration_s, "duration_s": duration_s, "status": status}
+
+
+class SlowestTasksTest(unittest.TestCase):
+    def test_rows_name_the_phase_file(self):
+        records = [
+            record("Install containerd", "/repo/ansible/2_install_containerd.yaml:12", "node1", 40.0),
+            record("Install containerd", "/repo/ansible/2_install_containerd.yaml:12", "node2", 20.0),
+            record("Disable swap", "/repo/ansible/1_disable_swap.yaml:5", "node1", 2.0),
+            record("Skipped", "/repo/ansible/1_disable_swap.yaml:9", "node1", 90.0, status="skipped"),
+        ]
+        rows = task_timings.slowest_tasks(records)
+        self.assertEqual([(r["file"], r["task"]) for r in rows],
+                         [("2_install_containerd.yaml", "Install containerd"), ("1_disable_swap.yaml", "Disable swap")])
+        self.assertEqual((rows[0]["hosts"], rows[0]["max_s"], rows[0]["mean_s"], rows[0]["slowest_host"]),
+                         (2, 40.0, 30.0, "node1"))
+
+    def test_task_file_without_path(self):
+        self.assertEqual(task_timings.task_file(record("Gather", None, "node1", 1.0, playbook="bake_image.yaml")),
+                         "bake_image.yaml")
+        self.assertEqual(task_timings.task_file(record("Gather", "/repo/ansible/tasks/image_prepull.yaml", "node1", 1.0)),
+                         "image_prepull.yaml")
+
+
+class HostSkewTest(unittest.TestCase):
+    def test_lag_against_first_finished_host(self):
+        rows = task_timings.host_skew([record("a", "f.yaml:1", "node1", 10.0), record("a", "f.yaml:1", "node2", 25.0)])
+        self.assertEqual([(h["host"], h["lag_s"]) for h in rows], [("node2", 15.0), ("node1", 0.0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
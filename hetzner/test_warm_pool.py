@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import warm_pool
+
+# ==========================================
+# Warm Pool Bookkeeping Tests
+# ==========================================
+# Run from hetzner/: python3 -m unittest
+
+
+def dead_pid():
+    """The pid of a process that has already exited."""
+    proc = subprocess.Popen([sys.executable, "-c", ""])
+    proc.wait()
+    return proc.pid
+
+
+def pool_state(size, **clusters):
+    return {"size": size, "up_args": [], "next_id": len(clusters) + 1, "clusters": clusters}
+
+
+class PlanRefillTest(unittest.TestCase):
+    def test_empty_pool_reserves_size_names(self):
+        state = pool_state(2)
+        self.assertEqual(warm_pool.plan_refill(state), ["pool-1", "pool-2"])
+        self.assertEqual(state["next_id"], 3)
+        self.assertEqual(warm_pool.counts(state)["provisioning"], 2)
+
+    def test_ready_and_provisioning_clusters_count(self):
+        state = pool_state(3, **{
+            "pool-1": {"status": "ready", "ready_at": 1.0},
+            "pool-2": {"status": "provisioning", "pid": os.getpid()},
+            "pool-3": {"status": "claimed", "ready_at": 2.0},
+        })
+        self.assertEqual(warm_pool.plan_refill(state), ["pool-4"])
+
+    def test_names_are_not_reused(self):
+        state = pool_state(1, **{"pool-1": {"status": "claimed", "ready_at": 1.0}})
+        state["next_id"] = 7
+        self.assertEqual(warm_pool.plan_refill(state), ["pool-7"])
+
+    def test_full_pool_plans_nothing(self):
+        state = pool_state(1, **{"pool-1": {"status": "ready", "ready_at": 1.0}})
+        self.assertEqual(warm_pool.plan_refill(state), [])
+        self.assertEqual(state["next_id"], 2)
+
+    def test_dead_provisioner_is_replaced(self):
+        state = pool_state(1, **{"pool-1": {"status": "provisioning", "pid": dead_pid()}})
+        self.assertEqual(warm_pool.plan_refill(state), ["pool-2"])
+        self.assertEqual(state["clusters"]["pool-1"]["status"], "failed")
+
+
+class TakeReadyTest(unittest.TestCase):
+    def test_oldest_ready_cluster_is_claimed(self):
+        state = pool_state(3, **{
+            "pool-1": {"status": "ready", "ready_at": 20.0},
+            "pool-2": {"status": "ready", "ready_at": 10.0},
+            "pool-3": {"status": "provisioning", "pid": os.getpid()},
+        })
+        self.assertEqual(warm_pool.take_ready(state, "alice"), "pool-2")
+        cluster = state["clusters"]["pool-2"]
+        self.assertEqual(cluster["status"], "claimed")
+        self.assertEqual(cluster["claimed_by"], "alice")
+        self.assertIn("claimed_at", cluster)
+        self.assertEqual(warm_pool.take_ready(state, "bob"), "pool-1")
+
+    def test_empty_pool(self):
+        state = pool_state(1, **{"pool-1": {"status": "provisioning", "pid": os.getpid()}})
+        self.assertIsNone(warm_pool.take_ready(state, "alice"))
+        self.assertEqual(state["clusters"]["pool-1"]["status"], "provisioning")
+
+
+class ReapDeadTest(unittest.TestCase):
+    def test_only_dead_provisioners_fail(self):
+        state = pool_state(3, **{
+            "pool-1": {"status": "provisioning", "pid": os.getpid()},
+            "pool-2": {"status": "provisioning", "pid": dead_pid()},
+            "pool-3": {"status": "ready", "ready_at": 1.0, "pid": dead_pid()},
+        })
+        warm_pool.reap_dead(state)
+        statuses = {name: c["status"] for name, c in state["clusters"].items()}
+        self.assertEqual(statuses, {"pool-1": "provisioning", "pool-2": "failed", "pool-3": "ready"})
+        self.assertEqual(state["clusters"]["pool-2"]["error"], "provisioner exited without reporting")
+
+    def test_provisioning_without_pid_fails(self):
+        state = pool_state(2, **{
+            "pool-1": {"status": "provisioning"},
+            "pool-2": {"status": "provisioning", "pid": None},
+        })
+        warm_pool.reap_dead(state)
+        self.assertEqual({c["status"] for c in state["clusters"].values()}, {"failed"})
+
+    def test_plan_refill_twice(self):
+        state = pool_state(1)
+        self.assertEqual(warm_pool.plan_refill(state), ["pool-1"])
+        # Nobody recorded a provisioner for pool-1
+        self.assertEqual(warm_pool.plan_refill(state), ["pool-2"])
+        self.assertEqual(state["clusters"]["pool-1"]["status"], "failed")
+
+
+
+class WithoutTokenTest(unittest.TestCase):
+    def test_token_is_removed(self):
+        for up_args in (["--hetzner-token", "secret", "--acme-email", "a@b"], ["--hetzner-token=secret", "--acme-email", "a@b"]):
+            self.assertEqual(warm_pool.without_token(up_args), (["--acme-email", "a@b"], "secret"))
+
+    def test_no_token(self):
+        self.assertEqual(warm_pool.without_token(["--workers", "3"]), (["--workers", "3"], None))
+        self.assertNotIn("hetzner_token", vars(warm_pool.parse_up_args(["--hetzner-token", "secret"])))
+        self.assertEqual(warm_pool.down_args(["--hetzner-token", "secret", "--acme-email", "a@b"]), ["--acme-email", "a@b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
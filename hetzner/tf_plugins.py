@@ -0,0 +1,140 @@
+import glob
+import os
+import platform
+import re
+import subprocess
+
+# ==========================================
+# Shared Terraform Provider Cache & Mirror
+# ==========================================
+# Every Terraform root in the repo pins its providers in .terraform.lock.hcl.
+# Instead of letting each 'terraform init' download hcloud/helm/kubernetes/...
+# again, all terraform calls share one plugin cache directory, and optionally
+# a filesystem mirror built from the lock files, so init is a local copy or
+# symlink step.
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+TERRAFORM_ROOTS = [
+    os.path.join(REPO_DIR, "hetzner", "terraform"),
+    os.path.join(REPO_DIR, "hetzner", "terraform-kubernetes"),
+    os.path.join(REPO_DIR, "hetzner", "terraform-bake"),
+    os.path.join(REPO_DIR, "terraform-state-bucket"),
+    os.path.join(REPO_DIR, "aws", "terraform"),
+    os.path.join(REPO_DIR, "aws", "terraform-kubernetes"),
+]
+DEFAULT_CACHE_DIR = os.environ.get("TF_PLUGIN_CACHE_DIR") or os.path.expanduser("~/.terraform.d/plugin-cache")
+DEFAULT_MIRROR_DIR = os.path.expanduser("~/.terraform.d/provider-mirror")
+
+
+def current_platform():
+    """Terraform's name for this machine's platform, e.g. 'linux_amd64'."""
+    machine = platform.machine().lower()
+    arch = {"x86_64": "amd64", "amd64": "amd64", "aarch64": "arm64", "arm64": "arm64"}.get(machine, machine)
+    return f"{platform.system().lower()}_{arch}"
+
+
+def lock_file_providers(roots=TERRAFORM_ROOTS):
+    """Returns {provider_source: version} from the .terraform.lock.hcl files of the given roots."""
+    providers = {}
+    for root in roots:
+        lock_path = os.path.join(root, ".terraform.lock.hcl")
+        try:
+            with open(lock_path, "r") as f:
+                content = f.read()
+        except FileNotFoundError:
+            continue
+        for source, version in re.findall(r'provider\s+"([^"]+)"\s*{\s*version\s*=\s*"([^"]+)"', content):
+            providers[source] = version
+    return providers
+
+
+def mirrored_providers(mirror_dir, target=None):
+    """Provider sources that have at least one package for target in the (packed layout) mirror."""
+    target = target or current_platform()
+    found = set()
+    pattern = os.path.join(mirror_dir, "*", "*", "*", f"terraform-provider-*_{target}.zip")
+    for path in glob.glob(pattern):
+        hostname, namespace, type_name = os.path.relpath(path, mirror_dir).split(os.sep)[:3]
+        found.add(f"{hostname}/{namespace}/{type_name}")
+    return found
+
+
+def _missing_from_mirror(mirror_dir, providers, target):
+    missing = {}
+    for source, version in providers.items():
+        type_name = source.rsplit("/", 1)[-1]
+        package = os.path.join(mirror_dir, source, f"terraform-provider-{type_name}_{version}_{target}.zip")
+        if not os.path.exists(package):
+            missing[source] = version
+    return missing
+
+
+def build_mirror(mirror_dir=DEFAULT_MIRROR_DIR, roots=TERRAFORM_ROOTS, target=None):
+    """
+    Fills mirror_dir with the providers pinned in the roots' lock files using
+    'terraform providers mirror'. Roots whose providers are all present are
+    skipped. Returns the list of roots that were mirrored.
+    """
+    target = target or current_platform()
+    os.makedirs(mirror_dir, exist_ok=True)
+    mirrored = []
+    for root in roots:
+        missing = _missing_from_mirror(mirror_dir, lock_file_providers([root]), target)
+        if not missing:
+            continue
+        print(f"Mirroring {', '.join(sorted(missing))} for {os.path.relpath(root, REPO_DIR)}...")
+        # Run without our CLI config so the packages come from the registry
+        env = os.environ.copy()
+        env.pop("TF_CLI_CONFIG_FILE", None)
+        subprocess.check_call(
+            ["terraform", "providers", "mirror", f"-platform={target}", mirror_dir],
+            cwd=root, env=env
+        )
+        mirrored.append(root)
+    return mirrored
+
+
+def write_cli_config(config_path, cache_dir, mirror_dir):
+    """
+    Writes a Terraform CLI config that installs the mirrored providers from
+    mirror_dir and everything else from the registry, with the shared cache.
+    """
+    providers = sorted(mirrored_providers(mirror_dir))
+    include = ", ".join(f'"{p}"' for p in providers)
+    lines = [
+        "# Generated by cluster_up.py - do not edit",
+        f'plugin_cache_dir = "{cache_dir}"',
+        "",
+        "provider_installation {",
+    ]
+    if providers:
+        lines += [
+            "  filesystem_mirror {",
+            f'    path    = "{mirror_dir}"',
+            f"    include = [{include}]",
+            "  }",
+            "  direct {",
+            f"    exclude = [{include}]",
+            "  }",
+        ]
+    else:
+        lines.append("  direct {}")
+    lines.append("}")
+
+    with open(config_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return config_path
+
+
+def terraform_env(env, cache_dir=DEFAULT_CACHE_DIR, mirror_dir=None, cli_config_path=None):
+    """
+    Returns a copy of env that makes terraform use the shared plugin cache
+    and, when mirror_dir exists, the filesystem mirror (through a generated
+    CLI config at cli_config_path).
+    """
+    env = dict(env)
+    os.makedirs(cache_dir, exist_ok=True)
+    env["TF_PLUGIN_CACHE_DIR"] = cache_dir
+    if mirror_dir and cli_config_path and os.path.isdir(mirror_dir):
+        env["TF_CLI_CONFIG_FILE"] = write_cli_config(cli_config_path, cache_dir, mirror_dir)
+    return env
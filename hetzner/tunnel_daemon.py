@@ -0,0 +1,182 @@
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+
+import socks_tunnel
+
+# ==========================================
+# Persistent Auto-Reconnecting Tunnel Daemon
+# ==========================================
+# A long-lived process that keeps the SOCKS5 tunnel to the control plane up.
+# It keeps the same local port across reconnects, so kubeconfigs pointing at
+# it stay valid, and publishes its health in a JSON state file that
+# cluster_up.py, cluster_down.py and 'cluster_ctl.py tunnel status' read.
+
+HEALTH_INTERVAL = 5      # seconds between SOCKS5 health probes
+FAILURES_BEFORE_RESTART = 2
+MAX_BACKOFF = 30
+
+
+def _write_state(state_path, **state):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def read_state(state_path):
+    try:
+        with open(state_path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def find_running(state_path):
+    """
+    Returns the state of a running, healthy tunnel daemon or None.
+    Healthy means the daemon process exists and reports the tunnel as up.
+    """
+    state = read_state(state_path)
+    if not state or not pid_alive(state.get("pid", -1)):
+        return None
+    if state.get("status") != "up":
+        return None
+    return state
+
+
+def run_forever(state_path, bastion_ip, master_ip, ssh_key_path, probe_target,
+                ssh_config_path=None, port=1080):
+    """
+    Daemon main loop: start the tunnel, probe it every HEALTH_INTERVAL seconds
+    and reconnect with exponential backoff (with jitter) when it breaks.
+    Runs until SIGTERM/SIGINT.
+    """
+    stopping = []
+
+    def handle_signal(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    base_state = dict(
+        pid=os.getpid(), port=port, master_ip=master_ip, bastion_ip=bastion_ip,
+        probe_target=list(probe_target), started_at=time.time(),
+    )
+    tunnel = None
+    reconnects = 0
+    failures = 0
+    backoff = 1
+
+    def sleep_interruptibly(seconds):
+        deadline = time.monotonic() + seconds
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(min(0.2, deadline - time.monotonic()))
+
+    try:
+        while not stopping:
+            if tunnel is None or not tunnel.alive() or failures >= FAILURES_BEFORE_RESTART:
+                if tunnel is not None:
+                    tunnel.stop()
+                    reconnects += 1
+                _write_state(state_path, status="connecting", reconnects=reconnects, **base_state)
+                try:
+                    tunnel = socks_tunnel.start_socks_proxy(
+                        bastion_ip=bastion_ip,
+                        master_ip=master_ip,
+                        ssh_key_path=ssh_key_path,
+                        probe_target=probe_target,
+                        ssh_config_path=ssh_config_path,
+                        port=port,
+                        attempts=1,
+                    )
+                except socks_tunnel.TunnelError as e:
+                    tunnel = None
+                    delay = random.uniform(backoff / 2, backoff)
+                    print(f"{time.strftime('%H:%M:%S')} tunnel down ({e}), retrying in {delay:.1f}s", flush=True)
+                    _write_state(state_path, status="reconnecting", reconnects=reconnects,
+                                 last_error=str(e), **base_state)
+                    sleep_interruptibly(delay)
+                    backoff = min(MAX_BACKOFF, backoff * 2)
+                    continue
+                failures = 0
+                backoff = 1
+                _write_state(state_path, status="up", reconnects=reconnects,
+                             up_since=time.time(), ssh_pid=tunnel.proc.pid, **base_state)
+
+            sleep_interruptibly(HEALTH_INTERVAL)
+            if stopping:
+                break
+            if socks_tunnel.socks5_connect(port, *probe_target):
+                failures = 0
+            else:
+                failures += 1
+                print(f"{time.strftime('%H:%M:%S')} health probe failed ({failures})", flush=True)
+    finally:
+        if tunnel is not None:
+            tunnel.stop()
+        try:
+            os.unlink(state_path)
+        except FileNotFoundError:
+            pass
+
+
+def spawn(state_path, log_path, run_args, timeout=60):
+    """
+    Starts the daemon in its own session (detached from the terminal) and
+    waits until it reports the tunnel as up. run_args are the arguments for
+    'cluster_ctl.py tunnel run'. Returns the daemon state.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cluster_ctl.py")
+    with open(log_path, "a") as log:
+        proc = subprocess.Popen(
+            [sys.executable, script, "tunnel", "run"] + run_args,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise socks_tunnel.TunnelError(f"tunnel daemon exited with code {proc.returncode}, see {log_path}")
+        state = read_state(state_path)
+        if state and state.get("pid") == proc.pid and state.get("status") == "up":
+            return state
+        time.sleep(0.1)
+    # Nobody would know about a daemon left behind, and it would keep reconnecting
+    os.killpg(proc.pid, signal.SIGTERM)
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+    raise socks_tunnel.TunnelError(f"tunnel daemon did not come up within {timeout}s, see {log_path}")
+
+
+def stop(state_path, timeout=10):
+    """Stops a running daemon. Returns True if one was running."""
+    state = read_state(state_path)
+    if not state or not pid_alive(state.get("pid", -1)):
+        return False
+    os.kill(state["pid"], signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and pid_alive(state["pid"]):
+        time.sleep(0.1)
+    return True
@@ -0,0 +1,140 @@
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import time
+
+import tunnel_daemon
+
+# ==========================================
+# Warm Pool of Ready Clusters
+# ==========================================
+# Keeps a number of named clusters (see workspace.py) fully set up by
+# cluster_up.py on standby. Claiming one only rewrites what depends on the
+# claimant (DNS record, ACME email, example app hostnames) and takes seconds;
+# the pool is then refilled in the background. All bookkeeping lives in one
+# JSON state file that every pool process reads and writes under an flock:
+#   {"size": N, "up_args": [...], "next_id": K,
+#    "clusters": {"pool-1": {"status": "provisioning|ready|claimed|failed", ...}}}
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+POOL_STATE_PATH = os.path.join(SCRIPT_DIR, "tmpfile_pool_state.json")
+NAME_PREFIX = "pool"
+
+# cluster_up.py arguments the pool needs itself (and passes to cluster_down.py).
+# The Hetzner token is not one of them: it is never stored in the state and
+# reaches the pool's processes through the environment (cluster_up.TOKEN_ENV).
+SHARED_ARGS = ["--hetzner-zone-domain", "--ssh-public-key-path", "--ssh-private-key-path",
+               "--acme-email", "--terraform-plugin-cache", "--terraform-mirror"]
+TOKEN_ARG = "--hetzner-token"
+
+
+@contextlib.contextmanager
+def locked_state(path=POOL_STATE_PATH):
+    """Yields the pool state for reading and changing; it is written back on exit."""
+    with open(path, "a+") as f:
+        os.chmod(path, 0o600)
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        state = json.loads(content) if content else {}
+        state.setdefault("size", 0)
+        state.setdefault("up_args", [])
+        state.setdefault("next_id", 1)
+        state.setdefault("clusters", {})
+        yield state
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(state, indent=2))
+
+
+def read_state(path=POOL_STATE_PATH):
+    with locked_state(path) as state:
+        return state
+
+
+def without_token(up_args):
+    """(up_args without --hetzner-token, the token or None)."""
+    args, token = [], None
+    i = 0
+    while i < len(up_args):
+        if up_args[i] == TOKEN_ARG and i + 1 < len(up_args):
+            token = up_args[i + 1]
+            i += 2
+            continue
+        if up_args[i].startswith(TOKEN_ARG + "="):
+            token = up_args[i][len(TOKEN_ARG) + 1:]
+        else:
+            args.append(up_args[i])
+        i += 1
+    return args, token
+
+
+def parse_up_args(up_args):
+    """
+    The values of a cluster_up.py command line the pool needs for its own
+    Terraform runs, as a namespace (same defaults as cluster_up.py).
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    for flag in SHARED_ARGS:
+        parser.add_argument(flag)
+    parser.add_argument("--control-plane-server-type", default="cx23")
+    parser.add_argument("--worker-server-type", default="cx23")
+    parser.add_argument("--snapshot")
+    return parser.parse_known_args(up_args)[0]
+
+
+def down_args(up_args):
+    """The part of a cluster_up.py command line that cluster_down.py accepts."""
+    shared = vars(parse_up_args(up_args))
+    args = []
+    for flag in SHARED_ARGS:
+        value = shared[flag.lstrip("-").replace("-", "_")]
+        if value is not None:
+            args += [flag, value]
+    return args
+
+
+def reap_dead(state):
+    """Marks 'provisioning' clusters whose provisioner died without reporting as failed."""
+    for cluster in state["clusters"].values():
+        if cluster["status"] != "provisioning":
+            continue
+        pid = cluster.get("pid")
+        if pid is None or not tunnel_daemon.pid_alive(pid):
+            cluster.update(status="failed", error="provisioner exited without reporting")
+
+
+def counts(state):
+    result = {"provisioning": 0, "ready": 0, "claimed": 0, "failed": 0}
+    for cluster in state["clusters"].values():
+        result[cluster["status"]] += 1
+    return result
+
+
+def plan_refill(state):
+    """
+    Reserves names for the clusters missing to reach the pool size and marks
+    them 'provisioning'. Returns the new names; the caller starts them.
+    """
+    reap_dead(state)
+    c = counts(state)
+    missing = max(0, state["size"] - c["ready"] - c["provisioning"])
+    names = []
+    for _ in range(missing):
+        name = f"{NAME_PREFIX}-{state['next_id']}"
+        state["next_id"] += 1
+        state["clusters"][name] = {"status": "provisioning", "created": time.time(), "pid": None}
+        names.append(name)
+    return names
+
+
+def take_ready(state, claimant):
+    """Marks the oldest ready cluster as claimed and returns its name (None if the pool is empty)."""
+    ready = [(c["ready_at"], name) for name, c in state["clusters"].items() if c["status"] == "ready"]
+    if not ready:
+        return None
+    name = min(ready)[1]
+    state["clusters"][name].update(status="claimed", claimed_by=claimant, claimed_at=time.time())
+    return name
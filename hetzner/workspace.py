@@ -0,0 +1,170 @@
+import fcntl
+import os
+import re
+import socket
+import zlib
+
+# ==========================================
+# Per-Cluster Workspaces
+# ==========================================
+# The unnamed default cluster keeps its generated files (tmpfile_*) directly
+# in hetzner/, uses the .terraform directories of the roots and the backend
+# keys from provider.tf, exactly as before. A named cluster (--cluster-name)
+# gets hetzner/clusters/<name>/ for all of that: its own Terraform data dirs
+# (TF_DATA_DIR) pointing at their own state keys, its own inventory,
+# kubeconfig and ssh_config, and its own tunnel port. Several clusters can
+# then be driven from one machine at the same time.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CLUSTERS_DIR = os.path.join(SCRIPT_DIR, "clusters")
+DEFAULT_TUNNEL_PORT = 1080
+# Port of a named cluster's tunnel, picked when its workspace is created;
+# the lock file serializes the picking between concurrent cluster_up runs
+TUNNEL_PORT_FILE = "tmpfile_tunnel_port"
+TUNNEL_PORT_LOCK = os.path.join(CLUSTERS_DIR, "tmpfile_tunnel_ports.lock")
+TUNNEL_PORT_RANGE = (20000, 40000)
+# Same bucket and prefix as the backend blocks in terraform*/provider.tf
+STATE_KEY_PREFIX = "terraform/poormans-kubernetes/clusters"
+# Written when a warm pool cluster is claimed (see warm_pool.py)
+DNS_NAME_FILE = "tmpfile_dns_name"
+ACME_EMAIL_FILE = "tmpfile_acme_email"
+
+# Used in Hetzner resource names and as a DNS label
+NAME_PATTERN = re.compile(r"^[a-z][a-z0-9-]{0,19}$")
+
+
+def validate_name(name):
+    """Returns an error message for an unusable cluster name, else None."""
+    if name is None:
+        return None
+    if not NAME_PATTERN.match(name) or name.endswith("-"):
+        return (f"Invalid cluster name '{name}': use 1-20 lowercase letters, digits and '-', "
+                "starting with a letter")
+    return None
+
+
+def list_clusters():
+    """Names of the named clusters that have a workspace directory."""
+    try:
+        return sorted(n for n in os.listdir(CLUSTERS_DIR) if os.path.isdir(os.path.join(CLUSTERS_DIR, n)))
+    except FileNotFoundError:
+        return []
+
+
+def _read_file(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _port_is_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+        return True
+
+
+class Workspace:
+    """
+    Paths and Terraform settings of one cluster. name=None is the default
+    cluster.
+    """
+    def __init__(self, name=None):
+        self.name = name or None
+        self.dir = os.path.join(CLUSTERS_DIR, self.name) if self.name else SCRIPT_DIR
+        os.makedirs(self.dir, exist_ok=True)
+        if self.name and not self._read_setting(TUNNEL_PORT_FILE):
+            self._allocate_tunnel_port()
+
+    def path(self, filename):
+        return os.path.join(self.dir, filename)
+
+    @property
+    def label(self):
+        return self.name or "default"
+
+    @property
+    def tunnel_port(self):
+        """1080 for the default cluster, the port allocated to the workspace otherwise."""
+        if not self.name:
+            return DEFAULT_TUNNEL_PORT
+        return int(self._read_setting(TUNNEL_PORT_FILE))
+
+    def _allocate_tunnel_port(self):
+        """
+        Saves the first port from a per-name start that no other workspace
+        holds and that nothing listens on right now.
+        """
+        low, high = TUNNEL_PORT_RANGE
+        with open(TUNNEL_PORT_LOCK, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self._read_setting(TUNNEL_PORT_FILE):
+                return
+            taken = {DEFAULT_TUNNEL_PORT}
+            for name in list_clusters():
+                held = _read_file(os.path.join(CLUSTERS_DIR, name, TUNNEL_PORT_FILE))
+                if name != self.name and held:
+                    taken.add(int(held))
+            start = zlib.crc32(self.name.encode()) % (high - low)
+            for offset in range(high - low):
+                port = low + (start + offset) % (high - low)
+                if port not in taken and _port_is_free(port):
+                    self._write_setting(TUNNEL_PORT_FILE, str(port))
+                    return
+            raise RuntimeError("No free tunnel port left")
+
+    def _read_setting(self, filename):
+        return _read_file(self.path(filename))
+
+    def _write_setting(self, filename, value):
+        with open(self.path(filename), "w") as f:
+            f.write(value + "\n")
+
+    @property
+    def dns_name(self):
+        """DNS label replacing the cluster name in its domain, if one was set."""
+        return self._read_setting(DNS_NAME_FILE)
+
+    def set_dns_name(self, dns_name):
+        self._write_setting(DNS_NAME_FILE, dns_name)
+
+    @property
+    def acme_email(self):
+        """Let's Encrypt email replacing --acme-email, if one was set."""
+        return self._read_setting(ACME_EMAIL_FILE)
+
+    def set_acme_email(self, acme_email):
+        self._write_setting(ACME_EMAIL_FILE, acme_email)
+
+    def domain(self, zone_domain):
+        """The cluster's DNS name: the zone itself, or <dns name or name>.<zone>."""
+        label = self.dns_name or self.name
+        return f"{label}.{zone_domain}" if label else zone_domain
+
+    def terraform_data_dir(self, root_dir):
+        """The .terraform directory used for root_dir."""
+        if not self.name:
+            return os.path.join(root_dir, ".terraform")
+        return self.path(f"tmpfile_tfdata_{os.path.basename(root_dir)}")
+
+    def terraform_env(self, env, root_dir):
+        """Copy of env for running terraform in root_dir for this cluster."""
+        env = dict(env)
+        if self.name:
+            env["TF_DATA_DIR"] = self.terraform_data_dir(root_dir)
+            env["TF_VAR_cluster_name"] = self.name
+        if self.dns_name:
+            env["TF_VAR_dns_name"] = self.dns_name
+        if self.acme_email:
+            env["TF_VAR_acme_email"] = self.acme_email
+        return env
+
+    def terraform_init_args(self, root_dir):
+        """Extra 'terraform init' arguments: the cluster's own state key."""
+        if not self.name:
+            return []
+        return [f"-backend-config=key={STATE_KEY_PREFIX}/{self.name}/{os.path.basename(root_dir)}.tfstate"]